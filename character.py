@@ -1,4 +1,4 @@
-from models import Skill
+from models import Skill, BASE_FPS
 from buff_manager import BuffManager
 from character_stats import CharacterStatsMixin
 from character_skill import CharacterSkillMixin
@@ -51,6 +51,10 @@ class Character(CharacterStatsMixin, CharacterSkillMixin, CharacterActionMixin):
         
         self.is_dummy = is_dummy
 
+        # 期待値モード (シミュレーター側で設定される)
+        self.expected_value = False
+        self.last_hit_expectation = 1.0
+
         self.buff_manager = BuffManager()
         
         self.skill = None 
@@ -66,7 +70,8 @@ class Character(CharacterStatsMixin, CharacterSkillMixin, CharacterActionMixin):
         self.current_action_duration = 0
         
         self.mg_warmup_frames = 0
-        self.mg_decay_rate = self.weapon.mg_max_warmup / 68.0 if self.weapon.type == "MG" else 0
+        self.fps = BASE_FPS
+        self.mg_decay_rate = self._mg_decay_rate()
         
         self.total_damage = 0
         self.total_shots = 0
@@ -130,7 +135,21 @@ class Character(CharacterStatsMixin, CharacterSkillMixin, CharacterActionMixin):
         self.skills.append(skill)
         self.skills_by_trigger.setdefault(skill.trigger_type, []).append(skill)
 
-    def add_damage(self, source_name, amount, hit_count=1, source_type=None):
+    def _mg_decay_rate(self):
+        # MGのウォームアップは BASE_FPS で68フレームかけて冷める
+        if self.weapon.type != "MG":
+            return 0
+        return self.weapon.mg_max_warmup / (68.0 * self.fps / BASE_FPS)
+
+    def set_fps(self, fps):
+        """シミュレーターのフレームレートに武器フレーム値とMG減衰量を合わせる。"""
+        self.fps = fps
+        self.weapon.scale_to_fps(fps)
+        if self.original_weapon is not self.weapon:
+            self.original_weapon.scale_to_fps(fps)
+        self.mg_decay_rate = self._mg_decay_rate()
+
+    def add_damage(self, source_name, amount, hit_count=1, source_type=None, enemy_index=0):
         if amount == 0:
             return
         source_name = source_name or 'Unknown'
@@ -147,6 +166,11 @@ class Character(CharacterStatsMixin, CharacterSkillMixin, CharacterActionMixin):
         if recorder:
             recorder(self, source_name, amount, hit_count, source_type or self.damage_source_types.get(source_name))
 
+        # 敵テーブル側の被ダメージ・HP を更新 (シミュレーターが設定)
+        sink = getattr(self, "enemy_damage_sink", None)
+        if sink:
+            sink(self, amount, enemy_index)
+
     def heal(self, amount, source_name, frame, simulator, is_distributed=False):
         # 1. 回復分配ロジック (Distribution Logic)
         # 自身が分配バフを持っており、かつこれが「分配後の回復」でない場合に発動
@@ -1,4 +1,4 @@
-from models import DamageProfile
+from models import DamageProfile, BASE_FPS, scale_frames
 from utils import round_half_up
 
 class CharacterActionMixin:
@@ -38,7 +38,7 @@ class CharacterActionMixin:
         # "stun" タグを持つバフが有効な場合、行動不能として処理をスキップ
         if self.buff_manager.has_active_tag("stun", frame):
             # ログ出力（頻繁に出過ぎる場合は調整）
-            if frame % 60 == 0:
+            if frame % simulator.FPS == 0:
                 simulator.log(f"[Stun] {self.name} is stunned and cannot act.", target_name=self.name)
             return 0
         # ▲▲▲ 追加ここまで ▲▲▲
@@ -98,14 +98,17 @@ class CharacterActionMixin:
             
             for _ in range(current_pellets):
                 # ▼▼▼ 修正: 戻り値を3つ (dmg, is_crit, is_core) で受け取る ▼▼▼
-                dmg, is_crit, is_core = self.calculate_strict_damage(
-                    per_pellet_multiplier, prof, is_full_burst, frame, 
-                    enemy_def=simulator.ENEMY_DEF, enemy_element=simulator.enemy_element,
-                    enemy_core_size=simulator.enemy_core_size, enemy_size=simulator.enemy_size,
-                    debuff_manager=simulator.enemy_debuffs 
+                dmg, is_crit, is_core = simulator.calculate_enemy_damage(
+                    self, per_pellet_multiplier, prof, is_full_burst, frame
                 )
                 # ▲▲▲ 修正ここまで ▲▲▲
                 total_shot_dmg += dmg
+                if self.expected_value:
+                    # 期待値モード: 命中/クリティカル/コアは小数の期待回数で積算する
+                    hit_count += self.last_hit_expectation
+                    crit_count += is_crit
+                    core_hit_count += is_core
+                    continue
                 if dmg > 0: hit_count += 1
                 if is_crit: crit_count += 1
 
@@ -132,7 +135,7 @@ class CharacterActionMixin:
             
             if getattr(simulator, "enable_logs", True):
                 buff_debug_str = self.buff_manager.get_active_buffs_debug(frame)
-                simulator.log(f"[Shoot] 時間:{frame/60:>6.2f}s | 弾数:{self.current_ammo:>3}/{self.current_max_ammo:<3} | Pellets:{current_pellets:>2} | Dmg:{total_shot_dmg:10,.0f} | Buffs: {buff_debug_str}", target_name=self.name)
+                simulator.log(f"[Shoot] 時間:{frame/simulator.FPS:>6.2f}s | 弾数:{self.current_ammo:>3}/{self.current_max_ammo:<3} | Pellets:{current_pellets:>2} | Dmg:{total_shot_dmg:10,.0f} | Buffs: {buff_debug_str}", target_name=self.name)
             
             damage_this_frame += self.process_trigger('shot_count', self.total_shots, frame, is_full_burst, simulator)
             damage_this_frame += self.process_trigger('ammo_empty', self.current_ammo, frame, is_full_burst, simulator)
@@ -228,7 +231,7 @@ class CharacterActionMixin:
                 original_interval = self.get_mg_interval()
                 buffed_interval = self.get_buffed_frames('attack', original_interval, frame)
                 forced_interval = self.buff_manager.get_total_value('force_fire_interval', frame)
-                if forced_interval > 0: buffed_interval = int(forced_interval)
+                if forced_interval > 0: buffed_interval = scale_frames(int(forced_interval), simulator.FPS / BASE_FPS)
                 
                 if self.state_timer == 0:
                     perform_shoot()
@@ -0,0 +1,264 @@
+import argparse
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from pathlib import Path
+
+
+# characters/*.json と weapons/*_standard.json を、スキルレベル 1〜10 ごとに解釈済みのキャラ定義
+# (web_simulation.compile_character_spec の結果) にして1ファイルへまとめる。
+#
+# 形式: MAGIC + ヘッダ長 (uint32 LE) + ヘッダ (pickle) + 定義ごとの pickle を連結したもの。
+# ヘッダにはスキーマ版・コンパイラのハッシュ・元ファイルの (mtime, サイズ, sha1)・各定義の位置を持つ。
+# 武器ファイルが無かったキャラも、後から武器が追加されたら作り直せるよう、その場所を (None, None, None) で記録する。
+# 読み込みは mmap して必要な定義だけを pickle.loads するので、毎回新しいオブジェクトが返り複製は要らない。
+# 元ファイルがバンドルと食い違うキャラは None を返し、呼び出し側が JSON から作る。
+
+ROOT_DIR = Path(__file__).resolve().parent
+BUNDLE_PATH = ROOT_DIR / "character_bundle.bin"
+CHARACTER_DIR = ROOT_DIR / "characters"
+# JSON → キャラ定義の変換を行うファイル。中身が変われば古いバンドルは使わない
+COMPILER_SOURCES = (ROOT_DIR / "web_simulation.py",)
+MAGIC = b"NKCB"
+# ヘッダや定義の形を変えたら上げる
+SCHEMA_VERSION = 2
+SKILL_LEVELS = range(1, 11)
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+def file_sha1(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def compiler_hash():
+    digest = hashlib.sha1(str(SCHEMA_VERSION).encode("ascii"))
+    for path in COMPILER_SOURCES:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _source_record(path):
+    if not path.exists():
+        return (path.name, None, None, None)
+    stat = path.stat()
+    return (path.name, stat.st_mtime_ns, stat.st_size, file_sha1(path))
+
+
+def build_bundle(path=BUNDLE_PATH, character_dir=CHARACTER_DIR):
+    """全キャラ × 全スキルレベルの定義を書き出し、(キャラ数, 読めなかったファイル) を返す。"""
+    # web_simulation はこのモジュールを読み込むので、ビルド時にだけ import する
+    from web_simulation import _weapon_path, compile_character_spec, _read_json
+
+    entries = {}
+    blobs = []
+    offset = 0
+    errors = {}
+    for char_path in sorted(Path(character_dir).glob("*.json"), key=lambda p: p.name):
+        try:
+            char_data = _read_json(char_path, copy_result=False)
+            weapon_path = _weapon_path(char_data)
+            weapon_data = _read_json(weapon_path, copy_result=False) if weapon_path.exists() else None
+            sources = [("characters", *_source_record(char_path)), ("weapons", *_source_record(weapon_path))]
+            levels = {}
+            for level in SKILL_LEVELS:
+                blob = pickle.dumps(
+                    compile_character_spec(char_data, weapon_data, level), protocol=pickle.HIGHEST_PROTOCOL
+                )
+                levels[level] = (offset, len(blob))
+                blobs.append(blob)
+                offset += len(blob)
+        except Exception as exc:
+            errors[char_path.name] = f"{type(exc).__name__}: {exc}"
+            continue
+        entries[char_path.name] = {"sources": sources, "levels": levels}
+
+    header = pickle.dumps(
+        {
+            "schema": SCHEMA_VERSION,
+            "compiler": compiler_hash(),
+            "built_at": time.time(),
+            "entries": entries,
+        },
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(entries), errors
+
+
+class CharacterBundle:
+    """mmap したバンドル。lookup() は元ファイルが変わっていなければ定義を、変わっていれば None を返す。"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a character bundle: {self.path}")
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._map, len(MAGIC))
+        header = pickle.loads(self._map[start:start + header_length])
+        self.data_offset = start + header_length
+        self.schema = header["schema"]
+        self.compiler = header["compiler"]
+        self.entries = header["entries"]
+
+    def is_current(self):
+        return self.schema == SCHEMA_VERSION and self.compiler == compiler_hash()
+
+    def sources_match(self, sources):
+        for directory, name, mtime_ns, size, _ in sources:
+            try:
+                stat = os.stat(ROOT_DIR / directory / name)
+            except OSError:
+                # 無かったファイルが今も無いなら一致
+                if mtime_ns is None:
+                    continue
+                return False
+            if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+                return False
+        return True
+
+    def lookup(self, file_name, skill_level):
+        entry = self.entries.get(file_name)
+        if entry is None or not self.sources_match(entry["sources"]):
+            return None
+        location = entry["levels"].get(skill_level)
+        if location is None:
+            return None
+        offset, length = location
+        start = self.data_offset + offset
+        return pickle.loads(self._map[start:start + length])
+
+    def close(self):
+        self._map.close()
+
+
+_lock = threading.Lock()
+# (バンドルファイルの mtime_ns, サイズ, CharacterBundle か None)
+_loaded = None
+
+
+def get_bundle(path=BUNDLE_PATH):
+    """使えるバンドルを返す (無い・壊れている・コンパイラが変わったなら None)。ファイルが置き換われば読み直す。"""
+    global _loaded
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    loaded = _loaded
+    if loaded is not None and loaded[0] == key:
+        return loaded[1]
+    with _lock:
+        if _loaded is not None and _loaded[0] == key:
+            return _loaded[1]
+        try:
+            bundle = CharacterBundle(path)
+        except (OSError, ValueError, pickle.UnpicklingError, KeyError, EOFError):
+            bundle = None
+        if bundle is not None and not bundle.is_current():
+            bundle.close()
+            bundle = None
+        _loaded = (key, bundle)
+        return bundle
+
+
+def lookup(file_name, skill_level):
+    """ビルド済みのキャラ定義 (新しい dict)。使えなければ None。"""
+    bundle = get_bundle()
+    if bundle is None:
+        return None
+    return bundle.lookup(file_name, skill_level)
+
+
+def needs_rebuild(path=BUNDLE_PATH, character_dir=CHARACTER_DIR):
+    """バンドルが無い・古い・元ファイルと食い違う (追加・削除・更新) なら True。"""
+    bundle = get_bundle(path)
+    if bundle is None:
+        return True
+    names = {p.name for p in Path(character_dir).glob("*.json")}
+    if names != set(bundle.entries):
+        return True
+    return not all(bundle.sources_match(entry["sources"]) for entry in bundle.entries.values())
+
+
+_build_lock = threading.Lock()
+_build_thread = None
+
+
+def ensure_bundle(path=BUNDLE_PATH):
+    """バンドルが古ければバックグラウンドで作り直す。完了は待たない (その間は JSON から作られる)。"""
+    global _build_thread
+    if not needs_rebuild(path):
+        return False
+    with _build_lock:
+        if _build_thread is None or not _build_thread.is_alive():
+            _build_thread = threading.Thread(
+                target=_background_build,
+                args=(path,),
+                name="character-bundle-build",
+                daemon=True,
+            )
+            _build_thread.start()
+    return True
+
+
+def _background_build(path):
+    try:
+        build_bundle(path)
+    except Exception as exc:
+        print(f"[bundle] build failed: {type(exc).__name__}: {exc}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile characters/ and weapons/ into a per-skill-level bundle for fast simulator start-up."
+    )
+    parser.add_argument("--output", type=Path, default=BUNDLE_PATH, help="出力するバンドルファイル")
+    parser.add_argument("--check", action="store_true", help="ビルドせず、既存バンドルの古いキャラを表示する")
+    args = parser.parse_args()
+
+    if args.check:
+        bundle = CharacterBundle(args.output) if args.output.exists() else None
+        if bundle is None:
+            print(f"No bundle: {args.output}")
+            return 1
+        if not bundle.is_current():
+            print("Bundle was built by a different compiler/schema; rebuild it.")
+            return 1
+        stale = [name for name, entry in bundle.entries.items() if not bundle.sources_match(entry["sources"])]
+        known = set(bundle.entries)
+        added = [path.name for path in CHARACTER_DIR.glob("*.json") if path.name not in known]
+        for name in sorted(stale):
+            print(f"stale: {name}")
+        for name in sorted(added):
+            print(f"missing: {name}")
+        print(f"{len(bundle.entries)} character(s), {len(stale)} stale, {len(added)} missing")
+        return 1 if stale or added else 0
+
+    started = time.perf_counter()
+    count, errors = build_bundle(args.output)
+    for name, error in errors.items():
+        print(f"[bundle] skip {name}: {error}")
+    size = args.output.stat().st_size
+    print(
+        f"{count} character(s) x {len(SKILL_LEVELS)} skill levels -> {args.output} "
+        f"({size / 1024:.1f} KiB, {time.perf_counter() - started:.2f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
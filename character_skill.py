@@ -90,6 +90,18 @@ class CharacterSkillMixin:
                 elif trigger_type == 'reload_complete': is_triggered = True
                 # ▲▲▲ 追加ここまで ▲▲▲
                 
+                elif trigger_type in ['pellet_hit', 'critical_hit', 'core_hit', 'non_core_hit'] and getattr(simulator, 'expected_value', False):
+                    # ▼▼▼ 追加: 期待値モードでは小数の累積回数が閾値をまたいだ回数だけ発動する ▼▼▼
+                    # trigger_value<=0 (1ヒットごと) は閾値1として扱う。端数の扱いは expected_count_policy に従う
+                    interval = skill.trigger_value if skill.trigger_value > 0 else 1
+                    offset = simulator.expected_count_offset
+                    prev_count = int(((val - delta) / interval) + offset + 1e-9)
+                    curr_count = int((val / interval) + offset + 1e-9)
+                    count_diff = curr_count - prev_count
+                    if count_diff > 0:
+                        is_triggered = True
+                        trigger_count = count_diff
+                    # ▲▲▲ 追加ここまで ▲▲▲
                 elif trigger_type in ['pellet_hit', 'critical_hit', 'core_hit', 'non_core_hit']:
                     if skill.trigger_value <= 0:
                         is_triggered = delta > 0
@@ -1,5 +1,6 @@
 import random
 from utils import round_half_up  # ★追加
+from models import BASE_FPS
 
 class CharacterStatsMixin:
     def get_current_atk(self, frame):
@@ -13,6 +14,10 @@ class CharacterStatsMixin:
         return (self.base_atk * (1.0 + atk_rate)) + atk_fixed
 
     def calculate_strict_damage(self, mult, profile, is_full_burst, frame, enemy_def=0, enemy_element="None", enemy_core_size=3.0, enemy_size=5.0, debuff_manager=None):
+        expected_mode = getattr(self, 'expected_value', False)
+        if expected_mode:
+            self.last_hit_expectation = 1.0
+
         # 1. 攻撃力計算
         final_atk = self.get_current_atk(frame)
         
@@ -83,29 +88,48 @@ class CharacterStatsMixin:
         
         can_core_hit = profile.get('is_weapon_attack', False) or profile.get('enable_core_hit', False)
         is_core = False
+        core_ratio = 0.0
         if can_core_hit:
             fixed_core_rate = self.buff_manager.get_total_value('core_hit_rate_fixed', frame)
             if fixed_core_rate > 0: core_prob = 1.0
             else: core_prob = min(1.0, (enemy_core_size / current_hit_size) ** 2)
             if core_prob > hit_prob: core_prob = hit_prob
-            is_core = random.random() < (core_prob / hit_prob)
+            core_ratio = core_prob / hit_prob
+            if not expected_mode:
+                is_core = random.random() < core_ratio
 
-        is_hit = random.random() < hit_prob
-        if not is_hit: return 0.0, False, False
-        
-        if is_core:
-            core_dmg_buff = self.buff_manager.get_total_value('core_dmg_buff', frame)
-            bucket_crit_bonus += (1.0 + core_dmg_buff)
-            
-        # クリティカル判定
+        # クリティカル率
         crit_rate = profile['crit_rate'] + self.buff_manager.get_total_value('crit_rate_buff', frame)
         if profile.get('is_weapon_attack', False):
             crit_rate += self.buff_manager.get_total_value('normal_attack_crit_rate_buff', frame)
-        is_crit_hit = False
-        if random.random() < crit_rate or profile.get('force_critical', False):
-            crit_dmg_buff = self.buff_manager.get_total_value('crit_dmg_buff', frame)
-            bucket_crit_bonus += (0.50 + crit_dmg_buff)
-            is_crit_hit = True
+
+        if expected_mode:
+            # ▼▼▼ 追加: 期待値モード (乱数を使わず確率で重み付け) ▼▼▼
+            # 命中は hit_prob 倍、コア/クリティカルはクリティカルレイヤーへ確率分だけ加算する。
+            # is_crit_hit / is_core には「この1発あたりの期待クリティカル数/コアヒット数」(0.0～1.0) を返す。
+            crit_prob = 1.0 if profile.get('force_critical', False) else min(1.0, max(0.0, crit_rate))
+            if core_ratio > 0:
+                bucket_crit_bonus += core_ratio * (1.0 + self.buff_manager.get_total_value('core_dmg_buff', frame))
+            if crit_prob > 0:
+                bucket_crit_bonus += crit_prob * (0.50 + self.buff_manager.get_total_value('crit_dmg_buff', frame))
+            self.last_hit_expectation = hit_prob
+            is_crit_hit = crit_prob * hit_prob
+            is_core = core_ratio * hit_prob
+            # ▲▲▲ 追加ここまで ▲▲▲
+        else:
+            is_hit = random.random() < hit_prob
+            if not is_hit: return 0.0, False, False
+
+            if is_core:
+                core_dmg_buff = self.buff_manager.get_total_value('core_dmg_buff', frame)
+                bucket_crit_bonus += (1.0 + core_dmg_buff)
+
+            # クリティカル判定
+            is_crit_hit = False
+            if random.random() < crit_rate or profile.get('force_critical', False):
+                crit_dmg_buff = self.buff_manager.get_total_value('crit_dmg_buff', frame)
+                bucket_crit_bonus += (0.50 + crit_dmg_buff)
+                is_crit_hit = True
         
         # 最終的なクリティカルレイヤー倍率
         layer_crit = 1.0 + bucket_crit_bonus
@@ -200,6 +224,8 @@ class CharacterStatsMixin:
         # ▲▲▲ 修正ここまで ▲▲▲
 
         total_dmg = layer_atk * layer_weapon * layer_crit * layer_charge * layer_dmg * layer_split * layer_taken * layer_elem * layer_special
+        if expected_mode:
+            total_dmg *= hit_prob
         if self.name == "ウンファ：タクティカル・アップ":
             if mult > 1:
                 print(f"--- [DEBUG] Damage Calc ({self.name}) ---")
@@ -252,7 +278,7 @@ class CharacterStatsMixin:
             fixed_charge_times = self.buff_manager.get_active_buffs('charge_time_fixed', frame)
             if fixed_charge_times:
                 fixed_seconds = min(fixed_charge_times)
-                return max(1, int(round_half_up(fixed_seconds * 60)))
+                return max(1, int(round_half_up(fixed_seconds * self.fps)))
 
         # バフ無効化のチェック
         if frame_type == 'reload' and getattr(self.weapon, 'disable_reload_buffs', False): return int(original_frame)
@@ -299,9 +325,10 @@ class CharacterStatsMixin:
             rate = self.buff_manager.get_total_value_with_filter(f'{frame_type}_speed_rate', frame, allowed_tags)
             fixed = 0
             if frame_type in ['reload', 'charge']:
-                fixed = self.buff_manager.get_total_value_with_filter(f'{frame_type}_speed_fixed', frame, allowed_tags)
+                # *_speed_fixed は BASE_FPS 基準のフレーム数、charge_time_cut は秒
+                fixed = self.buff_manager.get_total_value_with_filter(f'{frame_type}_speed_fixed', frame, allowed_tags) * self.fps / BASE_FPS
                 if frame_type == 'charge':
-                    fixed += self.buff_manager.get_total_value_with_filter('charge_time_cut', frame, allowed_tags) * 60
+                    fixed += self.buff_manager.get_total_value_with_filter('charge_time_cut', frame, allowed_tags) * self.fps
 
             if rate <= -1.0: rate = -0.99
             
@@ -318,9 +345,9 @@ class CharacterStatsMixin:
         # 固定値バフはリロードとチャージにのみ適用
         fixed = 0
         if frame_type in ['reload', 'charge']:
-            fixed = self.buff_manager.get_total_value(f'{frame_type}_speed_fixed', frame)
+            fixed = self.buff_manager.get_total_value(f'{frame_type}_speed_fixed', frame) * self.fps / BASE_FPS
             if frame_type == 'charge':
-                fixed += self.buff_manager.get_total_value('charge_time_cut', frame) * 60
+                fixed += self.buff_manager.get_total_value('charge_time_cut', frame) * self.fps
         
         if frame_type == 'attack':
             return self.calculate_reduced_frame_attack(original_frame, rate, fixed)
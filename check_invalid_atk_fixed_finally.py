@@ -1,37 +1,15 @@
 import argparse
 import json
-from pathlib import Path
 
-
-def iter_json_files(paths):
-    for raw_path in paths:
-        path = Path(raw_path)
-        if path.is_file() and path.suffix.lower() == ".json":
-            yield path
-        elif path.is_dir():
-            yield from sorted(path.rglob("*.json"))
+from validate_characters import iter_findings, iter_json_files
 
 
 def find_invalid_atk_fixed_finally(node, path="$"):
-    if isinstance(node, dict):
-        kwargs = node.get("kwargs") if isinstance(node.get("kwargs"), dict) else {}
-        if (
-            kwargs.get("buff_type") == "atk_buff_fixed"
-            and kwargs.get("target_stat") == "atk"
-            and kwargs.get("stat_type") == "finally"
-        ):
-            yield {
-                "path": path,
-                "name": node.get("name", ""),
-                "effect_type": node.get("effect_type", ""),
-                "effect_no": kwargs.get("effect_no", ""),
-            }
-
-        for key, value in node.items():
-            yield from find_invalid_atk_fixed_finally(value, f"{path}.{key}")
-    elif isinstance(node, list):
-        for index, value in enumerate(node):
-            yield from find_invalid_atk_fixed_finally(value, f"{path}[{index}]")
+    # 判定は validate_characters のルールと共通
+    for _, finding in iter_findings(node, ["atk_fixed_finally"]):
+        if path != "$":
+            finding["path"] = path + finding["path"][1:]
+        yield finding
 
 
 def main():
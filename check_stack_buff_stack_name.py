@@ -1,34 +1,15 @@
 import argparse
 import json
-from pathlib import Path
 
-
-def iter_json_files(paths):
-    for raw_path in paths:
-        path = Path(raw_path)
-        if path.is_file() and path.suffix.lower() == ".json":
-            yield path
-        elif path.is_dir():
-            yield from sorted(path.rglob("*.json"))
+from validate_characters import iter_findings, iter_json_files
 
 
 def find_missing_stack_names(node, path="$"):
-    if isinstance(node, dict):
-        effect_type = node.get("effect_type")
-        kwargs = node.get("kwargs") if isinstance(node.get("kwargs"), dict) else {}
-        if effect_type == "stack_buff" and not kwargs.get("stack_name"):
-            yield {
-                "path": path,
-                "name": node.get("name", ""),
-                "buff_type": kwargs.get("buff_type", ""),
-                "effect_no": kwargs.get("effect_no", ""),
-            }
-
-        for key, value in node.items():
-            yield from find_missing_stack_names(value, f"{path}.{key}")
-    elif isinstance(node, list):
-        for index, value in enumerate(node):
-            yield from find_missing_stack_names(value, f"{path}[{index}]")
+    # 判定は validate_characters のルールと共通
+    for _, finding in iter_findings(node, ["stack_name"]):
+        if path != "$":
+            finding["path"] = path + finding["path"][1:]
+        yield finding
 
 
 def main():
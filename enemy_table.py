@@ -0,0 +1,80 @@
+from buff_manager import BuffManager
+
+# --- 敵テーブル (複数体の敵の状態を列ごとに保持) ---
+
+# 敵定義で受け付けるキーと既定値
+ENEMY_FIELDS = ('hp', 'defense', 'element', 'core_size', 'size')
+
+
+class EnemyTable:
+    """敵ごとの HP・防御・属性・コアサイズ・サイズ・デバフを列(リスト)単位で保持する。
+    index 0 が主目標 (通常攻撃・単体スキル・DoT の対象)。
+    キャラの与ダメージ集計は主目標の分だけで、全体攻撃で他の敵に入った分は damage_taken にだけ残る。"""
+
+    def __init__(self, specs):
+        if not specs:
+            raise ValueError("敵が1体も定義されていません")
+        count = len(specs)
+        self.max_hp = [None] * count
+        self.hp = [None] * count
+        self.defense = [0] * count
+        self.element = ["None"] * count
+        self.core_size = [3.0] * count
+        self.size = [5.0] * count
+        self.debuffs = [BuffManager() for _ in range(count)]
+        self.damage_taken = [0.0] * count
+        self.defeated_frame = [None] * count
+
+        for i, spec in enumerate(specs):
+            hp = spec.get('hp')
+            if hp is not None and float(hp) > 0:
+                self.max_hp[i] = float(hp)
+                self.hp[i] = float(hp)
+            self.defense[i] = spec.get('defense', spec.get('def', 0)) or 0
+            self.element[i] = spec.get('element', "None") or "None"
+            self.core_size[i] = float(spec.get('core_size', 3.0))
+            self.size[i] = float(spec.get('size', 5.0))
+
+    @classmethod
+    def uniform(cls, count, element="None", core_size=3.0, size=5.0, defense=0, hp=None):
+        """同一ステータスの敵を count 体並べたテーブルを作る (従来の enemy_count 指定用)。"""
+        spec = {'element': element, 'core_size': core_size, 'size': size, 'defense': defense, 'hp': hp}
+        return cls([dict(spec) for _ in range(max(1, int(count)))])
+
+    def __len__(self):
+        return len(self.debuffs)
+
+    def target_indices(self, all_enemies=False):
+        if all_enemies:
+            return range(len(self.debuffs))
+        return (0,)
+
+    def damage_args(self, index):
+        """calculate_strict_damage に渡す敵側パラメータ (def, element, core_size, size, debuffs)。"""
+        return (self.defense[index], self.element[index], self.core_size[index], self.size[index], self.debuffs[index])
+
+    def apply_damage(self, index, amount, frame=None):
+        self.damage_taken[index] += amount
+        hp = self.hp[index]
+        if hp is None:
+            return
+        hp -= amount
+        self.hp[index] = hp
+        if hp <= 0 and self.defeated_frame[index] is None:
+            self.defeated_frame[index] = frame
+
+    def summary(self):
+        return [
+            {
+                'index': i,
+                'element': self.element[i],
+                'coreSize': self.core_size[i],
+                'size': self.size[i],
+                'defense': self.defense[i],
+                'maxHp': self.max_hp[i],
+                'remainingHp': self.hp[i],
+                'damageTaken': self.damage_taken[i],
+                'defeatedFrame': self.defeated_frame[i],
+            }
+            for i in range(len(self.debuffs))
+        ]
@@ -1,18 +1,29 @@
 import os
 import shutil
 import random
-from models import DamageProfile, Skill, WeaponConfig
-from buff_manager import BuffManager
+from models import DamageProfile, Skill, WeaponConfig, SymbolTable, BASE_FPS
+from enemy_table import EnemyTable
 from character import Character
 from engine_skills import SkillEngineMixin
 from engine_burst import BurstEngineMixin
 
+# 1戦闘の標準時間 (秒)
+DEFAULT_DURATION_SECONDS = 180
+
+# 期待値モードでの小数カウントの整数化ポリシー (積算開始オフセット)
+EXPECTED_COUNT_OFFSETS = {"carry": 0.0, "round": 0.5}
+
 # --- シミュレーターエンジン (統括) ---
 
 class NikkeSimulator(SkillEngineMixin, BurstEngineMixin):
-    def __init__(self, characters, burst_rotation, enemy_element="None", enemy_core_size=3.0, enemy_size=5.0, part_break_mode=False, burst_charge_time=5.0, log_file_path="simulation_log.txt", enemy_count=1, enable_logs=True):
-        self.FPS = 60
-        self.TOTAL_FRAMES = 180 * self.FPS
+    def __init__(self, characters, burst_rotation, enemy_element="None", enemy_core_size=3.0, enemy_size=5.0, part_break_mode=False, burst_charge_time=5.0, log_file_path="simulation_log.txt", enemy_count=1, enable_logs=True, expected_value=False, expected_count_policy="carry", enemies=None, enemy_hp=None, fps=BASE_FPS, duration_seconds=DEFAULT_DURATION_SECONDS):
+        # ▼▼▼ 修正: フレームレートと戦闘時間を引数化 (JSONのフレーム値は BASE_FPS 基準で換算) ▼▼▼
+        self.FPS = int(fps)
+        if self.FPS <= 0:
+            raise ValueError(f"fps must be positive: {fps}")
+        self.DURATION_SECONDS = float(duration_seconds)
+        self.TOTAL_FRAMES = int(round(self.DURATION_SECONDS * self.FPS))
+        # ▲▲▲ 修正ここまで ▲▲▲
         # ▼▼▼ 修正: キャラクターリストの強制重複排除 ▼▼▼
         # リスト内に同じ名前のキャラが複数いても、ここで1体に絞り込みます
         unique_char_map = {}
@@ -27,21 +38,60 @@ class NikkeSimulator(SkillEngineMixin, BurstEngineMixin):
         self.burst_rotation = burst_rotation 
         self.burst_indices = [0, 0, 0] 
         
-        self.ENEMY_DEF = 0 
-        self.enemy_element = enemy_element
-        self.enemy_core_size = enemy_core_size
-        self.enemy_size = enemy_size
+        # ▼▼▼ 追加: 敵テーブル (複数体の敵ごとの HP/防御/属性/サイズ/デバフ) ▼▼▼
+        # enemies を省略した場合は従来通り enemy_count 体の同一ステータスの敵を並べる
+        if enemies:
+            specs = []
+            for spec in enemies:
+                merged = {'element': enemy_element, 'core_size': enemy_core_size, 'size': enemy_size, 'defense': 0}
+                merged.update({k: v for k, v in spec.items() if v is not None})
+                specs.append(merged)
+            self.enemies = EnemyTable(specs)
+        else:
+            self.enemies = EnemyTable.uniform(enemy_count, element=enemy_element, core_size=enemy_core_size, size=enemy_size)
+        # ▼▼▼ 追加: ボスHP (主目標のHPを倒した時点で戦闘終了) ▼▼▼
+        if enemy_hp is not None and float(enemy_hp) > 0:
+            self.enemies.max_hp[0] = float(enemy_hp)
+            self.enemies.hp[0] = float(enemy_hp)
+        self.kill_frame = None
+        # ▲▲▲ 追加ここまで ▲▲▲
         self.part_break_mode = part_break_mode
         self.burst_charge_time = burst_charge_time
-        self.enemy_count = enemy_count
+        self.enemy_count = len(self.enemies)
         self.total_ally_ammo_consumed = 0
         self.enable_logs = enable_logs
         
-        # 敵へのデバフ(全員で共有)
-        self.enemy_debuffs = BuffManager()
+        # 敵へのデバフ (主目標 = 敵テーブルの先頭)
+        self.enemy_debuffs = self.enemies.debuffs[0]
+        self.current_frame = 0
         
         # 1フレーム内で実行されたスキルのIDを記録するセット (多重発動防止用)
+        # キーは SymbolTable の整数IDで構成したタプル
         self.executed_skill_ids = set()
+
+        # ▼▼▼ 追加: 期待値モード (乱数を使わず確率で重み付けした1回の決定的な実行) ▼▼▼
+        # expected_count_policy: 小数の累積ヒット数・確率発動をどこで整数化するか
+        #   "carry": 累積値が整数をまたいだときに発動 (切り捨て、端数は次へ持ち越し)
+        #   "round": 累積値の四捨五入が変わったときに発動 (0.5 から積算開始)
+        if expected_count_policy not in EXPECTED_COUNT_OFFSETS:
+            raise ValueError(f"Unknown expected_count_policy: {expected_count_policy}")
+        self.expected_value = bool(expected_value)
+        self.expected_count_policy = expected_count_policy
+        self.expected_count_offset = EXPECTED_COUNT_OFFSETS[expected_count_policy]
+        self.expected_proc_carry = {}
+        for char in self.characters:
+            char.set_fps(self.FPS)
+            char.expected_value = self.expected_value
+            char.enemy_damage_sink = self.record_enemy_damage
+        # ▲▲▲ 追加ここまで ▲▲▲
+
+        # ▼▼▼ 追加: 名前→整数IDのシンボル表 (キャラ・スキル・トリガー種別・スタック名) ▼▼▼
+        self.symbols = SymbolTable()
+        for char in self.characters:
+            char.symbol_id = self.symbols.intern(char.name)
+            for s in char.skills:
+                self.assign_skill_symbols(s)
+        # ▲▲▲ 追加ここまで ▲▲▲
         
         self.log_handles = {}
         self.hp_log_handle = None
@@ -73,6 +123,78 @@ class NikkeSimulator(SkillEngineMixin, BurstEngineMixin):
         
         self.scheduled_actions = []
 
+    # 主目標 (敵テーブル index 0) のステータスは従来の属性名でも参照できる
+    @property
+    def ENEMY_DEF(self):
+        return self.enemies.defense[0]
+
+    @ENEMY_DEF.setter
+    def ENEMY_DEF(self, value):
+        self.enemies.defense[0] = value
+
+    @property
+    def enemy_element(self):
+        return self.enemies.element[0]
+
+    @enemy_element.setter
+    def enemy_element(self, value):
+        self.enemies.element[0] = value
+
+    @property
+    def enemy_core_size(self):
+        return self.enemies.core_size[0]
+
+    @enemy_core_size.setter
+    def enemy_core_size(self, value):
+        self.enemies.core_size[0] = value
+
+    @property
+    def enemy_size(self):
+        return self.enemies.size[0]
+
+    @enemy_size.setter
+    def enemy_size(self, value):
+        self.enemies.size[0] = value
+
+    def calculate_enemy_damage(self, char, mult, profile, is_full_burst, frame, enemy_index=0):
+        enemy_def, element, core_size, size, debuffs = self.enemies.damage_args(enemy_index)
+        return char.calculate_strict_damage(
+            mult, profile, is_full_burst, frame,
+            enemy_def, element, core_size, size,
+            debuff_manager=debuffs
+        )
+
+    def record_enemy_damage(self, char, amount, enemy_index=0):
+        self.enemies.apply_damage(enemy_index, amount, self.current_frame)
+        if enemy_index == 0 and self.kill_frame is None and self.enemies.defeated_frame[0] is not None:
+            self.kill_frame = self.enemies.defeated_frame[0]
+            self.log(f"[Kill] Boss defeated at {self.kill_frame / self.FPS:.2f}s by {char.name}", target_name="System")
+
+    @property
+    def time_to_kill(self):
+        """主目標を倒すまでの秒数 (HP未指定または時間内に倒せなかった場合は None)。"""
+        if self.kill_frame is None:
+            return None
+        return self.kill_frame / self.FPS
+
+    def assign_skill_symbols(self, skill):
+        """スキル名・トリガー種別・スタック名のIDを割り当ててスキルに持たせる (重複防止キーで使う)。"""
+        skill.symbol_id = self.symbols.intern(skill.name)
+        skill.trigger_symbol = self.symbols.intern(skill.trigger_type)
+        stack_name = skill.kwargs.get('stack_name')
+        skill.stack_symbol = self.symbols.intern(stack_name) if stack_name is not None else None
+        return skill.symbol_id
+
+    def symbol_of(self, obj):
+        """キャラ/スキルのシンボルIDを返す。実行時に生成された一時スキルはここで遅延割り当てする。"""
+        sid = getattr(obj, 'symbol_id', None)
+        if sid is None:
+            if isinstance(obj, Skill):
+                return self.assign_skill_symbols(obj)
+            sid = self.symbols.intern(obj.name)
+            obj.symbol_id = sid
+        return sid
+
     def record_ammo_consumed(self, character, amount, frame, is_full_burst):
         amount = int(amount)
         if amount <= 0:
@@ -101,6 +223,7 @@ class NikkeSimulator(SkillEngineMixin, BurstEngineMixin):
         #pass #計測のため無効化
 
     def tick(self, frame):
+        self.current_frame = frame
         self.executed_skill_ids.clear()
         self.tick_burst_state(frame)
         self.update_cooldowns()
@@ -122,12 +245,12 @@ class NikkeSimulator(SkillEngineMixin, BurstEngineMixin):
         # ▲▲▲ 追加ここまで ▲▲▲
 
         # ▼▼▼ 追加: HPログ出力 (1秒ごとに記録) ▼▼▼
-        if self.enable_logs and frame % 60 == 0:
+        if self.enable_logs and frame % self.FPS == 0:
             for char in self.characters:
                 # 最大HP計算 (stats.pyのメソッドが必要)
                 max_hp = char.get_current_max_hp(frame)
                 ratio = (char.current_hp / max_hp * 100) if max_hp > 0 else 0
-                self.hp_log_handle.write(f"{frame/60:.2f},{char.name},{char.current_hp:.0f},{max_hp:.0f},{ratio:.2f}\n")
+                self.hp_log_handle.write(f"{frame/self.FPS:.2f},{char.name},{char.current_hp:.0f},{max_hp:.0f},{ratio:.2f}\n")
         # ▲▲▲ 追加ここまで ▲▲▲
 
 
@@ -151,21 +274,17 @@ class NikkeSimulator(SkillEngineMixin, BurstEngineMixin):
             char.active_hots = active_hots
             # ▲▲▲
             
-            if frame % 60 == 0:
+            if frame % self.FPS == 0:
                 damage_dot = 0
                 for name, dot in list(char.active_dots.items()):
                     if frame <= dot['end_frame']:
                         total_mult = dot['multiplier'] * dot.get('count', 1)
                         profile = dot.get('profile', DamageProfile.create())
                         # ▼▼▼ 修正: 戻り値を3つ受け取る (dmg, _, _) ▼▼▼
-                        dmg, _, _ = char.calculate_strict_damage(
-                            total_mult, profile, is_full_burst, frame, 
-                            self.ENEMY_DEF, self.enemy_element, self.enemy_core_size, self.enemy_size,
-                            debuff_manager=self.enemy_debuffs
-                        )
+                        dmg, _, _ = self.calculate_enemy_damage(char, total_mult, profile, is_full_burst, frame)
                         # ▲▲▲ 修正ここまで ▲▲▲
                         
-                        self.log(f"[DoT] 時間:{frame/60:>6.2f}s | Source:{name} | Dmg:{dmg:10,.0f} | Stacks:{dot.get('count', 1)}", target_name=char.name)
+                        self.log(f"[DoT] 時間:{frame/self.FPS:>6.2f}s | Source:{name} | Dmg:{dmg:10,.0f} | Stacks:{dot.get('count', 1)}", target_name=char.name)
 
                         char.add_damage(name, dmg, hit_count=1, source_type='DoT')
                         damage_dot += dmg
@@ -183,6 +302,9 @@ class NikkeSimulator(SkillEngineMixin, BurstEngineMixin):
         try:
             self.process_trigger_global('on_start', 0)
             for frame in range(1, self.TOTAL_FRAMES + 1):
+                # ボスHPが尽きたら以降のフレームは計算しない
+                if self.kill_frame is not None:
+                    break
                 self.tick(frame)
         finally:
             for f in self.log_handles.values():
@@ -1,7 +1,12 @@
-from models import DamageProfile, Skill, WeaponConfig
+from models import DamageProfile, Skill, WeaponConfig, BASE_FPS
 from utils import round_half_up
 import random
 
+# executed_skill_ids のガード種別 (キー先頭要素)
+GUARD_NAME_CHECK = 0
+GUARD_FINAL = 1
+GUARD_STACK_INC = 2
+
 class SkillEngineMixin:
     def _skill_cooldown_frames(self, skill):
         cooldown_sec = getattr(skill, 'individual_cooldown_time', None)
@@ -99,23 +104,24 @@ class SkillEngineMixin:
             return numeric
 
         mode = str(mode)
+        # *_speed_fixed は BASE_FPS 基準のフレーム数で保持する (実フレームへの換算は get_buffed_frames 側)
         if buff_type in ['charge_speed_fixed', 'reload_speed_fixed']:
             if mode in ['frames', 'frame']:
                 return numeric
             if mode in ['seconds', 'second', 'sec']:
-                return numeric * self.FPS
+                return numeric * BASE_FPS
             if mode in ['target_charge_frame_ratio', 'target_charge_frames_percent', 'target_base_charge_ratio']:
-                base_frames = getattr(target.weapon, 'charge_time', 0) * self.FPS if target else 0
+                base_frames = getattr(target.weapon, 'charge_time', 0) * BASE_FPS if target else 0
                 return base_frames * numeric
             if mode in ['caster_charge_frame_ratio', 'caster_charge_frames_percent', 'caster_base_charge_ratio']:
-                base_frames = getattr(caster.weapon, 'charge_time', 0) * self.FPS if caster else 0
+                base_frames = getattr(caster.weapon, 'charge_time', 0) * BASE_FPS if caster else 0
                 return base_frames * numeric
 
         if buff_type == 'charge_time_cut':
             if mode in ['seconds', 'second', 'sec']:
                 return numeric
             if mode in ['frames', 'frame']:
-                return numeric / self.FPS
+                return numeric / BASE_FPS
             if mode in ['target_charge_frame_ratio', 'target_charge_frames_percent', 'target_base_charge_ratio']:
                 base_seconds = getattr(target.weapon, 'charge_time', 0) if target else 0
                 return base_seconds * numeric
@@ -347,9 +353,17 @@ class SkillEngineMixin:
         # kwargsに "probability" が設定されている場合、その確率(%)で判定を行う
         proc_rate = skill.kwargs.get('probability')
         if proc_rate is not None:
+            if self.expected_value:
+                # 期待値モード: スキルごとの確率を積算し、整数をまたいだときだけ発動する (乱数なし)
+                carry_key = (self.symbol_of(caster) if caster is not None else -1, self.symbol_of(skill))
+                carry = self.expected_proc_carry.get(carry_key, self.expected_count_offset) + float(proc_rate) / 100.0
+                if carry + 1e-9 < 1.0:
+                    self.expected_proc_carry[carry_key] = carry
+                    return False
+                self.expected_proc_carry[carry_key] = carry - 1.0
             # 0～100の乱数を生成し、確率より大きければ発動しない (Falseを返す)
             # 例: probability: 10 (10%) -> randomが 10.1 なら False
-            if random.random() * 100 > float(proc_rate):
+            elif random.random() * 100 > float(proc_rate):
                 return False
         # ▲▲▲ 追加ここまで ▲▲▲
 
@@ -630,7 +644,9 @@ class SkillEngineMixin:
                 return 0
             skill.last_used_frame = frame
             
-            unique_key = f"NAME_CHECK::{caster.name}::{skill.name}::{skill.trigger_type}"
+            # symbol_of が一時スキルの trigger_symbol も割り当てるので、先に呼ぶ
+            skill_sid = self.symbol_of(skill)
+            unique_key = (GUARD_NAME_CHECK, self.symbol_of(caster), skill_sid, skill.trigger_symbol)
             if unique_key in self.executed_skill_ids:
                 return 0
             self.executed_skill_ids.add(unique_key)
@@ -862,7 +878,8 @@ class SkillEngineMixin:
             tag = kwargs.get('tag')
             if tag:
                 if skill.target == 'enemy':
-                    self.enemy_debuffs.remove_buffs_by_tag(tag, frame)
+                    for enemy_debuffs in self.enemies.debuffs:
+                        enemy_debuffs.remove_buffs_by_tag(tag, frame)
                     self.log(f"[Remove Buff] Removed enemy buffs with tag '{tag}'", target_name=caster.name)
                 else:
                     for target in targets:
@@ -953,7 +970,8 @@ class SkillEngineMixin:
             for tag in skill.remove_tags:
                 for t in targets:
                     t.buff_manager.remove_buffs_by_tag(tag, frame)
-                self.enemy_debuffs.remove_buffs_by_tag(tag, frame)
+                for enemy_debuffs in self.enemies.debuffs:
+                    enemy_debuffs.remove_buffs_by_tag(tag, frame)
                 self.log(f"[Remove] Removed tags {tag} from targets via {skill.name}", target_name=caster.name)
 
         # 3. 最終防衛ライン（バフ適用ループ）
@@ -966,7 +984,7 @@ class SkillEngineMixin:
             if not targets: return 0
             for target in targets:
                 # ★重複ガード★ 同一フレーム・同一キャラ・同一スキルなら適用しない
-                apply_guard_key = f"FINAL_GUARD::{frame}::{target.name}::{skill.name}"
+                apply_guard_key = (GUARD_FINAL, frame, self.symbol_of(target), self.symbol_of(skill))
                 if apply_guard_key in self.executed_skill_ids:
                     continue
                 self.executed_skill_ids.add(apply_guard_key)
@@ -1018,8 +1036,8 @@ class SkillEngineMixin:
                         old_max_hp = target.get_current_max_hp(frame)
                     applied_val = self._convert_timed_speed_value(b_type, val, kwargs, caster, target)
 
-                    manager.add_buff(
-                        b_type, applied_val, dur, frame, source=buff_source,
+                    buff_args = dict(
+                        source=buff_source,
                         stack_name=stack_name,
                         max_stack=max_stack, tag=tag,
                         shot_duration=shot_dur, remove_on_reload=rem_reload,
@@ -1028,6 +1046,12 @@ class SkillEngineMixin:
                         disable_stack_increase=disable_inc, # ← 引数渡し
                         allow_tags=allow_tags # ← 渡す
                     )
+                    manager.add_buff(b_type, applied_val, dur, frame, **buff_args)
+                    # ▼▼▼ 追加: enemy_target: "all" なら主目標以外の敵にも同じデバフを付与 ▼▼▼
+                    if skill.target == 'enemy' and kwargs.get('enemy_target') == 'all':
+                        for other_debuffs in self.enemies.debuffs[1:]:
+                            other_debuffs.add_buff(b_type, applied_val, dur, frame, **buff_args)
+                    # ▲▲▲ 追加ここまで ▲▲▲
                     
                     t_str = "Enemy" if skill.target == 'enemy' else target.name
                     if stack_name:
@@ -1244,28 +1268,40 @@ class SkillEngineMixin:
                     stack_count = caster.buff_manager.get_stack_count(stack_name, frame)
                     mult *= stack_count
                     self.log(f"[Dmg Scale] Scaled by self stack '{stack_name}': x{stack_count} -> {mult:.4f}", target_name=caster.name)
-                elif kwargs.get('scale_by_target_stack') and targets:
-                    stack_name = kwargs.get('stack_name')
-                    target_stack = self.enemy_debuffs.get_stack_count(stack_name, frame)
-                    mult *= target_stack
-                    self.log(f"[Dmg Scale] Scaled by enemy stack '{stack_name}': x{target_stack} -> {mult:.4f}", target_name=targets[0].name)
-            
+                scale_stack_name = None
+                if 'copy_stack_count' not in kwargs and kwargs.get('scale_by_target_stack') and targets:
+                    scale_stack_name = kwargs.get('stack_name')
+                    target_stack = self.enemy_debuffs.get_stack_count(scale_stack_name, frame)
+                    self.log(f"[Dmg Scale] Scaled by enemy stack '{scale_stack_name}': x{target_stack} -> {mult * target_stack:.4f}", target_name=targets[0].name)
+
+                # ▼▼▼ 追加: 敵全体攻撃 (is_enemy_wide_burst / enemy_target: "all") は敵テーブル全員に適用 ▼▼▼
+                # キャラの与ダメージ・ヒット数は主目標の分だけ数え、他の敵への分は敵テーブルの被ダメージにだけ積む
+                hit_all = profile.get('is_enemy_wide_burst', False) or kwargs.get('enemy_target') == 'all'
                 skill_dmg = 0
-                for _ in range(loops):
-                    # ▼▼▼ 修正: 戻り値を3つ受け取る (d, _, _) ▼▼▼
-                    d, _, _ = caster.calculate_strict_damage(
-                        mult, profile, is_full_burst, frame, 
-                        self.ENEMY_DEF, self.enemy_element, self.enemy_core_size, self.enemy_size,
-                        debuff_manager=self.enemy_debuffs
-                    )
-                    # ▲▲▲ 修正ここまで ▲▲▲
-                    skill_dmg += d
-                
+                other_enemy_dmg = 0
+                for enemy_index in self.enemies.target_indices(hit_all):
+                    enemy_mult = mult
+                    if scale_stack_name is not None:
+                        enemy_mult = mult * self.enemies.debuffs[enemy_index].get_stack_count(scale_stack_name, frame)
+                    enemy_dmg = 0
+                    for _ in range(loops):
+                        # ▼▼▼ 修正: 戻り値を3つ受け取る (d, _, _) ▼▼▼
+                        d, _, _ = self.calculate_enemy_damage(caster, enemy_mult, profile, is_full_burst, frame, enemy_index)
+                        # ▲▲▲ 修正ここまで ▲▲▲
+                        enemy_dmg += d
+                    if enemy_index == 0:
+                        caster.add_damage(skill.name, enemy_dmg, hit_count=max(0, loops), source_type='スキル')
+                        skill_dmg += enemy_dmg
+                    else:
+                        self.record_enemy_damage(caster, enemy_dmg, enemy_index)
+                        other_enemy_dmg += enemy_dmg
+                # ▲▲▲ 追加ここまで ▲▲▲
+
                 if getattr(self, "enable_logs", True):
                     buff_debug = caster.buff_manager.get_active_buffs_debug(frame)
-                    self.log(f"[Skill Dmg] 時間:{frame/60:>6.2f}s | 名前:{skill.name:<25} | Dmg:{skill_dmg:10,.0f} | Hits:{loops} | Buffs:{buff_debug}", target_name=caster.name)
-                
-                caster.add_damage(skill.name, skill_dmg, hit_count=max(0, loops), source_type='スキル')
+                    other_text = f" | 他の敵:{other_enemy_dmg:,.0f}" if other_enemy_dmg else ""
+                    self.log(f"[Skill Dmg] 時間:{frame/self.FPS:>6.2f}s | 名前:{skill.name:<25} | Dmg:{skill_dmg:10,.0f} | Hits:{loops}{other_text} | Buffs:{buff_debug}", target_name=caster.name)
+
                 total_dmg += skill_dmg
 
             elif skill.effect_type == 'periodic_damage':
@@ -1341,7 +1377,7 @@ class SkillEngineMixin:
                 skill_dmg = snapshot_atk * mult * split_layer
 
                 self.log(
-                    f"[Snapshot Dmg] 時間:{frame/60:>6.2f}s | 名前:{skill.name:<25} | "
+                    f"[Snapshot Dmg] 時間:{frame/self.FPS:>6.2f}s | 名前:{skill.name:<25} | "
                     f"Dmg:{skill_dmg:10,.0f} | SnapshotATK:{snapshot_atk:.0f} | "
                     f"Mult:{mult:.4f} | SplitBuff:{split_buff:.4f}",
                     target_name=caster.name
@@ -1382,13 +1418,14 @@ class SkillEngineMixin:
                 record_as_ally_ammo = bool(kwargs.get('record_as_ally_ammo_consumed', False))
                 ammo_consumed_amount = int(kwargs.get('ammo_consumed_amount', abs(delta)))
                 target_stack = kwargs.get('stack_name') # ★追加: 名前を取得
+                self.symbol_of(skill)  # 一時スキルでも stack_symbol を割り当てておく
                 
                 for target in targets:
                     # ★修正: target_stack_name 引数を追加して渡す
                     # ▼▼▼ 追加: 強力な重複適用ガード ▼▼▼
                     # 同一フレーム・同一ターゲット・同一スタック名での増加処理は1回のみ許可する
                     # これにより、allies指定などでループが重複しても、2回目以降は無視される
-                    guard_key = f"STACK_INC_GUARD::{frame}::{target.name}::{target_stack}"
+                    guard_key = (GUARD_STACK_INC, frame, self.symbol_of(target), skill.stack_symbol)
                     if guard_key in self.executed_skill_ids:
                         continue
                     self.executed_skill_ids.add(guard_key)
@@ -1460,14 +1497,14 @@ class SkillEngineMixin:
                     )
                     if 'max_ammo' in new_weapon_data:
                         target.weapon_change_ammo_specified = True
-                        target.weapon = WeaponConfig(new_weapon_data)
+                        target.weapon = WeaponConfig(new_weapon_data).scale_to_fps(self.FPS)
                         target.current_max_ammo = target.weapon.max_ammo
                         target.current_ammo = target.current_max_ammo
                     else:
                         target.weapon_change_ammo_specified = False
                         temp_data = new_weapon_data.copy()
                         temp_data['max_ammo'] = target.current_max_ammo
-                        target.weapon = WeaponConfig(temp_data)
+                        target.weapon = WeaponConfig(temp_data).scale_to_fps(self.FPS)
                     
                     if duration > 0: target.weapon_change_end_frame = frame + (duration * self.FPS)
                     else: target.weapon_change_end_frame = 0
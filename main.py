@@ -1,7 +1,7 @@
 import json
 import os
 from simulator import NikkeSimulator, WeaponConfig, Skill, Character
-import matplotlib.pyplot as plt
+from models import BASE_FPS
 import time
 
 #このコードを読み込めていたら「読み込んだ」と伝えてください
@@ -36,7 +36,7 @@ def create_character_from_json(char_file_path, skill_level=10):
     weapon_data['burst_stage'] = burst_stage
     
     for key, value in stats.items():
-        if key == 'reload_time': weapon_data['reload_frames'] = int(value * 60)
+        if key == 'reload_time': weapon_data['reload_frames'] = int(value * BASE_FPS)
         elif key == 'damage_rate': weapon_data['multiplier'] = value
         elif key == 'ammo': weapon_data['max_ammo'] = value
         else: weapon_data[key] = value
@@ -174,6 +174,10 @@ if not os.path.exists('characters'): os.makedirs('characters')
 # blanching: フルチャージ1秒維持運用の近似として2秒チャージ
 CRUST_OPERATION_MODE = None
 
+# シミュレーションのフレームレートと戦闘時間(秒)。短時間・低FPSにすると粗い近似で高速に回せる
+SIM_FPS = BASE_FPS
+SIM_DURATION_SECONDS = 180
+
 dummy_ct_skill = Skill(
     name="Dummy B1: CT Reduction",
     trigger_type="on_burst_enter", 
@@ -242,7 +246,9 @@ sim = NikkeSimulator(
     enemy_core_size=3.0,
     enemy_size=100,
     part_break_mode=False,
-    burst_charge_time=5.0
+    burst_charge_time=5.0,
+    fps=SIM_FPS,
+    duration_seconds=SIM_DURATION_SECONDS
 )
 # 汎用フラグの設定例
 sim.special_mode = False 
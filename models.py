@@ -1,7 +1,15 @@
 import json
+import sys
+from utils import round_half_up
 
 # --- データ定義 ---
 
+# 武器JSON・スキルJSONのフレーム値はすべてこのフレームレート基準で記述されている
+BASE_FPS = 60
+
+# WeaponConfig のうちフレーム単位の属性
+WEAPON_FRAME_FIELDS = ('reload_frames', 'windup_frames', 'winddown_frames', 'fire_interval')
+
 class WeaponConfig:
     def __init__(self, data):
         self.name = data.get('name', 'Unknown Weapon')
@@ -76,6 +84,40 @@ class WeaponConfig:
             self.mg_max_warmup = current_sum + self.windup_frames
             # ▲▲▲ 修正ここまで ▲▲▲
 
+        # ▼▼▼ 追加: フレームレート変更用に BASE_FPS 基準の値を保持 ▼▼▼
+        self.fps = BASE_FPS
+        self._base_frames = {field: getattr(self, field) for field in WEAPON_FRAME_FIELDS}
+        self._base_mg_warmup_map = [dict(entry) for entry in self.mg_warmup_map]
+        self._base_mg_warmup_sum = self.mg_max_warmup - self.windup_frames
+        # ▲▲▲ 追加ここまで ▲▲▲
+
+    def scale_to_fps(self, fps):
+        """フレーム単位の値を指定フレームレートに換算する (BASE_FPS 基準の値から毎回計算)。
+        MGのウォームアップ表の start は発射数単位なのでそのまま、interval のみ換算する。"""
+        if fps == self.fps:
+            return self
+        factor = fps / BASE_FPS
+        for field, base_value in self._base_frames.items():
+            setattr(self, field, scale_frames(base_value, factor))
+        if self.type == "MG":
+            self.mg_warmup_map = [
+                {'start': entry['start'], 'interval': scale_frames(entry['interval'], factor)}
+                for entry in self._base_mg_warmup_map
+            ]
+            self.mg_max_warmup = self._base_mg_warmup_sum + self.windup_frames
+        self.fps = fps
+        return self
+
+
+def scale_frames(frames, factor):
+    """BASE_FPS 基準のフレーム数を換算する。元が正の値なら最低1フレームは残す。"""
+    if factor == 1:
+        return frames
+    scaled = int(round_half_up(frames * factor))
+    if frames > 0:
+        return max(1, scaled)
+    return scaled
+
 class DamageProfile:
     @staticmethod
     def create(**kwargs):
@@ -102,8 +144,40 @@ class DamageProfile:
             profile.update(kwargs)
         return profile
 
+class SymbolTable:
+    """シミュレーション単位で名前(キャラ/スキル/トリガー種別/スタック名)を小さな整数IDに変換する表。
+    IDはキャラ・スキルの読み込み時に割り当てておき、多重発動防止のキー (executed_skill_ids) を整数タプルで引く。
+    バフ合計 (BuffManager) や与ダメージ内訳 (damage_breakdown) は文字列キーのまま (INTERNED_SKILL_KEYS を参照)。"""
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        sid = self.ids.get(name)
+        if sid is None:
+            sid = len(self.names)
+            self.ids[name] = sid
+            self.names.append(name)
+        return sid
+
+    def __len__(self):
+        return len(self.names)
+
+# バフ種別・スタック名など、辞書キーとして頻繁に比較される文字列キー。
+# BuffManager はこれらを sys.intern した文字列で、damage_breakdown はスキル名で引く。呼び出し側はほぼ文字列リテラルで渡すため、
+# 整数IDにしても変換の辞書引きが1回増えるだけで速くならない (interned 文字列の辞書引きは整数とほぼ同じ速さ)
+INTERNED_SKILL_KEYS = ('buff_type', 'stack_name', 'target_stack_name', 'tag', 'remove_tag')
+
 class Skill:
     def __init__(self, name, trigger_type, trigger_value=0, effect_type="buff", **kwargs):
+        # ▼▼▼ 追加: 辞書キーになる文字列は読み込み時に intern して同一オブジェクトで比較させる ▼▼▼
+        for key in INTERNED_SKILL_KEYS:
+            value = kwargs.get(key)
+            if isinstance(value, str):
+                kwargs[key] = sys.intern(value)
+        if isinstance(trigger_type, str):
+            trigger_type = sys.intern(trigger_type)
+        # ▲▲▲ 追加ここまで ▲▲▲
         self.name = name
         self.trigger_type = trigger_type
         self.trigger_value = trigger_value
@@ -143,3 +217,8 @@ class Skill:
         # JSONで "max_trigger_count": 1 と指定すれば、1回発動後に停止する
         self.max_trigger_count = kwargs.get('max_trigger_count', None)
         # ▲▲▲ 追加ここまで ▲▲▲
+
+        # シミュレーター側の SymbolTable で割り当てられるID (未割り当てなら None)
+        self.symbol_id = None
+        self.trigger_symbol = None
+        self.stack_symbol = None
@@ -0,0 +1,331 @@
+import csv
+import json
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from web_cache import file_tree_signature
+
+
+# 外部データ (英語名・画像ファイル名・レイドの編成名など) とキャラ JSON の名前を突き合わせる共通の索引。
+# 照合は 完全一致 → 別名 → 派生名 (宝物版などの接尾辞を外した名前) → あいまい一致 (n-gram + 編集距離) の順。
+
+ROOT_DIR = Path(__file__).resolve().parent
+CHARACTER_DIR = ROOT_DIR / "characters"
+IMAGE_DIR = ROOT_DIR / "nikke_square_images"
+MANUFACTURER_CSV = ROOT_DIR / "資料" / "nikke_manufacturers_ja.csv"
+
+# 同じキャラの別データを表す接尾辞。外した名前でも照合する
+VARIANT_SUFFIXES = ("_宝物", " 宝物", "_バースト射撃なし")
+NGRAM_SIZE = 2
+# n-gram の重なり (Dice 係数) がこれ未満の名前は編集距離を計算しない
+MIN_NGRAM_SCORE = 0.4
+# 編集距離から求めた類似度 (1 - 距離 / 長い方の長さ) がこれ以上ならあいまい一致として採用する
+FUZZY_THRESHOLD = 0.85
+# 1位と別の対象を指す2位の類似度差がこれ以下なら、どちらとも決めずに曖昧として返す
+AMBIGUITY_MARGIN = 0.05
+FUZZY_CANDIDATES = 8
+
+# 優先度 (小さいほど強い)。同じキーに複数の対象があるときは優先度の高いほうを採る
+PRIORITY_FILE = 0
+PRIORITY_NAME = 1
+PRIORITY_ALIAS = 2
+
+
+def normalize_name(value):
+    return (
+        str(value or "")
+        .replace("\ufeff", "")
+        .replace("：", ":")
+        .replace("・", "")
+        .replace(" ", "")
+        .replace("_", "")
+        .lower()
+        .strip()
+    )
+
+
+def variant_bases(name, split_costume=False):
+    """派生名を外した候補。split_costume=True なら「アニス：スター」→「アニス」も加える。"""
+    text = str(name or "")
+    bases = []
+    for suffix in VARIANT_SUFFIXES:
+        if text.endswith(suffix):
+            bases.append(text[: -len(suffix)])
+    if split_costume:
+        for candidate in [text, *bases]:
+            for separator in ("：", ":"):
+                if separator in candidate:
+                    bases.append(candidate.split(separator, 1)[0])
+    return [base for base in bases if base and base != text]
+
+
+def _ngrams(key):
+    if len(key) <= NGRAM_SIZE:
+        return {key}
+    return {key[index:index + NGRAM_SIZE] for index in range(len(key) - NGRAM_SIZE + 1)}
+
+
+def edit_distance(a, b, limit=None):
+    """レーベンシュタイン距離。limit を超えることが確定したら limit + 1 を返す。"""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class NameMatch:
+    """照合結果。target が None で candidates が複数なら曖昧 (ambiguous)。
+
+    method は "exact" / "alias" / "variant" / "fuzzy" のいずれか (見つからなければ None)。
+    """
+
+    __slots__ = ("query", "target", "method", "score", "key", "candidates")
+
+    def __init__(self, query, target=None, method=None, score=0.0, key="", candidates=()):
+        self.query = query
+        self.target = target
+        self.method = method
+        self.score = score
+        self.key = key
+        self.candidates = tuple(candidates)
+
+    @property
+    def ambiguous(self):
+        return self.target is None and len(self.candidates) > 1
+
+    def __bool__(self):
+        return self.target is not None
+
+    def __repr__(self):
+        return (
+            f"NameMatch({self.query!r}, target={self.target!r}, method={self.method!r}, "
+            f"score={self.score:.2f}, candidates={list(self.candidates)!r})"
+        )
+
+
+class NameResolver:
+    """正規化したキー → 対象 (ファイル名など) の索引。
+
+    add() で名前を登録し、resolve() で引く。結果は問い合わせごとにキャッシュするので、
+    同じ名前を何千回引いても照合は1回で済む。
+    """
+
+    def __init__(self, fuzzy=True, split_costume=False):
+        self.fuzzy = fuzzy
+        self.split_costume = split_costume
+        # key -> {target: (priority, method)}
+        self._entries = defaultdict(dict)
+        self._ngram_index = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, name, target, priority=PRIORITY_NAME, method="exact"):
+        key = normalize_name(name)
+        if not key or target is None:
+            return
+        targets = self._entries[key]
+        current = targets.get(target)
+        if current is None or priority < current[0]:
+            targets[target] = (priority, method)
+        self._ngram_index = None
+        self._cache.clear()
+
+    def add_alias(self, alias, canonical_name, priority=PRIORITY_ALIAS):
+        """別名 alias を、登録済みの canonical_name と同じ対象に向ける。"""
+        match = self._lookup(normalize_name(canonical_name))
+        if match is None:
+            return False
+        for target in match:
+            self.add(alias, target, priority=priority, method="alias")
+        return True
+
+    def _lookup(self, key):
+        """key の対象のうち最優先のもの (同順位が複数なら全部)。無ければ None。"""
+        targets = self._entries.get(key)
+        if not targets:
+            return None
+        best = min(priority for priority, _ in targets.values())
+        return [target for target, (priority, _) in targets.items() if priority == best]
+
+    def _exact(self, query, key, method=None):
+        targets = self._lookup(key)
+        if targets is None:
+            return None
+        if len(targets) > 1:
+            return NameMatch(query, key=key, candidates=sorted(targets))
+        target = targets[0]
+        return NameMatch(query, target, method or self._entries[key][target][1], 1.0, key)
+
+    def _build_ngram_index(self):
+        index = defaultdict(list)
+        for key in self._entries:
+            for gram in _ngrams(key):
+                index[gram].append(key)
+        return index
+
+    def _fuzzy(self, query, key):
+        with self._lock:
+            if self._ngram_index is None:
+                self._ngram_index = self._build_ngram_index()
+            ngram_index = self._ngram_index
+        grams = _ngrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(ngram_index.get(gram, ()))
+        scored = []
+        for candidate, count in shared.items():
+            dice = 2.0 * count / (len(grams) + len(_ngrams(candidate)))
+            if dice >= MIN_NGRAM_SCORE:
+                scored.append((dice, candidate))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        ranked = []
+        for _, candidate in scored[:FUZZY_CANDIDATES]:
+            longest = max(len(key), len(candidate))
+            limit = int(longest * (1.0 - FUZZY_THRESHOLD))
+            distance = edit_distance(key, candidate, limit)
+            if distance > limit:
+                continue
+            similarity = 1.0 - distance / longest
+            for target in self._lookup(candidate):
+                ranked.append((similarity, candidate, target))
+        if not ranked:
+            return NameMatch(query, key=key)
+
+        ranked.sort(key=lambda item: (-item[0], item[1], item[2]))
+        best_score, best_key, best_target = ranked[0]
+        close = [
+            target
+            for score, _, target in ranked
+            if best_score - score <= AMBIGUITY_MARGIN
+        ]
+        close = sorted(set(close))
+        if len(close) > 1:
+            return NameMatch(query, method="fuzzy", score=best_score, key=best_key, candidates=close)
+        return NameMatch(query, best_target, "fuzzy", best_score, best_key, [best_target])
+
+    def resolve(self, name):
+        """name に対応する NameMatch を返す (見つからなくても NameMatch、偽として評価される)。"""
+        cached = self._cache.get(name)
+        if cached is not None:
+            return cached
+
+        key = normalize_name(name)
+        match = self._exact(name, key) if key else None
+        if match is None and key:
+            for base in variant_bases(name, split_costume=self.split_costume):
+                match = self._exact(name, normalize_name(base), method="variant")
+                if match is not None:
+                    break
+        if match is None:
+            match = self._fuzzy(name, key) if self.fuzzy and key else NameMatch(name, key=key)
+        self._cache[name] = match
+        return match
+
+    def get(self, name, default=None):
+        match = self.resolve(name)
+        return match.target if match else default
+
+
+def _read_manufacturer_rows(path=MANUFACTURER_CSV):
+    with Path(path).open("r", encoding="utf-8-sig", newline="") as handle:
+        return list(csv.DictReader(handle))
+
+
+def build_character_resolver(character_dir=CHARACTER_DIR, manufacturer_csv=MANUFACTURER_CSV, fuzzy=True):
+    """名前 → キャラ JSON のファイル名。
+
+    ファイル名 (拡張子なし)・JSON の name・製造元 CSV の英語名を登録する。
+    同名のファイルが複数あるときはファイル名が名前と一致するものを優先する。
+    """
+    resolver = NameResolver(fuzzy=fuzzy)
+    for path in sorted(Path(character_dir).glob("*.json"), key=lambda p: p.name):
+        resolver.add(path.stem, path.name, priority=PRIORITY_FILE)
+        try:
+            with path.open("r", encoding="utf-8") as handle:
+                name = json.load(handle).get("name")
+        except (OSError, ValueError):
+            continue
+        resolver.add(name, path.name, priority=PRIORITY_NAME)
+
+    if Path(manufacturer_csv).exists():
+        for row in _read_manufacturer_rows(manufacturer_csv):
+            resolver.add_alias(row.get("english_name"), row.get("japanese_name"))
+    return resolver
+
+
+def build_company_resolver(manufacturer_csv=MANUFACTURER_CSV):
+    """名前 (日本語名・英語名) → 製造元。衣装違いは元のキャラの製造元で引ける。"""
+    resolver = NameResolver(fuzzy=False, split_costume=True)
+    for row in _read_manufacturer_rows(manufacturer_csv):
+        company = (row.get("manufacturer_ja") or "").strip()
+        if not company:
+            continue
+        for key in (row.get("japanese_name"), row.get("english_name")):
+            resolver.add(key, company)
+    return resolver
+
+
+def build_file_stem_resolver(directory, pattern, aliases=None):
+    """ファイル名 (拡張子なし) → ファイル名。aliases は {別名: ファイル名 (拡張子なし)}。
+
+    あいまい一致は使わない (画像を別キャラのものと取り違えないように)。
+    """
+    resolver = NameResolver(fuzzy=False)
+    for path in sorted(Path(directory).glob(pattern), key=lambda p: p.name):
+        resolver.add(path.stem, path.name, priority=PRIORITY_FILE)
+    for alias, stem in (aliases or {}).items():
+        resolver.add_alias(alias, stem)
+    return resolver
+
+
+_shared_lock = threading.Lock()
+_shared = {}
+
+
+def shared_resolver(name, builder, watch_entries):
+    """builder() で作った索引をプロセス内で使い回す。watch_entries (file_tree_signature 形式) が変われば作り直す。"""
+    signature = file_tree_signature(watch_entries)
+    with _shared_lock:
+        cached = _shared.get(name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    resolver = builder()
+    with _shared_lock:
+        _shared[name] = (signature, resolver)
+    return resolver
+
+
+def character_resolver():
+    return shared_resolver(
+        "characters",
+        build_character_resolver,
+        ((CHARACTER_DIR, False, True), (MANUFACTURER_CSV, False, False)),
+    )
+
+
+def image_resolver():
+    return shared_resolver(
+        "images",
+        lambda: build_file_stem_resolver(IMAGE_DIR, "*.png"),
+        ((IMAGE_DIR, False, False),),
+    )
@@ -0,0 +1,393 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+
+# シミュレーション結果を追記だけの SQLite に残す。
+# 1実行 = runs の1行 (+ メンバーごとの run_members、ダメージ源ごとの run_sources)。
+# 同じリクエスト・同じエンジン・同じデータなら結果は同じになる (期待値モードか seed 指定のとき) ので、
+# その場合は応答も保存しておき、次からは再計算せずに返す。
+
+ROOT_DIR = Path(__file__).resolve().parent
+DEFAULT_DB = ROOT_DIR / "test_results" / "results.sqlite3"
+CHARACTER_DIR = ROOT_DIR / "characters"
+SCHEMA_VERSION = 1
+
+# 結果を左右するコード。中身が変わればエンジン版も変わる
+ENGINE_SOURCES = (
+    "buff_manager.py",
+    "character.py",
+    "character_action.py",
+    "character_skill.py",
+    "character_stats.py",
+    "enemy_table.py",
+    "engine.py",
+    "engine_burst.py",
+    "engine_skills.py",
+    "models.py",
+    "simulator.py",
+    "status_calculator.py",
+    "status_registry.py",
+    "utils.py",
+    "web_simulation.py",
+)
+# キャラ JSON 以外で結果を左右するデータ (武器・ステータス表・キューブ表)
+DATA_SOURCES = (
+    ("weapons", "*.json"),
+    ("status", "**/*"),
+    ("test/キューブ", "*"),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    cache_key TEXT NOT NULL,
+    engine_version TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    seed TEXT,
+    expected_value INTEGER NOT NULL,
+    total_damage REAL NOT NULL,
+    time_to_kill REAL,
+    elapsed_seconds REAL,
+    request_json TEXT NOT NULL,
+    response BLOB
+);
+
+CREATE TABLE IF NOT EXISTS run_members (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    slot INTEGER NOT NULL,
+    file_name TEXT,
+    file_hash TEXT,
+    name TEXT NOT NULL,
+    total_damage REAL NOT NULL,
+    PRIMARY KEY (run_id, slot)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS run_sources (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    slot INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    source_type TEXT NOT NULL,
+    damage REAL NOT NULL,
+    hit_count INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS runs_cache_key ON runs(cache_key, id);
+CREATE INDEX IF NOT EXISTS runs_request ON runs(request_hash, id);
+CREATE INDEX IF NOT EXISTS runs_created ON runs(created_at);
+CREATE INDEX IF NOT EXISTS run_members_file ON run_members(file_name, file_hash, run_id);
+CREATE INDEX IF NOT EXISTS run_sources_run ON run_sources(run_id, slot);
+"""
+
+
+def connect(db_path=DEFAULT_DB):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        connection.close()
+        raise RuntimeError(f"{db_path} uses schema version {version}, expected {SCHEMA_VERSION}")
+    connection.executescript(SCHEMA)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+_local = threading.local()
+
+
+def shared_connection(db_path=None):
+    """スレッドごと (fork したプロセスでは開き直す) に1本の接続を使い回す。既定は DEFAULT_DB。"""
+    db_path = DEFAULT_DB if db_path is None else db_path
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = (os.getpid(), str(db_path))
+    connection = connections.get(key)
+    if connection is None:
+        connection = connections[key] = connect(db_path)
+    return connection
+
+
+_hash_lock = threading.Lock()
+# パス → (mtime_ns, サイズ, sha1)。同じファイルを毎回読み直さない
+_hash_cache = {}
+
+
+def file_hash(path):
+    """ファイルの sha1 (mtime・サイズが変わるまでプロセス内で使い回す)。無ければ None。"""
+    path = os.fspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    with _hash_lock:
+        cached = _hash_cache.get(path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    with open(path, "rb") as handle:
+        digest = hashlib.sha1(handle.read()).hexdigest()
+    with _hash_lock:
+        _hash_cache[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def _combined_hash(named_hashes):
+    digest = hashlib.sha1()
+    for name, value in named_hashes:
+        digest.update(f"{name}\0{value}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def engine_version():
+    """エンジンのソースから決まる版 (16桁)。"""
+    return _combined_hash((name, file_hash(ROOT_DIR / name)) for name in ENGINE_SOURCES)
+
+
+def data_hash():
+    """キャラ JSON 以外の入力データ (武器・ステータス表など) から決まる値 (16桁)。"""
+    entries = []
+    for directory, pattern in DATA_SOURCES:
+        root = ROOT_DIR / directory
+        if not root.is_dir():
+            continue
+        for path in sorted(root.glob(pattern)):
+            if path.is_file():
+                entries.append((path.relative_to(ROOT_DIR).as_posix(), file_hash(path)))
+    return _combined_hash(entries)
+
+
+def canonical_json(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def request_hash(payload):
+    """キー順や空白に依存しないリクエストのハッシュ。"""
+    return hashlib.sha256(canonical_json(payload).encode("utf-8")).hexdigest()
+
+
+def character_file_hash(file_name):
+    return file_hash(CHARACTER_DIR / Path(file_name).name) if file_name else None
+
+
+def cache_key(kind, payload, member_files):
+    """リクエスト・エンジン・データ (メンバーのキャラ JSON を含む) がすべて同じ実行を指すキー。"""
+    material = [
+        SCHEMA_VERSION,
+        kind,
+        request_hash(payload),
+        engine_version(),
+        data_hash(),
+        [[name, character_file_hash(name)] for name in member_files],
+    ]
+    return hashlib.sha256(canonical_json(material).encode("utf-8")).hexdigest()
+
+
+def encode_response(response):
+    return zlib.compress(canonical_json(response).encode("utf-8"), 6)
+
+
+def decode_response(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def find_response(connection, key):
+    """同じキーで保存済みの応答 (run_id, 応答) を返す。無ければ None。"""
+    row = connection.execute(
+        "SELECT id, response FROM runs WHERE cache_key = ? AND response IS NOT NULL ORDER BY id DESC LIMIT 1",
+        (key,),
+    ).fetchone()
+    if row is None:
+        return None
+    return row[0], decode_response(row[1])
+
+
+def record_run(
+    connection,
+    kind,
+    payload,
+    key,
+    members,
+    total_damage,
+    seed=None,
+    expected_value=False,
+    time_to_kill=None,
+    elapsed_seconds=None,
+    response=None,
+):
+    """1実行を追記して run_id を返す。
+
+    members は {"file", "name", "totalDamage", "breakdown": [{"source", "sourceType", "damage", "count"}]}
+    のリスト (file はダミーなら None)。response は再現できる実行のときだけ渡す。
+    """
+    with connection:
+        cursor = connection.execute(
+            """
+            INSERT INTO runs (
+                created_at, kind, request_hash, cache_key, engine_version, data_hash, seed,
+                expected_value, total_damage, time_to_kill, elapsed_seconds, request_json, response
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                time.time(),
+                kind,
+                request_hash(payload),
+                key,
+                engine_version(),
+                data_hash(),
+                None if seed is None else str(seed),
+                int(bool(expected_value)),
+                float(total_damage),
+                time_to_kill,
+                elapsed_seconds,
+                canonical_json(payload),
+                encode_response(response) if response is not None else None,
+            ),
+        )
+        run_id = cursor.lastrowid
+        connection.executemany(
+            "INSERT INTO run_members (run_id, slot, file_name, file_hash, name, total_damage) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    slot,
+                    member.get("file"),
+                    character_file_hash(member.get("file")),
+                    member["name"],
+                    float(member["totalDamage"]),
+                )
+                for slot, member in enumerate(members)
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO run_sources (run_id, slot, source, source_type, damage, hit_count) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    slot,
+                    source["source"],
+                    source.get("sourceType", ""),
+                    float(source["damage"]),
+                    int(source.get("count", 0)),
+                )
+                for slot, member in enumerate(members)
+                for source in member.get("breakdown", [])
+            ],
+        )
+    return run_id
+
+
+def character_history(connection, file_name, revisions=10, kind=None):
+    """キャラ JSON の直近 revisions 版ごとのダメージ (新しい版から)。
+
+    版はキャラ JSON の sha1 で区別し、最初に記録された時刻の順に並べる。
+    """
+    kind_filter = "AND r.kind = ?" if kind else ""
+    params = [file_name, *([kind] if kind else []), revisions]
+    return connection.execute(
+        f"""
+        SELECT
+            m.file_hash,
+            MIN(r.created_at) AS first_seen,
+            MAX(r.created_at) AS last_seen,
+            COUNT(*) AS runs,
+            AVG(m.total_damage) AS avg_damage,
+            MIN(m.total_damage) AS min_damage,
+            MAX(m.total_damage) AS max_damage,
+            COUNT(DISTINCT r.engine_version) AS engine_versions
+        FROM run_members AS m
+        JOIN runs AS r ON r.id = m.run_id
+        WHERE m.file_name = ? {kind_filter}
+        GROUP BY m.file_hash
+        ORDER BY first_seen DESC
+        LIMIT ?
+        """,
+        params,
+    ).fetchall()
+
+
+def recent_runs(connection, limit=20, kind=None):
+    kind_filter = "WHERE r.kind = ?" if kind else ""
+    params = [*([kind] if kind else []), limit]
+    return connection.execute(
+        f"""
+        SELECT
+            r.id, r.created_at, r.kind, r.engine_version, r.seed, r.expected_value, r.total_damage,
+            (SELECT group_concat(name, ' / ') FROM run_members WHERE run_id = r.id) AS members
+        FROM runs AS r
+        {kind_filter}
+        ORDER BY r.id DESC
+        LIMIT ?
+        """,
+        params,
+    ).fetchall()
+
+
+def _format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the local simulation result store.")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="結果ストアの SQLite ファイル")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    history = sub.add_parser("history", help="キャラ JSON の版ごとのダメージ推移")
+    history.add_argument("file", help="キャラ JSON のファイル名 (例: 紅蓮.json)")
+    history.add_argument("--last", type=int, default=10, help="新しいほうから何版分")
+    history.add_argument("--kind", choices=["web", "sweep"], default=None)
+
+    runs = sub.add_parser("runs", help="直近の実行")
+    runs.add_argument("--limit", type=int, default=20)
+    runs.add_argument("--kind", choices=["web", "sweep"], default=None)
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"[ERROR] result store not found: {args.db}", file=sys.stderr)
+        return 1
+    connection = connect(args.db)
+    writer = csv.writer(sys.stdout)
+    if args.command == "history":
+        file_name = args.file if args.file.endswith(".json") else f"{args.file}.json"
+        writer.writerow(
+            ["file_hash", "first_seen", "last_seen", "runs", "avg_damage", "min_damage", "max_damage", "engine_versions"]
+        )
+        for row in character_history(connection, file_name, args.last, args.kind):
+            file_hash_value, first_seen, last_seen, count, avg_damage, min_damage, max_damage, engines = row
+            writer.writerow(
+                [
+                    (file_hash_value or "")[:12],
+                    _format_time(first_seen),
+                    _format_time(last_seen),
+                    count,
+                    f"{avg_damage:.0f}",
+                    f"{min_damage:.0f}",
+                    f"{max_damage:.0f}",
+                    engines,
+                ]
+            )
+    else:
+        writer.writerow(["id", "created_at", "kind", "engine_version", "seed", "expected_value", "total_damage", "members"])
+        for row in recent_runs(connection, args.limit, args.kind):
+            run_id, created_at, kind, engine, seed, expected, total, members = row
+            writer.writerow([run_id, _format_time(created_at), kind, engine, seed or "", expected, f"{total:.0f}", members])
+    connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
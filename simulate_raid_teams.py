@@ -0,0 +1,306 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from name_resolver import CHARACTER_DIR, character_resolver
+from web_simulation import run_web_batch_simulation
+
+
+ROOT_DIR = Path(__file__).resolve().parent
+RAID_OUTPUT_DIR = ROOT_DIR / "ユニオンレイド集計結果" / "output"
+DEFAULT_SERVERS = ("global", "jp", "kr", "na", "sea")
+TEAM_SIZE = 5
+# 攻撃側の属性 → 有利を取れる敵の属性 (character_stats の有利判定と同じ対応)
+ADVANTAGE_MAP = {"Iron": "Electric", "Electric": "Water", "Water": "Fire", "Fire": "Wind", "Wind": "Iron"}
+# キャッシュの形式を変えたら上げる (古い結果を使わないように)
+CACHE_VERSION = 1
+
+FIELDNAMES = [
+    "team",
+    "files",
+    "weakness",
+    "enemy_element",
+    "uses",
+    "servers",
+    "steps",
+    "avg_real_damage",
+    "best_real_damage",
+    "sim_party_damage",
+    "sim_member_damage",
+    "cached",
+    "status",
+    "error",
+]
+
+
+def read_team_rows(input_dir, servers):
+    """各ヒットの (サーバー, Step, 弱点属性, メンバー名のリスト, ダメージ) を返す。"""
+    for server in servers:
+        for step_file in sorted((Path(input_dir) / server.lower()).glob("step_*.csv")):
+            with step_file.open("r", encoding="utf-8-sig", newline="") as f:
+                for row in csv.DictReader(f):
+                    members = [
+                        (row.get(f"Team {slot} Name") or "").strip() for slot in range(1, TEAM_SIZE + 1)
+                    ]
+                    members = [name for name in members if name]
+                    if not members:
+                        continue
+                    damage_text = (row.get("Damage") or "").replace(",", "").strip()
+                    yield (
+                        server.upper(),
+                        (row.get("Step Number") or "").strip(),
+                        (row.get("Weakness") or "").strip(),
+                        members,
+                        int(damage_text) if damage_text else 0,
+                    )
+
+
+def collect_teams(input_dir, servers):
+    """サーバーをまたいで同じ編成 (メンバー名の集合)・同じ弱点属性のヒットをまとめる。"""
+    teams = {}
+    for server, step, weakness, members, damage in read_team_rows(input_dir, servers):
+        key = (tuple(sorted(members)), weakness)
+        team = teams.get(key)
+        if team is None:
+            # 編成の並びは最初に見たヒットのものを使う
+            team = teams[key] = {
+                "members": members,
+                "weakness": weakness,
+                "uses": 0,
+                "servers": set(),
+                "steps": set(),
+                "damage_total": 0,
+                "best_damage": 0,
+            }
+        team["uses"] += 1
+        team["servers"].add(server)
+        if step:
+            team["steps"].add(step)
+        team["damage_total"] += damage
+        team["best_damage"] = max(team["best_damage"], damage)
+    return list(teams.values())
+
+
+def file_sha1(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def sim_options(args, enemy_element):
+    return {
+        "summaryOnly": True,
+        "enemyElement": enemy_element,
+        "skillLevel": args.skill_level,
+        "durationSeconds": args.duration,
+        "expectedValue": args.expected_value,
+    }
+
+
+def team_cache_key(files, options, file_hashes):
+    """編成 (順不同)・実行条件・メンバーの JSON の中身から決まるキャッシュキー。"""
+    material = [CACHE_VERSION, sorted(files), options, [file_hashes[name] for name in sorted(files)]]
+    text = json.dumps(material, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_cache(path):
+    """キャッシュ JSONL をキーごとの最新行にする (壊れた行は無視する)。"""
+    cache = {}
+    if not path.exists():
+        return cache
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("key"):
+                cache[entry["key"]] = entry
+    return cache
+
+
+def simulate_team_chunk(jobs):
+    """[(key, files, options), ...] を1回の一括シミュレーションで回す (ワーカープロセスで実行)。
+
+    同じチャンク内では共通メンバーの生成が1回で済むので、似た編成を同じチャンクにまとめて渡す。
+    """
+    entries = [
+        {
+            "id": key,
+            "name": key,
+            "formation": [{"kind": "character", "file": file_name} for file_name in files],
+            "options": options,
+        }
+        for key, files, options in jobs
+    ]
+    response = run_web_batch_simulation({"entries": entries, "options": {}})
+    results = []
+    for row in response["results"]:
+        if "error" in row:
+            results.append({"key": row["id"], "status": "ERROR", "error": row["error"]})
+            continue
+        data = row["data"]
+        results.append(
+            {
+                "key": row["id"],
+                "status": "OK",
+                "partyDamage": data["totalPartyDamage"],
+                "memberDamage": {member["name"]: member["totalDamage"] for member in data["results"]},
+            }
+        )
+    return results
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def iter_simulations(jobs, args):
+    """シミュレーション結果を終わったチャンクから順に返す。"""
+    # ファイル名順に並べると、メンバーの重なる編成が同じチャンクに入りやすい
+    jobs = sorted(jobs, key=lambda job: (sorted(job[1]), job[2]["enemyElement"]))
+    chunks = list(chunked(jobs, max(1, args.chunk_size)))
+    if args.jobs <= 1:
+        for chunk in chunks:
+            yield from simulate_team_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(simulate_team_chunk, chunk): chunk for chunk in chunks}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield from future.result()
+                except Exception as exc:
+                    for key, _, _ in futures[future]:
+                        yield {"key": key, "status": "ERROR", "error": f"{type(exc).__name__}: {exc}"}
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate the unique teams found in exported Union Raid step CSVs."
+    )
+    parser.add_argument("--input-dir", default=str(RAID_OUTPUT_DIR), help="サーバー別の step CSV があるディレクトリ")
+    parser.add_argument("--servers", nargs="+", default=list(DEFAULT_SERVERS))
+    parser.add_argument("--output", default="test_results/raid_team_simulation.csv")
+    parser.add_argument("--cache", default="test_results/raid_team_cache.jsonl", help="編成ごとの結果キャッシュ (JSONL)")
+    parser.add_argument("--min-uses", type=int, default=10, help="この回数以上使われた編成だけを対象にする")
+    parser.add_argument("--limit", type=int, default=None, help="使用回数の多い順にこの件数まで")
+    parser.add_argument("--skill-level", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=180.0, help="戦闘時間(秒)")
+    parser.add_argument("--expected-value", action="store_true", help="乱数を使わない期待値モードで実行する")
+    parser.add_argument("--jobs", type=int, default=0, help="並列プロセス数 (0 で CPU 数)")
+    parser.add_argument("--chunk-size", type=int, default=8, help="1ワーカーにまとめて渡す編成数")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+
+    resolver = character_resolver()
+    teams = [team for team in collect_teams(args.input_dir, args.servers) if team["uses"] >= args.min_uses]
+    teams.sort(key=lambda team: (-team["uses"], sorted(team["members"]), team["weakness"]))
+    if args.limit is not None:
+        teams = teams[: args.limit]
+
+    unresolved = {}
+    fuzzy_matches = {}
+    file_hashes = {}
+    rows = []
+    pending = {}
+    cache_path = Path(args.cache)
+    cache = load_cache(cache_path)
+    for team in teams:
+        matches = [resolver.resolve(name) for name in team["members"]]
+        files = [match.target for match in matches]
+        missing = [match.query for match in matches if not match]
+        for match in matches:
+            if match.method == "fuzzy" or match.ambiguous:
+                fuzzy_matches[match.query] = match
+        enemy_element = ADVANTAGE_MAP.get(team["weakness"], "None")
+        row = {
+            "team": " / ".join(team["members"]),
+            "files": " / ".join(file_name or "?" for file_name in files),
+            "weakness": team["weakness"],
+            "enemy_element": enemy_element,
+            "uses": team["uses"],
+            "servers": " ".join(sorted(team["servers"])),
+            "steps": " ".join(sorted(team["steps"], key=int)),
+            "avg_real_damage": round(team["damage_total"] / team["uses"]),
+            "best_real_damage": team["best_damage"],
+        }
+        rows.append(row)
+        if missing:
+            for name in missing:
+                unresolved[name] = unresolved.get(name, 0) + team["uses"]
+            row.update(status="SKIPPED", error="unresolved: " + ", ".join(missing))
+            continue
+
+        for file_name in files:
+            if file_name not in file_hashes:
+                file_hashes[file_name] = file_sha1(CHARACTER_DIR / file_name)
+        options = sim_options(args, enemy_element)
+        key = team_cache_key(files, options, file_hashes)
+        row["key"] = key
+        cached = cache.get(key)
+        if cached is not None and cached.get("status") == "OK":
+            row["cached"] = "yes"
+            continue
+        pending[key] = (key, files, options)
+
+    if fuzzy_matches and not args.quiet:
+        for match in fuzzy_matches.values():
+            if match.ambiguous:
+                print(f"Ambiguous name: {match.query} -> {' / '.join(match.candidates)}")
+            else:
+                print(f"Fuzzy match: {match.query} -> {match.target} ({match.score:.2f})")
+    if unresolved and not args.quiet:
+        names = ", ".join(f"{name} ({uses})" for name, uses in sorted(unresolved.items(), key=lambda item: -item[1]))
+        print(f"Unresolved names (hits): {names}")
+    if not args.quiet:
+        print(f"Teams: {len(teams)}, cached: {sum(1 for row in rows if row.get('cached'))}, to simulate: {len(pending)}")
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # 1件終わるごとにキャッシュへ追記する (中断しても次回はその続きから)
+    with cache_path.open("a", encoding="utf-8") as cache_file:
+        for idx, result in enumerate(iter_simulations(list(pending.values()), args), start=1):
+            cache[result["key"]] = result
+            cache_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            cache_file.flush()
+            if not args.quiet:
+                print(f"[{idx}/{len(pending)}] {result['key'][:12]} {result['status']}", flush=True)
+
+    for row in rows:
+        result = cache.get(row.pop("key", None))
+        if result is None:
+            continue
+        row["status"] = result["status"]
+        row["error"] = result.get("error", "")
+        if result["status"] == "OK":
+            row["sim_party_damage"] = round(result["partyDamage"])
+            row["sim_member_damage"] = " / ".join(
+                f"{name}={damage:.0f}" for name, damage in result["memberDamage"].items()
+            )
+
+    rows.sort(key=lambda row: (row.get("status") != "OK", -float(row.get("sim_party_damage") or 0)))
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    ok_count = sum(1 for row in rows if row.get("status") == "OK")
+    print(f"Done: {ok_count} OK, {len(rows) - ok_count} ERROR/SKIPPED")
+    print(f"Output: {output_path}")
+    print(f"Cache: {cache_path}")
+
+
+if __name__ == "__main__":
+    main()
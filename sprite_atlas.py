@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+from pathlib import Path
+
+from web_cache import file_tree_signature
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow が無い環境では個別画像の配信にフォールバックする
+    Image = None
+    ImageOps = None
+
+
+ROOT_DIR = Path(__file__).resolve().parent
+SPRITE_DIR = ROOT_DIR / "sprite_cache"
+SPRITE_MAP_NAME = "atlas.json"
+SPRITE_URL_PREFIX = "/sprites/"
+ATLAS_VERSION = 1
+WEBP_QUALITY = 82
+
+# グループ名 → (元画像ディレクトリ, glob パターン, タイル一辺 px, 1行あたりのタイル数)
+# タイルは表示サイズの約2倍 (高DPI向け) にしている
+SPRITE_GROUPS = {
+    "characters": (ROOT_DIR / "nikke_square_images", "*.png", 128, 16),
+    "cubes": (ROOT_DIR / "icon" / "キューブ", "*.png", 64, 8),
+    "overload": (ROOT_DIR / "icon" / "オーバーロード", "*.webp", 72, 8),
+}
+
+
+def pillow_available():
+    return Image is not None
+
+
+def source_hash(groups=None):
+    """元画像 (名前・mtime・サイズ) と設定から、アトラスを作り直すべきかを判定するハッシュ。"""
+    groups = SPRITE_GROUPS if groups is None else groups
+    digest = hashlib.sha1(str(ATLAS_VERSION).encode("ascii"))
+    for name in sorted(groups):
+        source_dir, pattern, tile, columns = groups[name]
+        digest.update(repr((name, pattern, tile, columns)).encode("utf-8"))
+        digest.update(repr(file_tree_signature(((source_dir, False, True),))[1:]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _thumbnail(path, tile):
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+        # 正方形タイルに中央合わせで収める (元がほぼ正方形なので切り抜きはわずか)
+        return ImageOps.fit(image, (tile, tile), method=Image.LANCZOS)
+
+
+def _build_group(name, source_dir, pattern, tile, columns, output_dir, thumbnails=False):
+    sources = sorted(Path(source_dir).glob(pattern), key=lambda item: item.name)
+    if not sources:
+        return None
+
+    columns = max(1, min(columns, len(sources)))
+    rows = math.ceil(len(sources) / columns)
+    atlas = Image.new("RGBA", (columns * tile, rows * tile), (0, 0, 0, 0))
+    sprites = {}
+    thumb_dir = output_dir / "thumbs" / name
+    if thumbnails:
+        thumb_dir.mkdir(parents=True, exist_ok=True)
+
+    for index, path in enumerate(sources):
+        try:
+            thumb = _thumbnail(path, tile)
+        except OSError as exc:
+            print(f"[sprite] skip {path.name}: {exc}")
+            continue
+        x = (index % columns) * tile
+        y = (index // columns) * tile
+        atlas.paste(thumb, (x, y))
+        sprites[path.name] = [x, y, tile, tile]
+        if thumbnails:
+            thumb.save(thumb_dir / f"{path.stem}.webp", "WEBP", quality=WEBP_QUALITY, method=6)
+
+    file_name = f"{name}.webp"
+    tmp_path = output_dir / f".{file_name}.tmp"
+    atlas.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=6)
+    os.replace(tmp_path, output_dir / file_name)
+    return {
+        "file": file_name,
+        "width": atlas.width,
+        "height": atlas.height,
+        "tile": tile,
+        "sprites": sprites,
+    }
+
+
+def build_atlases(output_dir=SPRITE_DIR, groups=None, thumbnails=False, force=False):
+    """各グループの縮小 WebP アトラスと座標表 (atlas.json) を書き出す。
+
+    元画像が前回ビルドから変わっていなければ何もしない (force で強制)。
+    Pillow が無い場合は RuntimeError。
+    """
+    if not pillow_available():
+        raise RuntimeError("Pillow がインストールされていないためスプライトを生成できません")
+
+    groups = SPRITE_GROUPS if groups is None else groups
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    current_hash = source_hash(groups)
+    if not force:
+        existing = load_sprite_map(output_dir)
+        if existing is not None and existing.get("sourceHash") == current_hash:
+            return existing
+
+    atlases = {}
+    for name in sorted(groups):
+        source_dir, pattern, tile, columns = groups[name]
+        built = _build_group(name, source_dir, pattern, tile, columns, output_dir, thumbnails=thumbnails)
+        if built is not None:
+            atlases[name] = built
+
+    sprite_map = {"version": ATLAS_VERSION, "sourceHash": current_hash, "atlases": atlases}
+    # 座標表は最後に置き換える (アトラス画像より先に新しい座標が見えないように)
+    tmp_path = output_dir / f".{SPRITE_MAP_NAME}.tmp"
+    tmp_path.write_text(json.dumps(sprite_map, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, output_dir / SPRITE_MAP_NAME)
+    return sprite_map
+
+
+def load_sprite_map(output_dir=SPRITE_DIR):
+    path = Path(output_dir) / SPRITE_MAP_NAME
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != ATLAS_VERSION:
+        return None
+    return data
+
+
+def sprite_entry(sprite_map, group, file_name):
+    """カタログに載せる1枚分のスプライト情報。座標表に無ければ None。"""
+    if not sprite_map:
+        return None
+    atlas = sprite_map.get("atlases", {}).get(group)
+    if not atlas:
+        return None
+    rect = atlas["sprites"].get(file_name)
+    if rect is None:
+        return None
+    x, y, w, h = rect
+    return {
+        "url": f"{SPRITE_URL_PREFIX}{atlas['file']}?v={sprite_map['sourceHash'][:12]}",
+        "x": x,
+        "y": y,
+        "w": w,
+        "h": h,
+        "atlasWidth": atlas["width"],
+        "atlasHeight": atlas["height"],
+    }
+
+
+_build_lock = threading.Lock()
+_build_thread = None
+
+
+def ensure_sprite_atlas(output_dir=SPRITE_DIR):
+    """最新の座標表を返し、元画像より古ければバックグラウンドで作り直しを始める。
+
+    ビルドの完了は待たない。古い (または存在しない) 座標表を返した場合も、
+    ビルド後に atlas.json が置き換わるのでカタログ側の変更検知で拾われる。
+    """
+    global _build_thread
+    sprite_map = load_sprite_map(output_dir)
+    if not pillow_available():
+        return sprite_map
+    if sprite_map is not None and sprite_map.get("sourceHash") == source_hash():
+        return sprite_map
+
+    with _build_lock:
+        if _build_thread is None or not _build_thread.is_alive():
+            _build_thread = threading.Thread(
+                target=_background_build,
+                args=(output_dir,),
+                name="sprite-atlas-build",
+                daemon=True,
+            )
+            _build_thread.start()
+    # 作り直し中は古いアトラスを使わない (座標がずれている可能性がある)
+    return None
+
+
+def _background_build(output_dir):
+    try:
+        build_atlases(output_dir)
+    except Exception as exc:
+        print(f"[sprite] build failed: {type(exc).__name__}: {exc}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build down-scaled WebP sprite atlases for the web UI.")
+    parser.add_argument("--output", type=Path, default=SPRITE_DIR)
+    parser.add_argument("--thumbnails", action="store_true", help="also write one WebP thumbnail per image")
+    parser.add_argument("--force", action="store_true", help="rebuild even if sources are unchanged")
+    args = parser.parse_args()
+
+    sprite_map = build_atlases(args.output, thumbnails=args.thumbnails, force=args.force)
+    for name, atlas in sprite_map["atlases"].items():
+        size = (args.output / atlas["file"]).stat().st_size
+        print(f"{name}: {len(atlas['sprites'])} sprites, {atlas['width']}x{atlas['height']}, {size / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,4 @@
-from pathlib import Path
-
-
-STATUS_DIR = Path(__file__).resolve().parent / "status"
+from status_registry import STATUS_DIR, STATUS_REGISTRY
 
 CLASS_FILE_MAP = {
     "Attacker": "火力型",
@@ -38,33 +35,6 @@ PART_FILE_MAP = {
     "legs": "足",
 }
 
-STATUS_CACHE = {}
-
-
-def _read_rows(path):
-    cache_key = str(path.resolve())
-    stat = path.stat()
-    cached = STATUS_CACHE.get(cache_key)
-    if cached and cached["mtime_ns"] == stat.st_mtime_ns:
-        return cached["rows"]
-
-    rows = []
-    with path.open("r", encoding="utf-8") as handle:
-        for raw_line in handle:
-            line = raw_line.strip()
-            if not line:
-                continue
-            rows.append([part.strip() for part in line.split(",")])
-    STATUS_CACHE[cache_key] = {"mtime_ns": stat.st_mtime_ns, "rows": rows}
-    return rows
-
-
-def _num(value, default=0.0):
-    try:
-        return float(value)
-    except (TypeError, ValueError):
-        return default
-
 
 def _int(value, default=0):
     try:
@@ -74,43 +44,13 @@ def _int(value, default=0):
 
 
 def _lookup_level(path, level, has_tier=False, tier=None):
-    if not path.exists():
-        return (0.0, 0.0)
-
-    level = _int(level)
-    candidates = []
-    for row in _read_rows(path):
-        if has_tier:
-            if len(row) < 4 or str(row[0]) != str(tier):
-                continue
-            row_level = _int(row[1])
-            hp = _num(row[2])
-            atk = _num(row[3])
-        else:
-            if len(row) < 3:
-                continue
-            row_level = _int(row[0])
-            hp = _num(row[1])
-            atk = _num(row[2])
-        candidates.append((row_level, hp, atk))
-
-    if not candidates:
-        return (0.0, 0.0)
-
-    candidates.sort(key=lambda item: item[0])
-    lower_or_equal = [item for item in candidates if item[0] <= level]
-    row = lower_or_equal[-1] if lower_or_equal else candidates[0]
-    return (row[1], row[2])
+    if has_tier:
+        return STATUS_REGISTRY.tier_table(path).lookup(tier, level)
+    return STATUS_REGISTRY.level_table(path).lookup(level)
 
 
 def _read_per_level(path):
-    if not path.exists():
-        return (0.0, 0.0)
-    rows = _read_rows(path)
-    if not rows or len(rows[0]) < 2:
-        return (0.0, 0.0)
-    row = rows[0]
-    return (_num(row[0]), _num(row[1]))
+    return STATUS_REGISTRY.pair(path)
 
 
 def _limit_break_fixed_bonus(settings):
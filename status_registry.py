@@ -0,0 +1,248 @@
+import re
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+
+
+STATUS_DIR = Path(__file__).resolve().parent / "status"
+
+# ファイルの mtime を確認し直す間隔 (秒)。この間はメモリ上の表をそのまま使う
+CHECK_INTERVAL = 1.0
+
+
+def _num(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _percent(value, default=0.0):
+    text = str(value or "").strip()
+    if text.endswith("%"):
+        text = text[:-1]
+    return _num(text, default)
+
+
+def _read_rows(path):
+    rows = []
+    with path.open("r", encoding="utf-8-sig") as handle:
+        for raw_line in handle:
+            line = raw_line.strip()
+            if not line:
+                continue
+            rows.append([part.strip() for part in line.split(",")])
+    return rows
+
+
+class LevelTable:
+    """レベル → (HP, 攻撃力) の表。levels は昇順、hp/atk は同じ並びの配列。"""
+
+    __slots__ = ("levels", "hp", "atk", "rows")
+
+    def __init__(self, entries):
+        # rows はフロントエンド向け (ファイル記載順)
+        self.rows = [{"level": level, "hp": hp, "atk": atk} for level, hp, atk in entries]
+        ordered = sorted(entries, key=lambda item: item[0])
+        self.levels = [item[0] for item in ordered]
+        self.hp = [item[1] for item in ordered]
+        self.atk = [item[2] for item in ordered]
+
+    def lookup(self, level):
+        """level 以下で最大のレベルの値。該当がなければ先頭行、空なら (0, 0)。"""
+        if not self.levels:
+            return (0.0, 0.0)
+        index = bisect_right(self.levels, _int(level)) - 1
+        if index < 0:
+            index = 0
+        return (self.hp[index], self.atk[index])
+
+
+class TierTable:
+    """ティア → LevelTable (装備ステータス)。"""
+
+    __slots__ = ("tiers", "rows")
+
+    def __init__(self, entries):
+        self.rows = [{"tier": tier, "level": level, "hp": hp, "atk": atk} for tier, level, hp, atk in entries]
+        grouped = {}
+        for tier, level, hp, atk in entries:
+            grouped.setdefault(str(tier), []).append((level, hp, atk))
+        self.tiers = {tier: LevelTable(items) for tier, items in grouped.items()}
+
+    def lookup(self, tier, level):
+        table = self.tiers.get(str(tier))
+        if table is None:
+            return (0.0, 0.0)
+        return table.lookup(level)
+
+
+class RankTable:
+    """ランク → 効果量 (オーバーロードオプション)。value は割合 (percent / 100)。"""
+
+    __slots__ = ("values", "rows")
+
+    def __init__(self, entries):
+        self.rows = [{"rank": rank, "percent": percent, "value": percent / 100.0} for rank, percent in entries]
+        self.values = {rank: percent / 100.0 for rank, percent in entries}
+
+    def lookup(self, rank):
+        return self.values.get(_int(rank))
+
+
+def _parse_level_table(path):
+    entries = []
+    for row in _read_rows(path):
+        if len(row) < 3:
+            continue
+        entries.append((_int(row[0]), _num(row[1]), _num(row[2])))
+    return LevelTable(entries)
+
+
+def _parse_tier_table(path):
+    entries = []
+    for row in _read_rows(path):
+        if len(row) < 4:
+            continue
+        entries.append((row[0], _int(row[1]), _num(row[2]), _num(row[3])))
+    return TierTable(entries)
+
+
+def _parse_pair(path):
+    rows = _read_rows(path)
+    if not rows or len(rows[0]) < 2:
+        return (0.0, 0.0)
+    return (_num(rows[0][0]), _num(rows[0][1]))
+
+
+def _parse_rank_table(path):
+    entries = []
+    for row in _read_rows(path):
+        if len(row) < 2:
+            continue
+        entries.append((_int(row[0]), _percent(row[1])))
+    return RankTable(entries)
+
+
+def _parse_cube_format(path):
+    text = path.read_text(encoding="utf-8-sig")
+    values = {}
+    for effect_no, raw_values in re.findall(r"\[効果(\d+)\]:\s*\[([^\]]*)\]", text):
+        parsed = []
+        for value in raw_values.split(","):
+            value = value.strip()
+            if value:
+                parsed.append(_percent(value))
+        values[int(effect_no)] = parsed
+    return values
+
+
+EMPTY_VALUES = {
+    "level": LevelTable([]),
+    "tier": TierTable([]),
+    "pair": (0.0, 0.0),
+    "rank": RankTable([]),
+    "cube": {},
+}
+
+PARSERS = {
+    "level": _parse_level_table,
+    "tier": _parse_tier_table,
+    "pair": _parse_pair,
+    "rank": _parse_rank_table,
+    "cube": _parse_cube_format,
+}
+
+
+class StatusRegistry:
+    """status/ 以下のテキスト表を種類ごとの型付き構造に変換して保持する。
+
+    ファイルごとに mtime で無効化し、mtime の確認は CHECK_INTERVAL 秒に一度に間引く。
+    status_calculator と web_simulation はこのレジストリだけを経由して表を読む。
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._files = {}
+        self._dirs = {}
+
+    def _load(self, path, kind):
+        path = Path(path)
+        key = (str(path), kind)
+        now = time.monotonic()
+        cached = self._files.get(key)
+        if cached is not None and now - cached["checked_at"] < self.check_interval:
+            return cached["value"]
+
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is not None and cached["mtime_ns"] == mtime_ns:
+                cached["checked_at"] = now
+                return cached["value"]
+            value = EMPTY_VALUES[kind] if mtime_ns is None else PARSERS[kind](path)
+            self._files[key] = {"mtime_ns": mtime_ns, "value": value, "checked_at": now}
+            return value
+
+    def level_table(self, path):
+        return self._load(path, "level")
+
+    def tier_table(self, path):
+        return self._load(path, "tier")
+
+    def pair(self, path):
+        return self._load(path, "pair")
+
+    def rank_table(self, path):
+        return self._load(path, "rank")
+
+    def cube_format_values(self, path):
+        return self._load(path, "cube")
+
+    def list_files(self, directory, pattern):
+        """ディレクトリ内のファイル一覧 (stem 昇順)。ディレクトリの mtime で無効化する。"""
+        directory = Path(directory)
+        key = (str(directory), pattern)
+        now = time.monotonic()
+        cached = self._dirs.get(key)
+        if cached is not None and now - cached["checked_at"] < self.check_interval:
+            return cached["files"]
+
+        try:
+            mtime_ns = directory.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+
+        with self._lock:
+            cached = self._dirs.get(key)
+            if cached is not None and cached["mtime_ns"] == mtime_ns:
+                cached["checked_at"] = now
+                return cached["files"]
+            files = [] if mtime_ns is None else sorted(directory.glob(pattern), key=lambda item: item.stem)
+            self._dirs[key] = {"mtime_ns": mtime_ns, "files": files, "checked_at": now}
+            return files
+
+    def overload_option_tables(self):
+        root = STATUS_DIR / "オーバーロードオプション効果量"
+        return {path.stem: self.rank_table(path) for path in self.list_files(root, "*.txt")}
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._dirs.clear()
+
+
+STATUS_REGISTRY = StatusRegistry()
@@ -2,14 +2,38 @@ import argparse
 import copy
 import csv
 import json
+import math
+import os
+import random
+import sqlite3
+import statistics
 import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import result_store
+from models import BASE_FPS
 from simulator import Character, NikkeSimulator, Skill, WeaponConfig
 
 
 UNIVERSAL_BURST_STAGES = {"∀", "ALL", "all", "*"}
 
+FIELDNAMES = [
+    "file",
+    "name",
+    "burst_stage",
+    "cooldown_time",
+    "rotation_policy",
+    "target_damage",
+    "party_damage",
+    "runs",
+    "target_damage_std",
+    "target_damage_ci95",
+    "party_damage_ci95",
+    "status",
+    "error",
+]
+
 
 def create_character_from_json(char_file_path, skill_level=10):
     char_file_path = Path(char_file_path)
@@ -37,7 +61,7 @@ def create_character_from_json(char_file_path, skill_level=10):
 
     for key, value in stats.items():
         if key == "reload_time":
-            weapon_data["reload_frames"] = int(value * 60)
+            weapon_data["reload_frames"] = int(value * BASE_FPS)
         elif key == "damage_rate":
             weapon_data["multiplier"] = value
         elif key == "ammo":
@@ -250,7 +274,66 @@ def make_party_and_rotation(target):
     return party, rotation, cooldown, policy
 
 
-def run_one_character(char_file, args):
+def sweep_request(char_file, args):
+    """結果ストアに記録するリクエスト (同じ条件の実行を同じハッシュにまとめる)。"""
+    return {
+        "file": Path(char_file).name,
+        "skillLevel": args.skill_level,
+        "enemyElement": args.enemy_element,
+        "enemyCoreSize": args.enemy_core_size,
+        "enemySize": args.enemy_size,
+        "burstChargeTime": args.burst_charge_time,
+        "partBreakMode": args.part_break_mode,
+        "specialMode": args.special_mode,
+        "expectedValue": args.expected_value,
+        "expectedCountPolicy": args.expected_count_policy,
+        "fps": args.fps,
+        "durationSeconds": args.duration,
+    }
+
+
+def record_sweep_run(char_file, args, target, party, results, seed):
+    """1回分の結果を結果ストアへ追記する。記録に失敗してもスイープは止めない。"""
+    if not args.result_store:
+        return
+    members = []
+    for char in party:
+        result = results.get(char.name, {"total_damage": 0, "breakdown": {}})
+        members.append(
+            {
+                "file": Path(char_file).name if char is target else None,
+                "name": char.name,
+                "totalDamage": result["total_damage"],
+                "breakdown": [
+                    {
+                        "source": source,
+                        "sourceType": char.damage_source_types.get(source, "スキル"),
+                        "damage": damage,
+                        "count": char.damage_hit_counts.get(source, 0),
+                    }
+                    for source, damage in result.get("breakdown", {}).items()
+                    if float(damage) != 0.0
+                ],
+            }
+        )
+    request = sweep_request(char_file, args)
+    try:
+        connection = result_store.shared_connection(args.result_store)
+        result_store.record_run(
+            connection,
+            "sweep",
+            request,
+            result_store.cache_key("sweep", request, [Path(char_file).name]),
+            members,
+            sum(member["totalDamage"] for member in members),
+            seed=seed,
+            expected_value=args.expected_value,
+        )
+    except (sqlite3.Error, OSError, RuntimeError) as exc:
+        print(f"[result-store] record failed for {Path(char_file).name}: {type(exc).__name__}: {exc}", flush=True)
+
+
+def run_one_character(char_file, args, seed=None):
     target = create_character_from_json(char_file, skill_level=args.skill_level)
     party, rotation, cooldown, policy = make_party_and_rotation(target)
 
@@ -262,17 +345,23 @@ def run_one_character(char_file, args):
         enemy_size=args.enemy_size,
         part_break_mode=args.part_break_mode,
         burst_charge_time=args.burst_charge_time,
+        expected_value=args.expected_value,
+        expected_count_policy=args.expected_count_policy,
+        fps=args.fps,
+        duration_seconds=args.duration,
+        enable_logs=args.enable_logs,
     )
     sim.special_mode = args.special_mode
 
     try:
         results = sim.run()
     finally:
-        if hasattr(sim, "hp_log_handle") and not sim.hp_log_handle.closed:
+        if sim.hp_log_handle is not None and not sim.hp_log_handle.closed:
             sim.hp_log_handle.close()
 
     target_result = results.get(target.name, {"total_damage": 0, "breakdown": {}})
     party_damage = sum(r["total_damage"] for r in results.values())
+    record_sweep_run(char_file, args, target, party, results, seed)
 
     return {
         "file": Path(char_file).name,
@@ -287,15 +376,137 @@ def run_one_character(char_file, args):
     }
 
 
+def _error_row(char_file, exc):
+    return {
+        "file": Path(char_file).name,
+        "name": "",
+        "burst_stage": "",
+        "cooldown_time": "",
+        "rotation_policy": "",
+        "target_damage": 0,
+        "party_damage": 0,
+        "runs": 0,
+        "target_damage_std": 0,
+        "target_damage_ci95": 0,
+        "party_damage_ci95": 0,
+        "status": "ERROR",
+        "error": f"{type(exc).__name__}: {exc}\n{traceback.format_exc()}",
+    }
+
+
+def _ci95(values):
+    """平均の95%信頼区間の半幅 (正規近似)。1回だけなら 0。"""
+    if len(values) < 2:
+        return 0.0
+    return 1.96 * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def run_character_repeats(char_file, args):
+    """1キャラを args.repeat 回実行し、平均ダメージと標準偏差・信頼区間をまとめた1行を返す。
+
+    --seed 指定時は (seed, ファイル名, 回数) から乱数を初期化するので、並列数や実行順に
+    関係なく同じ結果になる。
+    """
+    runs = []
+    try:
+        for run_index in range(args.repeat):
+            seed = None
+            if args.seed is not None:
+                seed = f"{args.seed}:{Path(char_file).name}:{run_index}"
+                random.seed(seed)
+            runs.append(run_one_character(char_file, args, seed=seed))
+    except Exception as exc:
+        return _error_row(char_file, exc)
+
+    target_values = [float(run["target_damage"]) for run in runs]
+    party_values = [float(run["party_damage"]) for run in runs]
+    row = dict(runs[0])
+    row.update(
+        {
+            "target_damage": statistics.fmean(target_values),
+            "party_damage": statistics.fmean(party_values),
+            "runs": len(runs),
+            "target_damage_std": statistics.stdev(target_values) if len(runs) > 1 else 0.0,
+            "target_damage_ci95": _ci95(target_values),
+            "party_damage_ci95": _ci95(party_values),
+        }
+    )
+    return row
+
+
+def parse_shard(text):
+    """"i/n" (1 <= i <= n) を (i - 1, n) にする。"""
+    try:
+        index_text, count_text = str(text).split("/", 1)
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/n: {text}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index out of range: {text}")
+    return index - 1, count
+
+
 def iter_character_files(args):
     files = sorted(Path(args.characters_dir).glob("*.json"), key=lambda p: p.name)
     if args.name_contains:
         files = [p for p in files if args.name_contains in p.stem]
     if args.limit is not None:
         files = files[: args.limit]
+    if args.shard is not None:
+        # 順番に配ると、名前順で偏りがちな重いキャラも各シャードに散る
+        shard_index, shard_count = args.shard
+        files = [path for index, path in enumerate(files) if index % shard_count == shard_index]
     return files
 
 
+def load_completed_rows(jsonl_path):
+    """途中までの JSONL からファイル名ごとの最新行を読む (壊れた最終行は無視する)。"""
+    rows = {}
+    if not jsonl_path.exists():
+        return rows
+    with jsonl_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            rows[row.get("file", "")] = row
+    return rows
+
+
+def iter_results(files, args):
+    """(char_file, row) を終わったものから順に返す。jobs > 1 ならプロセスプールで並列に回す。"""
+    if args.jobs <= 1:
+        for char_file in files:
+            yield char_file, run_character_repeats(char_file, args)
+        return
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(run_character_repeats, char_file, args): char_file for char_file in files}
+        try:
+            for future in as_completed(futures):
+                char_file = futures[future]
+                try:
+                    row = future.result()
+                except Exception as exc:
+                    row = _error_row(char_file, exc)
+                yield char_file, row
+        except BaseException:
+            # Ctrl-C などでは未着手の分を捨て、書き出し済みの行は --resume で再利用する
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def write_csv(path, rows):
+    with path.open("w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run one standard damage test for every character JSON.")
     parser.add_argument("--characters-dir", default="characters")
@@ -309,49 +520,66 @@ def main():
     parser.add_argument("--burst-charge-time", type=float, default=5.0)
     parser.add_argument("--part-break-mode", action="store_true")
     parser.add_argument("--special-mode", action="store_true")
+    parser.add_argument("--expected-value", action="store_true", help="乱数を使わない期待値モードで実行する")
+    parser.add_argument("--expected-count-policy", choices=["carry", "round"], default="carry")
+    parser.add_argument("--fps", type=int, default=BASE_FPS, help="シミュレーションのフレームレート")
+    parser.add_argument("--duration", type=float, default=180.0, help="戦闘時間(秒)")
     parser.add_argument("--quiet", action="store_true")
+    parser.add_argument("--no-logs", action="store_true", help="logs/ へのシミュレーションログを書かない")
+    parser.add_argument("--jobs", type=int, default=1, help="並列プロセス数 (0 で CPU 数)")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="i/n: n 分割したうちの i 番目だけ実行する")
+    parser.add_argument("--repeat", type=int, default=1, help="1キャラあたりの実行回数 (平均と95%%信頼区間を出す)")
+    parser.add_argument("--seed", default=None, help="乱数シード (キャラ・回数ごとに派生させる)")
+    parser.add_argument("--jsonl", default=None, help="逐次書き出す JSONL (既定: --output の拡張子を .jsonl にしたもの)")
+    parser.add_argument("--resume", action="store_true", help="JSONL に OK で残っているキャラを飛ばして続きから実行する")
+    parser.add_argument(
+        "--result-store",
+        nargs="?",
+        const=str(result_store.DEFAULT_DB),
+        default=None,
+        metavar="PATH",
+        help=f"結果を SQLite に追記する (履歴用、PATH 省略時は {result_store.DEFAULT_DB.relative_to(result_store.ROOT_DIR)})",
+    )
     args = parser.parse_args()
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    args.repeat = max(1, args.repeat)
+    # logs/ は実行のたびに作り直されるので、並列実行ではログを書かない
+    args.enable_logs = not args.no_logs and args.jobs <= 1
 
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    jsonl_path = Path(args.jsonl) if args.jsonl else output_path.with_suffix(".jsonl")
 
-    rows = []
     files = iter_character_files(args)
-
-    for idx, char_file in enumerate(files, start=1):
-        if not args.quiet:
-            print(f"[{idx}/{len(files)}] {char_file.name}")
-        try:
-            row = run_one_character(char_file, args)
-        except Exception as exc:
-            row = {
-                "file": char_file.name,
-                "name": "",
-                "burst_stage": "",
-                "cooldown_time": "",
-                "rotation_policy": "",
-                "target_damage": 0,
-                "party_damage": 0,
-                "status": "ERROR",
-                "error": f"{type(exc).__name__}: {exc}\n{traceback.format_exc()}",
-            }
-        rows.append(row)
-
-    fieldnames = [
-        "file",
-        "name",
-        "burst_stage",
-        "cooldown_time",
-        "rotation_policy",
-        "target_damage",
-        "party_damage",
-        "status",
-        "error",
-    ]
-    with output_path.open("w", encoding="utf-8-sig", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    completed = load_completed_rows(jsonl_path) if args.resume else {}
+    done_files = {name for name, row in completed.items() if row.get("status") == "OK"}
+    pending = [path for path in files if path.name not in done_files]
+    if args.resume and not args.quiet:
+        print(f"Resume: {len(files) - len(pending)} done, {len(pending)} remaining")
+
+    file_names = {path.name for path in files}
+    rows_by_file = {name: row for name, row in completed.items() if name in file_names}
+    csv_exists = args.resume and output_path.exists()
+    # 1行終わるごとに JSONL と CSV へ追記してフラッシュする (中断しても失われない)
+    with jsonl_path.open("a" if args.resume else "w", encoding="utf-8") as jsonl_file, output_path.open(
+        "a" if csv_exists else "w", encoding="utf-8" if csv_exists else "utf-8-sig", newline=""
+    ) as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=FIELDNAMES, extrasaction="ignore")
+        if not csv_exists:
+            writer.writeheader()
+        for idx, (char_file, row) in enumerate(iter_results(pending, args), start=1):
+            if not args.quiet:
+                print(f"[{idx}/{len(pending)}] {char_file.name} {row['status']}", flush=True)
+            rows_by_file[char_file.name] = row
+            jsonl_file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            jsonl_file.flush()
+            writer.writerow(row)
+            csv_file.flush()
+
+    # 最後にファイル名順・重複なしで CSV を書き直す
+    rows = [rows_by_file[path.name] for path in files if path.name in rows_by_file]
+    write_csv(output_path, rows)
 
     ok_count = sum(1 for row in rows if row["status"] == "OK")
     error_count = len(rows) - ok_count
@@ -360,6 +588,7 @@ def main():
     print(f"Done: {ok_count} OK, {error_count} ERROR")
     print(f"Total target damage sum: {total_damage:,.0f}")
     print(f"Output: {output_path}")
+    print(f"Log: {jsonl_path}")
 
 
 if __name__ == "__main__":
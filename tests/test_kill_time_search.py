@@ -0,0 +1,58 @@
+import copy
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from web_simulation import run_web_kill_time_search
+
+
+# 画面から送られるのと同じく、各キャラに計算済みステータス (computedStats) を付けた編成
+FORMATION = [
+    {"kind": "dummy", "id": "dummy_b1"},
+    {"kind": "dummy", "id": "dummy_b2"},
+    {
+        "kind": "character",
+        "file": "2B.json",
+        "statusSettings": {"computedStats": {"baseAtk": 50000, "baseHp": 1000000}},
+    },
+    {
+        "kind": "character",
+        "file": "A2.json",
+        "statusSettings": {"level": 400, "computedStats": {"baseAtk": 50000, "baseHp": 1000000}},
+    },
+    {"kind": "dummy", "id": "dummy_b3"},
+]
+
+
+def search_payload(formation):
+    return {
+        "formation": formation,
+        "options": {"enemyHp": 6e7, "statusSettings": {"enabled": True}},
+        "search": {"key": "level", "targetSeconds": 150, "min": 250, "max": 300},
+    }
+
+
+class KillTimeSearchTest(unittest.TestCase):
+    def test_computed_stats_do_not_pin_the_searched_value(self):
+        with_computed = run_web_kill_time_search(search_payload(copy.deepcopy(FORMATION)))
+        plain_formation = copy.deepcopy(FORMATION)
+        for selection in plain_formation:
+            selection.pop("statusSettings", None)
+        plain = run_web_kill_time_search(search_payload(plain_formation))
+
+        self.assertTrue(with_computed["found"])
+        self.assertEqual(with_computed["value"], plain["value"])
+        self.assertLessEqual(with_computed["timeToKill"], 150)
+        # 探索値ごとに撃破時間が変わっている (計算済みステータスで固定されていない)
+        self.assertGreater(len({probe["timeToKill"] for probe in with_computed["probes"]}), 1)
+
+    def test_formation_without_characters_is_rejected(self):
+        payload = search_payload([{"kind": "dummy", "id": "dummy_b1"}])
+        with self.assertRaises(ValueError):
+            run_web_kill_time_search(payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
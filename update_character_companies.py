@@ -1,40 +1,17 @@
 import argparse
-import csv
 import json
 from pathlib import Path
 
+from name_resolver import build_company_resolver
+
 
 ROOT_DIR = Path(__file__).resolve().parent
 CHARACTER_DIR = ROOT_DIR / "characters"
 MANUFACTURER_CSV = ROOT_DIR / "資料" / "nikke_manufacturers_ja.csv"
 
 
-def normalize_name(value):
-    return (
-        str(value or "")
-        .replace("\ufeff", "")
-        .replace("：", ":")
-        .replace("・", "")
-        .replace(" ", "")
-        .replace("_", "")
-        .lower()
-        .strip()
-    )
-
-
 def load_company_lookup(path):
-    lookup = {}
-    with path.open("r", encoding="utf-8-sig", newline="") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            company = (row.get("manufacturer_ja") or "").strip()
-            if not company:
-                continue
-            for key in (row.get("japanese_name"), row.get("english_name")):
-                normalized = normalize_name(key)
-                if normalized:
-                    lookup[normalized] = company
-    return lookup
+    return build_company_resolver(path)
 
 
 def load_json(path):
@@ -75,30 +52,20 @@ def dump_json(path, data):
 
 
 def find_company(data, path, lookup):
-    candidates = [
-        data.get("name"),
-        path.stem,
-        path.name.removesuffix(".json"),
-    ]
-
-    expanded_candidates = []
-    for candidate in candidates:
+    """name・ファイル名の順に製造元を引く。見つかった (または曖昧だった) NameMatch を返す。
+
+    宝物版の接尾辞や「：」以降の衣装名を外した名前も照合する。
+    """
+    fallback = None
+    for candidate in (data.get("name"), path.stem):
         if not candidate:
             continue
-        text = str(candidate)
-        expanded_candidates.append(text)
-        for suffix in ("_宝物", " 宝物"):
-            if text.endswith(suffix):
-                expanded_candidates.append(text[: -len(suffix)])
-        for separator in ("：", ":"):
-            if separator in text:
-                expanded_candidates.append(text.split(separator, 1)[0])
-
-    for candidate in expanded_candidates:
-        company = lookup.get(normalize_name(candidate))
-        if company:
-            return company
-    return None
+        match = lookup.resolve(str(candidate))
+        if match:
+            return match
+        if fallback is None and match.ambiguous:
+            fallback = match
+    return fallback
 
 
 def update_companies(write=False):
@@ -114,10 +81,14 @@ def update_companies(write=False):
             unmatched.append((path.name, f"JSON読み込み失敗: {type(exc).__name__}: {exc}"))
             continue
 
-        company = find_company(data, path, lookup)
-        if not company:
-            unmatched.append((path.name, data.get("name", path.stem)))
+        match = find_company(data, path, lookup)
+        if not match:
+            label = data.get("name", path.stem)
+            if match is not None and match.ambiguous:
+                label = f"{label} (曖昧: {' / '.join(match.candidates)})"
+            unmatched.append((path.name, label))
             continue
+        company = match.target
 
         if data.get("company") == company:
             unchanged.append((path.name, company))
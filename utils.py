@@ -1,4 +1,11 @@
 import math
 
 def round_half_up(n):
-    return math.floor(n + 0.5)
\ No newline at end of file
+    return math.floor(n + 0.5)
+
+def safe_print(message):
+    # コンソールの文字コードエラーなどで呼び出し元 (サーバーのリクエスト処理など) を失敗させない
+    try:
+        print(message, flush=True)
+    except Exception:
+        pass
\ No newline at end of file
@@ -0,0 +1,343 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+
+# キャラ JSON の検査をまとめて行う。各ファイルは1回だけ読み、登録したルールを1回の走査で全部当てる。
+# 結果はファイルの mtime・サイズごとにキャッシュするので、変更の無いファイルは読み直さない。
+
+ROOT_DIR = Path(__file__).resolve().parent
+DEFAULT_CACHE = ROOT_DIR / ".validate_cache.json"
+SKILL_LEVEL_MAX = 10
+# これより多くのファイルを検査するときだけプロセスプールを使う
+PARALLEL_MIN_FILES = 16
+
+# engine_skills / engine_burst などで処理される effect_type
+KNOWN_EFFECT_TYPES = {
+    "activate_flag",
+    "ammo_charge",
+    "buff",
+    "burst_gauge_charge",
+    "change_burst_stage",
+    "cleanse_debuff",
+    "convert_hp_to_atk",
+    "cooldown_reduction",
+    "cover_heal",
+    "cumulative_stages",
+    "damage",
+    "debuff",
+    "decrease_debuff_stack_count",
+    "delayed_action",
+    "delayed_snapshot_damage",
+    "dot",
+    "force_reload",
+    "heal",
+    "immunity_buff",
+    "increase_current_stack_count",
+    "lose_hp",
+    "periodic_damage",
+    "reduce_full_burst_time",
+    "reduce_skill_cooldown",
+    "reenter_burst_stage",
+    "refill_ammo",
+    "refill_ammo_fixed",
+    "regenerate",
+    "remove_buff",
+    "remove_buff_by_tag",
+    "remove_dot",
+    "remove_dot_by_tag",
+    "set_current_ammo",
+    "set_stack",
+    "shield",
+    "snapshot_damage",
+    "stack_buff",
+    "stack_dot",
+    "stun",
+    "weapon_change",
+}
+
+# エンジンが発火させる trigger_type。manual / dummy は自動では発火しない (段階スキルの中身や置き場所用)
+KNOWN_TRIGGER_TYPES = {
+    "ally_ammo_consumed_count",
+    "ammo_empty",
+    "buff_applied",
+    "charging_time",
+    "core_hit",
+    "critical_hit",
+    "dummy",
+    "full_charge",
+    "full_charge_count",
+    "interval_15s",
+    "interval_after_burst_end",
+    "manual",
+    "non_core_hit",
+    "on_burst_1_enter",
+    "on_burst_2_enter",
+    "on_burst_3_enter",
+    "on_burst_end",
+    "on_burst_enter",
+    "on_receive_cover_heal",
+    "on_receive_heal",
+    "on_start",
+    "on_use_burst_skill",
+    "part_break",
+    "pellet_hit",
+    "reload_complete",
+    "shot_count",
+    "stack_count",
+    "time_interval",
+    "variable_interval",
+}
+
+# ルール名 → (説明, 検査関数)。検査関数は (dict ノード, JSON パス) を受け取り、指摘を yield する
+RULES = {}
+
+
+def rule(name, description):
+    def register(func):
+        RULES[name] = (description, func)
+        return func
+
+    return register
+
+
+def _kwargs(node):
+    return node.get("kwargs") if isinstance(node.get("kwargs"), dict) else {}
+
+
+@rule("atk_fixed_finally", "atk_buff_fixed must not scale from final ATK (target_stat=atk, stat_type=finally)")
+def check_atk_fixed_finally(node, path):
+    kwargs = _kwargs(node)
+    if (
+        kwargs.get("buff_type") == "atk_buff_fixed"
+        and kwargs.get("target_stat") == "atk"
+        and kwargs.get("stat_type") == "finally"
+    ):
+        yield {
+            "path": path,
+            "name": node.get("name", ""),
+            "effect_type": node.get("effect_type", ""),
+            "effect_no": kwargs.get("effect_no", ""),
+        }
+
+
+@rule("stack_name", "stack_buff needs kwargs.stack_name")
+def check_stack_name(node, path):
+    kwargs = _kwargs(node)
+    if node.get("effect_type") == "stack_buff" and not kwargs.get("stack_name"):
+        yield {
+            "path": path,
+            "name": node.get("name", ""),
+            "buff_type": kwargs.get("buff_type", ""),
+            "effect_no": kwargs.get("effect_no", ""),
+        }
+
+
+@rule("effect_type", "effect_type must be one the engine handles")
+def check_effect_type(node, path):
+    effect_type = node.get("effect_type")
+    if effect_type is not None and effect_type not in KNOWN_EFFECT_TYPES:
+        yield {"path": path, "name": node.get("name", ""), "message": f"unknown effect_type {effect_type!r}"}
+
+
+@rule("trigger_type", "trigger_type must be one the engine fires")
+def check_trigger_type(node, path):
+    trigger_type = node.get("trigger_type")
+    if trigger_type is not None and trigger_type not in KNOWN_TRIGGER_TYPES:
+        yield {"path": path, "name": node.get("name", ""), "message": f"unknown trigger_type {trigger_type!r}"}
+
+
+@rule("list_length", f"*_list values need one entry per skill level (1-{SKILL_LEVEL_MAX})")
+def check_list_length(node, path):
+    for key, value in node.items():
+        if not key.endswith("_list"):
+            continue
+        if not isinstance(value, list):
+            message = f"{key} is {type(value).__name__}, not a list (never resolved)"
+        elif len(value) != SKILL_LEVEL_MAX:
+            message = f"{key} has {len(value)} entries, expected {SKILL_LEVEL_MAX}"
+        else:
+            continue
+        yield {"path": f"{path}.{key}", "name": node.get("name", ""), "message": message}
+
+
+def iter_findings(data, rule_names=None):
+    """data を1回だけ走査し、各 dict ノードに rule_names (既定: 全ルール) を当てる。
+
+    (ルール名, 指摘) を yield する。
+    """
+    checks = [(name, RULES[name][1]) for name in (rule_names or RULES)]
+    stack = [(data, "$")]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, dict):
+            for name, check in checks:
+                for finding in check(node, path):
+                    yield name, finding
+            children = [(value, f"{path}.{key}") for key, value in node.items()]
+        elif isinstance(node, list):
+            children = [(value, f"{path}[{index}]") for index, value in enumerate(node)]
+        else:
+            continue
+        # 文書順に出すため逆順に積む
+        stack.extend(reversed(children))
+
+
+def validate_file(path, rule_names=None):
+    """1ファイルを検査する (ワーカープロセスでも呼ばれる)。"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as exc:
+        return {"error": f"{type(exc).__name__}: {exc}", "findings": []}
+    findings = []
+    for name, finding in iter_findings(data, rule_names):
+        finding["rule"] = name
+        findings.append(finding)
+    return {"error": None, "findings": findings}
+
+
+def iter_json_files(paths):
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_file() and path.suffix.lower() == ".json":
+            yield path
+        elif path.is_dir():
+            yield from sorted(path.rglob("*.json"))
+
+
+def rules_signature(rule_names):
+    """ルールの選択とこのファイルの内容から決まる値。ルールを直したらキャッシュは自動で無効になる。"""
+    digest = hashlib.sha1(Path(__file__).read_bytes())
+    digest.update(json.dumps(sorted(rule_names)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_cache(path, signature):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("signature") != signature:
+        return {}
+    return cache.get("files", {})
+
+
+def save_cache(path, signature, entries):
+    tmp_path = Path(f"{path}.tmp")
+    tmp_path.write_text(json.dumps({"signature": signature, "files": entries}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def validate_paths(paths, rule_names=None, cache_path=DEFAULT_CACHE, jobs=0):
+    """paths 以下の JSON を検査し、{ファイル: 結果} と再検査したファイル数を返す。"""
+    rule_names = list(rule_names or RULES)
+    signature = rules_signature(rule_names)
+    cache = load_cache(cache_path, signature) if cache_path else {}
+
+    results = {}
+    stale = []
+    for path in iter_json_files(paths):
+        key = str(path.resolve())
+        stat = path.stat()
+        entry = cache.get(key)
+        if entry is not None and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            results[key] = entry
+        else:
+            stale.append((key, stat))
+
+    jobs = jobs or os.cpu_count() or 1
+    if len(stale) >= PARALLEL_MIN_FILES and jobs > 1:
+        # キャッシュが効いているときは不要なので、プロセスプールはここで読み込む
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            outcomes = executor.map(validate_file, [key for key, _ in stale], [rule_names] * len(stale), chunksize=8)
+            outcomes = list(outcomes)
+    else:
+        outcomes = [validate_file(key, rule_names) for key, _ in stale]
+
+    for (key, stat), outcome in zip(stale, outcomes):
+        results[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, **outcome}
+
+    if cache_path and stale:
+        # 今回見ていないファイルの結果も残す (別のディレクトリを検査したとき用)
+        cache.update(results)
+        save_cache(cache_path, signature, cache)
+    return results, len(stale)
+
+
+def format_finding(finding):
+    details = []
+    for key in ("name", "effect_type", "buff_type"):
+        if finding.get(key):
+            details.append(f"{key}={finding[key]}")
+    if finding.get("effect_no", "") != "":
+        details.append(f"effect_no={finding['effect_no']}")
+    text = finding["path"]
+    if finding.get("message"):
+        text += f" {finding['message']}"
+    if details:
+        text += f" ({', '.join(details)})"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate character JSON files with all registered rules in one pass.")
+    parser.add_argument("paths", nargs="*", default=["characters"], help="JSON files or directories. Defaults to characters/.")
+    parser.add_argument("--rules", nargs="+", choices=sorted(RULES), default=None, help="rules to run (default: all)")
+    parser.add_argument("--list-rules", action="store_true")
+    parser.add_argument("--jobs", type=int, default=0, help="parallel processes (0: CPU count)")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE), help="result cache file")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print findings as JSON lines")
+    args = parser.parse_args()
+
+    if args.list_rules:
+        for name, (description, _) in RULES.items():
+            print(f"{name}: {description}")
+        return 0
+
+    results, checked = validate_paths(
+        args.paths,
+        rule_names=args.rules,
+        cache_path=None if args.no_cache else Path(args.cache),
+        jobs=args.jobs,
+    )
+
+    finding_count = 0
+    error_count = 0
+    root = Path.cwd()
+    for key in sorted(results):
+        result = results[key]
+        try:
+            file_label = str(Path(key).relative_to(root))
+        except ValueError:
+            file_label = key
+        if result["error"]:
+            error_count += 1
+            if args.json:
+                print(json.dumps({"file": file_label, "error": result["error"]}, ensure_ascii=False))
+            else:
+                print(f"- {file_label} :: {result['error']}")
+        for finding in result["findings"]:
+            finding_count += 1
+            if args.json:
+                print(json.dumps({"file": file_label, **finding}, ensure_ascii=False))
+            else:
+                print(f"- [{finding['rule']}] {file_label} :: {format_finding(finding)}")
+
+    summary = (
+        f"{len(results)} file(s), {checked} checked, {len(results) - checked} cached: "
+        f"{finding_count} finding(s), {error_count} unreadable"
+    )
+    print(summary, file=sys.stderr if args.json else sys.stdout)
+    return 1 if finding_count or error_count else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,145 +1,144 @@
 import argparse
-import json
-import mimetypes
-import traceback
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from pathlib import Path
-from urllib.parse import unquote, urlparse
-
-from web_simulation import (
-    IMAGE_DIR,
-    ICON_DIR,
-    OVERLOAD_ICON_DIR,
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse
+
+from utils import safe_print
+from web_dispatch import DEFAULT_QUEUE_DEPTH, SimulationDispatcher
+from web_json import DEFAULT_FLOAT_DIGITS, set_float_digits
+from web_routes import (
+    CHUNKED_TERMINATOR,
     ROOT_DIR,
-    list_character_catalog,
-    run_web_batch_simulation,
-    run_web_simulation,
+    chunk_frame,
+    error_response,
+    request_content_length,
+    route_get,
+    run_simulation,
+    simulation_route,
+    start_background_warm_up,
 )
 
 
-STATIC_DIR = ROOT_DIR / "web_static"
-mimetypes.add_type("image/webp", ".webp")
+DEFAULT_HTTP_THREADS = 32
+# keep-alive 接続がアイドルのままワーカースレッドを占有し続けないようにする (秒)
+KEEP_ALIVE_TIMEOUT = 15
 
 
-def safe_print(message):
-    try:
-        print(message, flush=True)
-    except Exception:
-        pass
-
-
-class SimulatorWebHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        parsed = urlparse(self.path)
-        path = parsed.path
+class PooledHTTPServer(HTTPServer):
+    """接続ごとにスレッドを作らず、固定サイズのスレッドプールで処理する HTTPServer。"""
 
-        if path == "/api/characters":
-            self._send_json(200, list_character_catalog())
-            return
-
-        if path == "/":
-            self._send_static(STATIC_DIR / "index.html")
-            return
+    def __init__(self, server_address, handler_class, threads=DEFAULT_HTTP_THREADS, dispatcher=None):
+        # bind に失敗すると __init__ 内で server_close が呼ばれるので先に用意しておく
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="web")
+        self.dispatcher = dispatcher or SimulationDispatcher(workers=0)
+        super().__init__(server_address, handler_class)
 
-        if path in {"/batch", "/batch/"}:
-            self._send_static(STATIC_DIR / "batch.html")
-            return
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request_worker, request, client_address)
 
-        if path in {"/b3", "/b3/"}:
-            self._send_static(STATIC_DIR / "b3_compare.html")
-            return
-
-        if path.startswith("/static/"):
-            relative = unquote(path.removeprefix("/static/"))
-            self._send_static(STATIC_DIR / relative)
-            return
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
 
-        if path.startswith("/images/"):
-            relative = unquote(path.removeprefix("/images/"))
-            self._send_file(IMAGE_DIR / relative, IMAGE_DIR)
-            return
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.dispatcher.shutdown()
 
-        if path.startswith("/overload-icons/"):
-            relative = unquote(path.removeprefix("/overload-icons/"))
-            self._send_file(OVERLOAD_ICON_DIR / relative, OVERLOAD_ICON_DIR)
-            return
 
-        if path.startswith("/icons/"):
-            relative = unquote(path.removeprefix("/icons/"))
-            self._send_file(ICON_DIR / relative, ICON_DIR)
-            return
+class SimulatorWebHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
 
-        self._send_json(404, {"status": "error", "error": "Not found"})
+    def do_GET(self):
+        self._send(route_get(urlparse(self.path).path, self.headers, self.server.dispatcher))
 
     def do_POST(self):
-        parsed = urlparse(self.path)
-        if parsed.path not in {"/api/simulate", "/api/simulate-batch"}:
-            self._send_json(404, {"status": "error", "error": "Not found"})
+        content_length = request_content_length(self.headers)
+        if content_length is None:
+            # 本文を読み捨てられないので、この接続は応答後に閉じる
+            self.close_connection = True
+            self._send(error_response(413, "Request body is too large"))
             return
+        body = self.rfile.read(content_length) if content_length else b""
 
-        try:
-            content_length = int(self.headers.get("Content-Length", "0"))
-            if content_length > 2 * 1024 * 1024:
-                raise ValueError("Request body is too large")
-            body = self.rfile.read(content_length).decode("utf-8")
-            payload = json.loads(body) if body else {}
-            if parsed.path == "/api/simulate-batch":
-                result = run_web_batch_simulation(payload)
-            else:
-                result = run_web_simulation(payload)
-            self._send_json(200, result)
-        except Exception as exc:
-            self._send_json(
-                400,
-                {
-                    "status": "error",
-                    "error": f"{type(exc).__name__}: {exc}",
-                },
-            )
+        func = simulation_route(urlparse(self.path).path)
+        if func is None:
+            self._send(error_response(404, "Not found"))
+            return
+        self._send(run_simulation(self.server.dispatcher, func, body))
 
     def log_message(self, format, *args):
         safe_print(f"[web] {self.address_string()} - {format % args}")
 
-    def _send_json(self, status, payload):
-        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Content-Length", str(len(data)))
+    def _send(self, response):
+        body = response.body
+        streaming = response.streaming
+        if streaming and self.request_version != "HTTP/1.1":
+            # HTTP/1.0 のクライアントは chunked を解釈できない
+            body = b"".join(body)
+            streaming = False
+
+        self.send_response(response.status)
+        for name, value in response.headers:
+            self.send_header(name, value)
+        if streaming:
+            self.send_header("Transfer-Encoding", "chunked")
+        elif body is not None:
+            self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(data)
-
-    def _send_static(self, path):
-        self._send_file(path, STATIC_DIR)
 
-    def _send_file(self, path, root):
-        path = path.resolve()
-        safe_root = root.resolve()
-        if path != safe_root and safe_root not in path.parents:
-            self._send_json(403, {"status": "error", "error": "Forbidden"})
+        if not streaming:
+            if body:
+                self.wfile.write(body)
             return
-        if not path.exists() or not path.is_file():
-            self._send_json(404, {"status": "error", "error": "Not found"})
-            return
-
-        content = path.read_bytes()
-        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
-        self.send_response(200)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Cache-Control", "no-store")
-        self.send_header("Content-Length", str(len(content)))
-        self.end_headers()
-        self.wfile.write(content)
+        try:
+            for chunk in body:
+                if chunk:
+                    self.wfile.write(chunk_frame(chunk))
+            self.wfile.write(CHUNKED_TERMINATOR)
+        except Exception:
+            # 途中で失敗した応答は終端できないので接続ごと切る
+            self.close_connection = True
+            raise
 
 
 def main():
     parser = argparse.ArgumentParser(description="Run the local simulator web UI.")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=DEFAULT_HTTP_THREADS, help="HTTP worker threads")
+    parser.add_argument(
+        "--sim-workers",
+        type=int,
+        default=None,
+        help="simulation worker processes (default: CPU count, 0: run in-process on one thread)",
+    )
+    parser.add_argument(
+        "--sim-queue",
+        type=int,
+        default=DEFAULT_QUEUE_DEPTH,
+        help="simulations allowed to wait for a worker before answering 429",
+    )
+    parser.add_argument(
+        "--float-digits",
+        type=int,
+        default=DEFAULT_FLOAT_DIGITS,
+        help="decimal places kept for floats in JSON results (negative: no rounding)",
+    )
     args = parser.parse_args()
 
-    server = ThreadingHTTPServer((args.host, args.port), SimulatorWebHandler)
+    set_float_digits(args.float_digits)
+    dispatcher = SimulationDispatcher(workers=args.sim_workers, queue_depth=args.sim_queue)
+    server = PooledHTTPServer((args.host, args.port), SimulatorWebHandler, threads=args.threads, dispatcher=dispatcher)
     url = f"http://{args.host}:{args.port}"
     safe_print(f"Simulator web UI: {url}")
+    # ソケットはもう待ち受けているので、カタログなどの準備はリクエストと並行して進める
+    start_background_warm_up()
     try:
         server.serve_forever()
     except KeyboardInterrupt:
@@ -152,5 +151,7 @@ if __name__ == "__main__":
     try:
         main()
     except Exception:
+        import traceback
+
         (ROOT_DIR / "web_server_error.log").write_text(traceback.format_exc(), encoding="utf-8")
         raise
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import http.client
+import io
+from email.utils import formatdate
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+from utils import safe_print
+from web_app import KEEP_ALIVE_TIMEOUT
+from web_dispatch import DEFAULT_QUEUE_DEPTH, SimulationDispatcher
+from web_json import DEFAULT_FLOAT_DIGITS, set_float_digits
+from web_routes import (
+    CHUNKED_TERMINATOR,
+    Response,
+    chunk_frame,
+    error_response,
+    json_response,
+    parse_json_body,
+    request_content_length,
+    route_get,
+    simulation_error_response,
+    simulation_route,
+    start_background_warm_up,
+)
+
+
+# asyncio ストリームで動く web_app の代替エントリーポイント。
+# ルーティングと応答の組み立ては web_routes を web_app と共有し、ここでは HTTP/1.1 の
+# 読み書きだけを行う。ブロッキングする処理 (ファイル・カタログ・シミュレーション) は executor へ逃がす。
+
+MAX_HEADER_BYTES = 64 * 1024
+
+
+def _keep_alive(version, headers):
+    connection = (headers.get("Connection") or "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+async def _write_response(writer, response, keep_alive, version="HTTP/1.1"):
+    loop = asyncio.get_running_loop()
+    body = response.body
+    streaming = response.streaming
+    if streaming and version != "HTTP/1.1":
+        # HTTP/1.0 のクライアントは chunked を解釈できない
+        body = await loop.run_in_executor(None, b"".join, body)
+        streaming = False
+
+    try:
+        phrase = HTTPStatus(response.status).phrase
+    except ValueError:
+        phrase = ""
+    lines = [
+        f"HTTP/1.1 {response.status} {phrase}",
+        f"Date: {formatdate(usegmt=True)}",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in response.headers)
+    if streaming:
+        lines.append("Transfer-Encoding: chunked")
+    elif body is not None:
+        lines.append(f"Content-Length: {len(body)}")
+    if not keep_alive:
+        lines.append("Connection: close")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    if not streaming:
+        if body:
+            writer.write(body)
+        await writer.drain()
+        return
+    # エンコードはチャンク単位で executor に回し、イベントループを塞がない
+    chunks = iter(body)
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            break
+        if chunk:
+            writer.write(chunk_frame(chunk))
+            await writer.drain()
+    writer.write(CHUNKED_TERMINATOR)
+    await writer.drain()
+
+
+class AsyncSimulatorServer:
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if isinstance(peer, tuple) else str(peer)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    await _write_response(writer, error_response(431, "Request header fields too large"), False)
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                request_line, _, header_block = head.partition(b"\r\n")
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _write_response(writer, error_response(400, "Bad request"), False)
+                    break
+                headers = http.client.parse_headers(io.BytesIO(header_block))
+                keep_alive = _keep_alive(version, headers)
+
+                response, keep_alive = await self._respond(reader, method, target, headers, keep_alive)
+                await _write_response(writer, response, keep_alive, version)
+                safe_print(f'[web] {client} - "{method} {target} {version}" {response.status} -')
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, reader, method, target, headers, keep_alive):
+        loop = asyncio.get_running_loop()
+        path = urlparse(target).path
+
+        if method == "GET":
+            response = await loop.run_in_executor(None, route_get, path, headers, self.dispatcher)
+            return response, keep_alive
+
+        if method == "POST":
+            content_length = request_content_length(headers)
+            if content_length is None:
+                return error_response(413, "Request body is too large"), False
+            body = await reader.readexactly(content_length) if content_length else b""
+            func = simulation_route(path)
+            if func is None:
+                return error_response(404, "Not found"), keep_alive
+            try:
+                # 受付判定は submit 時点で行われ、待ち合わせ中はスレッドを占有しない。
+                # Future は重複リクエストと共有されるので、接続側のキャンセルが伝わらないよう shield する
+                future = self.dispatcher.submit(func, parse_json_body(body))
+                result = await asyncio.shield(asyncio.wrap_future(future))
+                response = json_response(200, result, stream=True)
+            except Exception as exc:
+                response = simulation_error_response(exc)
+            return response, keep_alive
+
+        return Response(501, [("Allow", "GET, POST")], b""), False
+
+    def close(self):
+        self.dispatcher.shutdown()
+
+
+async def serve(host, port, dispatcher):
+    app = AsyncSimulatorServer(dispatcher)
+    server = await asyncio.start_server(app.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    safe_print(f"Simulator web UI (asyncio): http://{host}:{port}")
+    start_background_warm_up()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        app.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local simulator web UI on asyncio streams.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--sim-workers",
+        type=int,
+        default=None,
+        help="simulation worker processes (default: CPU count, 0: run in-process on one thread)",
+    )
+    parser.add_argument(
+        "--sim-queue",
+        type=int,
+        default=DEFAULT_QUEUE_DEPTH,
+        help="simulations allowed to wait for a worker before answering 429",
+    )
+    parser.add_argument(
+        "--float-digits",
+        type=int,
+        default=DEFAULT_FLOAT_DIGITS,
+        help="decimal places kept for floats in JSON results (negative: no rounding)",
+    )
+    args = parser.parse_args()
+
+    set_float_digits(args.float_digits)
+    dispatcher = SimulationDispatcher(workers=args.sim_workers, queue_depth=args.sim_queue)
+    try:
+        asyncio.run(serve(args.host, args.port, dispatcher))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+
+# mimetypes の既定表に無い (か環境で変わる) 拡張子。mimetypes.add_type は起動時に表の読み込みを伴うので使わない
+CONTENT_TYPE_OVERRIDES = {".webp": "image/webp"}
+
+
+def file_tree_signature(watch_entries):
+    """監視対象の (パス, 再帰するか, ファイル単位で見るか) から変更検知用の署名を作る。
+
+    ファイル単位で見ない場合はディレクトリ自体の mtime (追加・削除・リネーム) のみを見る。
+    """
+    parts = []
+    for root, recursive, per_file in watch_entries:
+        root = os.fspath(root)
+        try:
+            stat = os.stat(root)
+        except OSError:
+            parts.append((root, None))
+            continue
+        parts.append((root, stat.st_mtime_ns))
+        if not per_file:
+            continue
+        if recursive:
+            for dir_path, dir_names, file_names in os.walk(root):
+                dir_names.sort()
+                for name in sorted(file_names):
+                    try:
+                        file_stat = os.stat(os.path.join(dir_path, name))
+                    except OSError:
+                        continue
+                    parts.append((dir_path, name, file_stat.st_mtime_ns, file_stat.st_size))
+        else:
+            with os.scandir(root) as entries:
+                for entry in sorted(entries, key=lambda item: item.name):
+                    if not entry.is_file():
+                        continue
+                    file_stat = entry.stat()
+                    parts.append((entry.name, file_stat.st_mtime_ns, file_stat.st_size))
+    return tuple(parts)
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match ヘッダーが etag に一致するか (弱い比較)。"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == target:
+            return True
+    return False
+
+
+def accepts_gzip(accept_encoding):
+    if not accept_encoding:
+        return False
+    for token in accept_encoding.split(","):
+        name, _, params = token.strip().partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+class CachedJsonResource:
+    """JSONレスポンスを一度だけ組み立て、シリアライズ済み・gzip済みの本文と ETag を保持する。
+
+    signature() の戻り値が変わったときだけ builder() を呼び直す。signature の確認自体も
+    check_interval 秒に一度に間引く。
+    """
+
+    def __init__(self, builder, signature, check_interval=1.0):
+        self.builder = builder
+        self.signature = signature
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entry = None
+        self._checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        entry = self._entry
+        if entry is not None and now - self._checked_at < self.check_interval:
+            return entry
+
+        with self._lock:
+            entry = self._entry
+            now = time.monotonic()
+            if entry is not None and now - self._checked_at < self.check_interval:
+                return entry
+            signature = self.signature()
+            if entry is None or entry["signature"] != signature:
+                entry = self._build(signature)
+                self._entry = entry
+            self._checked_at = now
+            return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+            self._checked_at = 0.0
+
+    def _build(self, signature):
+        data = self.builder()
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha1(body).hexdigest()
+        return {
+            "signature": signature,
+            "data": data,
+            "body": body,
+            "gzip_body": gzip.compress(body, compresslevel=6, mtime=0),
+            "etag": f'"{digest}"',
+            "gzip_etag": f'"{digest}-gz"',
+        }
+
+
+# gzip 済みの版も保持するテキスト系 Content-Type
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+
+# 画像などは長期キャッシュ、HTML/JS/CSS は毎回 ETag で再検証させる
+LONG_CACHE_CONTROL = "public, max-age=604800"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def _is_compressible(content_type):
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def not_modified(headers, entry):
+    """If-None-Match / If-Modified-Since から 304 を返せるか判定する。"""
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match:
+        return etag_matches(if_none_match, entry["etag"]) or etag_matches(if_none_match, entry.get("gzip_etag"))
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        return int(entry["mtime"]) <= int(since)
+    return False
+
+
+class StaticFileCache:
+    """静的ファイルの本文をメモリに保持する LRU キャッシュ。
+
+    キーはパスで、mtime とサイズが変わったエントリは読み直す。
+    max_entry_bytes を超えるファイルはキャッシュせず毎回読む。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        key = os.fspath(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["version"] == version:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._load(path, stat, version)
+        if entry["size"] > self.max_entry_bytes:
+            return entry
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old["size"]
+            self._entries[key] = entry
+            self._total_bytes += entry["size"]
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted["size"]
+        return entry
+
+    def _load(self, path, stat, version):
+        with open(path, "rb") as handle:
+            body = handle.read()
+        content_type = (
+            CONTENT_TYPE_OVERRIDES.get(os.path.splitext(path)[1].lower())
+            or mimetypes.guess_type(os.fspath(path))[0]
+            or "application/octet-stream"
+        )
+        gzip_body = None
+        if _is_compressible(content_type) and len(body) > 512:
+            compressed = gzip.compress(body, compresslevel=6, mtime=0)
+            if len(compressed) < len(body):
+                gzip_body = compressed
+        digest = hashlib.sha1(body).hexdigest()
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        return {
+            "version": version,
+            "body": body,
+            "gzip_body": gzip_body,
+            "size": len(body) + (len(gzip_body) if gzip_body else 0),
+            "content_type": content_type,
+            "etag": f'"{digest}"',
+            # 同じ内容でも符号化が違えば別表現なので gzip 版は別の ETag にする
+            "gzip_etag": f'"{digest}-gz"' if gzip_body is not None else None,
+            "mtime": stat.st_mtime,
+            "last_modified": formatdate(stat.st_mtime, usegmt=True),
+            "cache_control": LONG_CACHE_CONTROL if content_type.startswith("image/") else REVALIDATE_CACHE_CONTROL,
+        }
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
+
+
+# POST ルート → web_simulation の関数名 (プロセスプールへ渡すのでモジュールレベル関数に限る)
+SIMULATION_ROUTES = {
+    "/api/simulate": "run_recorded_web_simulation",
+    "/api/simulate-batch": "run_web_batch_simulation",
+    "/api/kill-time-search": "run_web_kill_time_search",
+}
+
+DEFAULT_QUEUE_DEPTH = 4
+# 実行時間の実績が無いときの Retry-After 推定に使う1件あたりの秒数
+INITIAL_RUN_SECONDS = 2.0
+
+
+def simulation_function(name):
+    """web_simulation (エンジン一式) は起動を遅くするので、使う時点で読み込む。"""
+    import web_simulation
+
+    return getattr(web_simulation, name)
+
+
+def payload_key(func, payload):
+    """同一リクエスト判定用のキー。キー順や空白に依存しない正規化 JSON のハッシュ。"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{func.__name__}:{digest}"
+
+
+class SimulationBusy(Exception):
+    """実行中+待ちのシミュレーションが上限に達している (HTTP 429 で返す)。"""
+
+    def __init__(self, retry_after):
+        super().__init__("Simulation workers are busy")
+        self.retry_after = retry_after
+
+
+class SimulationDispatcher:
+    """シミュレーションを固定サイズのプロセスプールで実行する。
+
+    実行中+待ちの件数を workers + queue_depth 件までに制限し、超えた分は待たせずに
+    SimulationBusy を送出する。workers=0 のときはサブプロセスを使わず、このプロセス内の
+    1本のスレッドで順に実行する。
+
+    同じ関数・同じ内容のペイロードが実行中なら、新しく実行せずにその Future を共有する
+    (同時に開かれた共有リンクなどの重複リクエスト対策)。
+    """
+
+    def __init__(self, workers=None, queue_depth=DEFAULT_QUEUE_DEPTH):
+        self.workers = max(1, os.cpu_count() or 1) if workers is None else max(0, int(workers))
+        self.capacity = max(1, self.workers) + max(0, int(queue_depth))
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._avg_seconds = INITIAL_RUN_SECONDS
+        # 重複リクエストのまとめ込み。_coalesce_lock の中で _lock を取ることはあるが逆はしない
+        self._coalesce_lock = threading.Lock()
+        self._pending = {}
+        self.coalesce_hits = 0
+        self.coalesce_misses = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.workers == 0:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulation")
+                else:
+                    # プロセスプールを使うときだけ multiprocessing 一式を読み込む
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    # fork だと待ち受けソケットなどを子プロセスが引き継いでしまうので spawn で起動する
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+            return self._executor
+
+    def _reset_executor(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def retry_after(self):
+        """今の待ち行列がはけるまでのおおよその秒数 (最低1秒)。"""
+        with self._lock:
+            pending = self._in_flight
+            avg_seconds = self._avg_seconds
+        rounds = math.ceil(pending / max(1, self.workers))
+        return max(1, math.ceil(rounds * avg_seconds))
+
+    def _record_duration(self, seconds):
+        with self._lock:
+            self._avg_seconds = self._avg_seconds * 0.8 + seconds * 0.2
+
+    def submit(self, func, payload):
+        """受け付けられれば concurrent.futures.Future を返す。上限なら SimulationBusy。
+
+        返した Future は重複リクエストと共有されるので、呼び出し側で cancel しないこと。
+        """
+        key = payload_key(func, payload)
+        with self._coalesce_lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self.coalesce_hits += 1
+                return future
+            try:
+                future = self._submit(func, payload)
+            except SimulationBusy:
+                self.rejected += 1
+                raise
+            self.coalesce_misses += 1
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key, future):
+        with self._coalesce_lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def _submit(self, func, payload):
+        if not self._slots.acquire(blocking=False):
+            raise SimulationBusy(self.retry_after())
+        with self._lock:
+            self._in_flight += 1
+        started_at = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, payload)
+        except BaseException:
+            self._finish(executor, started_at, None)
+            raise
+        future.add_done_callback(lambda done: self._finish(executor, started_at, done))
+        return future
+
+    def _finish(self, executor, started_at, future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        if future is None or future.cancelled():
+            return
+        exc = future.exception()
+        if exc is None:
+            self._record_duration(time.perf_counter() - started_at)
+        elif isinstance(exc, BrokenExecutor):
+            # ワーカーが落ちた (BrokenProcessPool) らプールを作り直す (失敗するのは巻き込まれた分だけ)
+            self._reset_executor(executor)
+
+    def run(self, func, payload):
+        return self.submit(func, payload).result()
+
+    def stats(self):
+        with self._coalesce_lock:
+            hits = self.coalesce_hits
+            misses = self.coalesce_misses
+            rejected = self.rejected
+            pending = len(self._pending)
+        with self._lock:
+            in_flight = self._in_flight
+            avg_seconds = self._avg_seconds
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "inFlight": in_flight,
+            "pendingKeys": pending,
+            "coalesceHits": hits,
+            "coalesceMisses": misses,
+            "rejected": rejected,
+            "avgSeconds": avg_seconds,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
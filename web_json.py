@@ -0,0 +1,112 @@
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# 使えるうちで最速の JSON エンコーダー (orjson > ujson > 標準 json)
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+elif ujson is not None:
+    JSON_BACKEND = "ujson"
+else:
+    JSON_BACKEND = "json"
+
+# 出力する float の小数点以下桁数。None なら丸めない
+DEFAULT_FLOAT_DIGITS = 4
+# この深さまでの dict / list は要素ごとに分けてエンコードし、それより深い部分はまとめて1回でエンコードする
+STREAM_DEPTH = 3
+# これ以上の要素を持つ list は深さに関係なく要素ごとにエンコードする (damageEvents などの時系列)
+STREAM_LIST_MIN_ITEMS = 64
+# ストリーム出力で1回に書き出す目安のバイト数
+STREAM_CHUNK_BYTES = 64 * 1024
+
+_float_digits = DEFAULT_FLOAT_DIGITS
+
+
+def set_float_digits(digits):
+    """float の丸め桁数を設定する。None または負の値で丸めを無効にする。"""
+    global _float_digits
+    _float_digits = None if digits is None or digits < 0 else int(digits)
+
+
+def round_floats(obj, digits):
+    if isinstance(obj, float):
+        if math.isfinite(obj):
+            return round(obj, digits)
+        return obj
+    if isinstance(obj, dict):
+        return {key: round_floats(value, digits) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [round_floats(value, digits) for value in obj]
+    return obj
+
+
+def _encode_raw(obj):
+    if JSON_BACKEND == "orjson":
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    if JSON_BACKEND == "ujson":
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj):
+    """obj を UTF-8 の JSON バイト列にする (float は設定桁数に丸める)。"""
+    if _float_digits is not None:
+        obj = round_floats(obj, _float_digits)
+    return _encode_raw(obj)
+
+
+def _encode_key(key):
+    if isinstance(key, str):
+        return _encode_raw(key)
+    # 文字列以外のキーはバックエンドの変換に任せる (dumps と同じ表記にするため)
+    encoded = _encode_raw({key: None})
+    return encoded[1:-len(b":null}")]
+
+
+def _iter_pieces(obj, depth):
+    if depth < STREAM_DEPTH and isinstance(obj, dict) and obj:
+        separator = b"{"
+        for key, value in obj.items():
+            yield separator
+            yield _encode_key(key)
+            yield b":"
+            yield from _iter_pieces(value, depth + 1)
+            separator = b","
+        yield b"}"
+    elif isinstance(obj, (list, tuple)) and obj and (depth < STREAM_DEPTH or len(obj) >= STREAM_LIST_MIN_ITEMS):
+        separator = b"["
+        for value in obj:
+            yield separator
+            yield from _iter_pieces(value, depth + 1)
+            separator = b","
+        yield b"]"
+    else:
+        yield dumps(obj)
+
+
+def iter_dumps(obj, chunk_bytes=STREAM_CHUNK_BYTES):
+    """dumps(obj) と同じ内容を chunk_bytes 程度のチャンクに分けて順に返す。
+
+    全体を1つの巨大なバイト列にせず、上位の dict / list と長い list を要素ごとにエンコードして書き出す。
+    """
+    buffer = []
+    size = 0
+    for piece in _iter_pieces(obj, 0):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
@@ -0,0 +1,212 @@
+import json
+import threading
+from pathlib import Path
+from urllib.parse import unquote
+
+from sprite_atlas import SPRITE_DIR
+from web_cache import StaticFileCache, accepts_gzip, etag_matches, not_modified
+from web_dispatch import SIMULATION_ROUTES, SimulationBusy, simulation_function
+from web_json import dumps, iter_dumps
+
+
+# HTTP サーバー実装 (web_app のスレッド版 / web_async の asyncio 版) に依存しないルーティング。
+# リクエストヘッダーは http.client.HTTPMessage (大文字小文字を区別しない get) を受け取り、
+# 結果は Response で返す。書き出しは各サーバー側が行う。
+
+# web_simulation はエンジン一式を読み込むので、起動時には import しない (パスはここで持つ)
+ROOT_DIR = Path(__file__).resolve().parent
+STATIC_DIR = ROOT_DIR / "web_static"
+IMAGE_DIR = ROOT_DIR / "nikke_square_images"
+ICON_DIR = ROOT_DIR / "icon"
+OVERLOAD_ICON_DIR = ICON_DIR / "オーバーロード"
+STATIC_FILE_CACHE = StaticFileCache()
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+
+STATIC_PAGES = {
+    "/": "index.html",
+    "/batch": "batch.html",
+    "/batch/": "batch.html",
+    "/b3": "b3_compare.html",
+    "/b3/": "b3_compare.html",
+}
+
+# URL プレフィックス → 配信ルート。前から順に照合する
+FILE_PREFIXES = (
+    ("/static/", STATIC_DIR),
+    ("/images/", IMAGE_DIR),
+    ("/overload-icons/", OVERLOAD_ICON_DIR),
+    ("/sprites/", SPRITE_DIR),
+    ("/icons/", ICON_DIR),
+)
+
+
+class Response:
+    """ステータス・ヘッダー・本文。
+
+    body が None のときは本文も Content-Length も送らない (304)。
+    bytes 以外 (バイト列のイテレーター) のときは chunked で順に書き出す。
+    """
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers=None, body=None):
+        self.status = status
+        self.headers = headers or []
+        self.body = body
+
+    @property
+    def streaming(self):
+        return self.body is not None and not isinstance(self.body, (bytes, bytearray))
+
+
+def chunk_frame(chunk):
+    """Transfer-Encoding: chunked の1チャンク分。空のチャンクは終端になるので呼び出し側で除く。"""
+    return b"%x\r\n%s\r\n" % (len(chunk), chunk)
+
+
+CHUNKED_TERMINATOR = b"0\r\n\r\n"
+
+
+def json_response(status, payload, headers=None, stream=False):
+    """JSON の Response。stream=True なら本文をエンコードしながら chunked で送る。"""
+    return Response(
+        status,
+        [("Content-Type", "application/json; charset=utf-8"), *(headers or {}).items()],
+        iter_dumps(payload) if stream else dumps(payload),
+    )
+
+
+def error_response(status, message, headers=None):
+    return json_response(status, {"status": "error", "error": message}, headers=headers)
+
+
+def cached_json_response(entry, request_headers):
+    # gzip 版と無圧縮版は別の表現なので ETag も分ける (どちらの ETag でも再検証は通す)
+    use_gzip = accepts_gzip(request_headers.get("Accept-Encoding"))
+    etag = entry["gzip_etag"] if use_gzip else entry["etag"]
+    if_none_match = request_headers.get("If-None-Match")
+    if etag_matches(if_none_match, entry["etag"]) or etag_matches(if_none_match, entry["gzip_etag"]):
+        return Response(304, [("ETag", etag), ("Cache-Control", "no-cache"), ("Vary", "Accept-Encoding")])
+
+    headers = [
+        ("Content-Type", "application/json; charset=utf-8"),
+        ("ETag", etag),
+        ("Cache-Control", "no-cache"),
+        ("Vary", "Accept-Encoding"),
+    ]
+    if use_gzip:
+        headers.append(("Content-Encoding", "gzip"))
+    return Response(200, headers, entry["gzip_body"] if use_gzip else entry["body"])
+
+
+def file_response(path, root, request_headers):
+    path = path.resolve()
+    safe_root = root.resolve()
+    if path != safe_root and safe_root not in path.parents:
+        return error_response(403, "Forbidden")
+    if not path.exists() or not path.is_file():
+        return error_response(404, "Not found")
+
+    entry = STATIC_FILE_CACHE.get(path)
+    use_gzip = entry["gzip_body"] is not None and accepts_gzip(request_headers.get("Accept-Encoding"))
+    headers = [
+        ("ETag", entry["gzip_etag"] if use_gzip else entry["etag"]),
+        ("Last-Modified", entry["last_modified"]),
+        ("Cache-Control", entry["cache_control"]),
+    ]
+    if not_modified(request_headers, entry):
+        return Response(304, headers)
+
+    headers.insert(0, ("Content-Type", entry["content_type"]))
+    if entry["gzip_body"] is not None:
+        headers.append(("Vary", "Accept-Encoding"))
+    if use_gzip:
+        headers.append(("Content-Encoding", "gzip"))
+    return Response(200, headers, entry["gzip_body"] if use_gzip else entry["body"])
+
+
+def route_get(path, request_headers, dispatcher=None):
+    if path == "/api/characters":
+        from web_simulation import get_character_catalog_response
+
+        return cached_json_response(get_character_catalog_response(), request_headers)
+
+    if path == "/api/stats" and dispatcher is not None:
+        return json_response(200, dispatcher.stats(), headers={"Cache-Control": "no-store"})
+
+    page = STATIC_PAGES.get(path)
+    if page is not None:
+        return file_response(STATIC_DIR / page, STATIC_DIR, request_headers)
+
+    for prefix, root in FILE_PREFIXES:
+        if path.startswith(prefix):
+            relative = unquote(path.removeprefix(prefix))
+            return file_response(root / relative, root, request_headers)
+
+    return error_response(404, "Not found")
+
+
+def request_content_length(request_headers):
+    """Content-Length を検証して返す。不正または MAX_REQUEST_BYTES 超なら None。"""
+    try:
+        length = int(request_headers.get("Content-Length", "0"))
+    except ValueError:
+        return None
+    if length < 0 or length > MAX_REQUEST_BYTES:
+        return None
+    return length
+
+
+def simulation_route(path):
+    """POST のルートに対応するシミュレーション関数。無ければ None。"""
+    name = SIMULATION_ROUTES.get(path)
+    return simulation_function(name) if name else None
+
+
+def warm_up():
+    """起動直後の最初のリクエストが待たされないよう、重い初期化を先に済ませておく。"""
+    import mimetypes
+
+    import character_bundle
+    from web_simulation import get_character_catalog_response
+
+    mimetypes.init()
+    # キャラ定義のバンドルが古ければ裏で作り直す (できるまでは JSON から作る)
+    character_bundle.ensure_bundle()
+    get_character_catalog_response()
+
+
+def start_background_warm_up():
+    """待ち受けを始めてから呼ぶ。失敗しても各処理は最初の利用時にやり直されるので握りつぶす。"""
+
+    def run():
+        try:
+            warm_up()
+        except Exception as exc:
+            print(f"[web] warm-up failed: {type(exc).__name__}: {exc}", flush=True)
+
+    thread = threading.Thread(target=run, name="web-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def parse_json_body(body):
+    return json.loads(body.decode("utf-8")) if body else {}
+
+
+def simulation_error_response(exc):
+    if isinstance(exc, SimulationBusy):
+        return json_response(
+            429,
+            {"status": "error", "error": str(exc), "retryAfter": exc.retry_after},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    return error_response(400, f"{type(exc).__name__}: {exc}")
+
+
+def run_simulation(dispatcher, func, body):
+    """本文を JSON として解釈し、dispatcher 経由で実行した結果を Response にする (ブロッキング)。"""
+    try:
+        return json_response(200, dispatcher.run(func, parse_json_body(body)), stream=True)
+    except Exception as exc:
+        return simulation_error_response(exc)
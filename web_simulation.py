@@ -1,12 +1,22 @@
 import copy
 import json
 import math
+import random
 import re
+import sqlite3
 import time
 from pathlib import Path
 
+import character_bundle
+import result_store
+from models import BASE_FPS
+from name_resolver import build_file_stem_resolver, image_resolver, shared_resolver
 from simulator import Character, NikkeSimulator, Skill, WeaponConfig
+from sprite_atlas import SPRITE_DIR, ensure_sprite_atlas, sprite_entry
 from status_calculator import calculate_character_base_stats
+from status_registry import STATUS_DIR, STATUS_REGISTRY
+from utils import safe_print
+from web_cache import CachedJsonResource, file_tree_signature
 
 
 ROOT_DIR = Path(__file__).resolve().parent
@@ -189,7 +199,8 @@ class TimelineNikkeSimulator(NikkeSimulator):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._current_frame = 0
-        self.damage_series = {char.name: [0.0 for _ in range(DETAIL_SECONDS)] for char in self.characters}
+        self.detail_seconds = max(1, math.ceil(self.TOTAL_FRAMES / self.FPS))
+        self.damage_series = {char.name: [0.0 for _ in range(self.detail_seconds)] for char in self.characters}
         self.ammo_history = {char.name: [] for char in self.characters}
         self.damage_events = {char.name: [] for char in self.characters}
         self.burst_events = {char.name: [] for char in self.characters}
@@ -220,7 +231,7 @@ class TimelineNikkeSimulator(NikkeSimulator):
         before_damage = {char.name: char.total_damage for char in self.characters}
         super().tick(frame)
 
-        second_index = min(DETAIL_SECONDS - 1, max(0, (frame - 1) // self.FPS))
+        second_index = min(self.detail_seconds - 1, max(0, (frame - 1) // self.FPS))
         for char in self.characters:
             delta = char.total_damage - before_damage.get(char.name, 0)
             if delta:
@@ -243,9 +254,11 @@ class TimelineNikkeSimulator(NikkeSimulator):
             self._record_buff_snapshot(0)
 
             for frame in range(1, self.TOTAL_FRAMES + 1):
+                if self.kill_frame is not None:
+                    break
                 self.tick(frame)
         finally:
-            self._close_all_buff_intervals(self.TOTAL_FRAMES)
+            self._close_all_buff_intervals(self.kill_frame if self.kill_frame is not None else self.TOTAL_FRAMES)
             for f in self.log_handles.values():
                 f.close()
             if self.hp_log_handle is not None and not self.hp_log_handle.closed:
@@ -406,20 +419,21 @@ class TimelineNikkeSimulator(NikkeSimulator):
         return entries
 
 
-def _read_json(path):
+def _read_json(path, copy_result=True):
+    """JSON を mtime 付きでキャッシュして読む。copy_result=False なら共有のオブジェクトを返す (変更禁止)。"""
     stat = path.stat()
     cache_key = str(path.resolve())
     cached = JSON_CACHE.get(cache_key)
     if cached and cached["mtime_ns"] == stat.st_mtime_ns:
-        return copy.deepcopy(cached["data"])
-
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    JSON_CACHE[cache_key] = {
-        "mtime_ns": stat.st_mtime_ns,
-        "data": data,
-    }
-    return copy.deepcopy(data)
+        data = cached["data"]
+    else:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        JSON_CACHE[cache_key] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "data": data,
+        }
+    return copy.deepcopy(data) if copy_result else data
 
 
 def _character_path(file_name):
@@ -447,17 +461,29 @@ def _extract_burst_cooldown(char_data):
     return 20.0 if burst_stage in {"1", "2"} else 40.0
 
 
-def _catalog_image_url(*names):
+def _catalog_image_name(*names):
+    # 完全一致 → 宝物版などの接尾辞を外した名前の順に引く (あいまい一致は使わない)
+    resolver = image_resolver()
     for name in names:
         if not name:
             continue
-        image_path = IMAGE_DIR / f"{name}.png"
-        if image_path.exists():
-            return f"/images/{image_path.name}"
+        image_name = resolver.get(name)
+        if image_name:
+            return image_name
     return ""
 
 
-STATUS_DIR = ROOT_DIR / "status"
+def _catalog_image_fields(sprite_map, *names):
+    """キャラ画像の個別URL (フォールバック用) とスプライト座標。"""
+    image_name = _catalog_image_name(*names)
+    if not image_name:
+        return {"imageUrl": "", "sprite": None}
+    return {
+        "imageUrl": f"/images/{image_name}",
+        "sprite": sprite_entry(sprite_map, "characters", image_name),
+    }
+
+
 STATUS_CLASS_FILES = {
     "Attacker": "火力型",
     "Defender": "防御型",
@@ -471,91 +497,21 @@ STATUS_PART_FILES = {
 }
 
 
-def _read_status_rows(path):
-    if not path.exists():
-        return []
-    rows = []
-    with path.open("r", encoding="utf-8-sig") as handle:
-        for raw_line in handle:
-            line = raw_line.strip()
-            if not line:
-                continue
-            rows.append([part.strip() for part in line.split(",")])
-    return rows
-
-
-def _status_number(value, default=0.0):
-    try:
-        return float(value)
-    except (TypeError, ValueError):
-        return default
-
-
-def _status_percent_number(value, default=0.0):
-    text = str(value or "").strip()
-    if text.endswith("%"):
-        text = text[:-1]
-    return _status_number(text, default)
-
-
 def _status_level_table(path):
-    table = []
-    for row in _read_status_rows(path):
-        if len(row) < 3:
-            continue
-        table.append(
-            {
-                "level": int(_status_number(row[0])),
-                "hp": _status_number(row[1]),
-                "atk": _status_number(row[2]),
-            }
-        )
-    return table
+    return STATUS_REGISTRY.level_table(path).rows
 
 
 def _status_tier_table(path):
-    table = []
-    for row in _read_status_rows(path):
-        if len(row) < 4:
-            continue
-        table.append(
-            {
-                "tier": row[0],
-                "level": int(_status_number(row[1])),
-                "hp": _status_number(row[2]),
-                "atk": _status_number(row[3]),
-            }
-        )
-    return table
+    return STATUS_REGISTRY.tier_table(path).rows
 
 
 def _status_pair(path):
-    rows = _read_status_rows(path)
-    if not rows or len(rows[0]) < 2:
-        return {"hp": 0.0, "atk": 0.0}
-    return {"hp": _status_number(rows[0][0]), "atk": _status_number(rows[0][1])}
+    hp, atk = STATUS_REGISTRY.pair(path)
+    return {"hp": hp, "atk": atk}
 
 
 def _overload_option_tables():
-    root = STATUS_DIR / "オーバーロードオプション効果量"
-    tables = {}
-    if not root.exists():
-        return tables
-    for path in sorted(root.glob("*.txt"), key=lambda item: item.stem):
-        ranks = []
-        for row in _read_status_rows(path):
-            if len(row) < 2:
-                continue
-            percent = _status_percent_number(row[1])
-            ranks.append(
-                {
-                    "rank": int(_status_number(row[0])),
-                    "percent": percent,
-                    "value": percent / 100.0,
-                }
-            )
-        tables[path.stem] = ranks
-    return tables
+    return {name: table.rows for name, table in STATUS_REGISTRY.overload_option_tables().items()}
 
 
 def _overload_icon_url(class_file_name, part_file_name):
@@ -574,39 +530,40 @@ def _overload_icon_data():
         for class_key, class_file_name in STATUS_CLASS_FILES.items()
     }
 
-def _cube_icon_url(cube_name):
-    candidates = [cube_name, CUBE_ICON_ALIASES.get(cube_name, "")]
-    for name in candidates:
-        if not name:
-            continue
-        image_path = CUBE_ICON_DIR / f"{name}.png"
-        if image_path.exists():
-            return f"/icons/キューブ/{image_path.name}"
-    return ""
 
+def _overload_icon_sprites(sprite_map):
+    return {
+        class_key: {
+            part_key: sprite_entry(sprite_map, "overload", f"{class_file_name}_{part_file_name}.webp")
+            for part_key, part_file_name in STATUS_PART_FILES.items()
+        }
+        for class_key, class_file_name in STATUS_CLASS_FILES.items()
+    }
+
+def _cube_icon_resolver():
+    return shared_resolver(
+        "cube_icons",
+        lambda: build_file_stem_resolver(CUBE_ICON_DIR, "*.png", CUBE_ICON_ALIASES),
+        ((CUBE_ICON_DIR, False, False),),
+    )
 
-def _cube_format_values(path):
-    if not path.exists():
-        return {}
-    text = path.read_text(encoding="utf-8-sig")
-    values = {}
-    for effect_no, raw_values in re.findall(r"\[効果(\d+)\]:\s*\[([^\]]*)\]", text):
-        parsed = []
-        for value in raw_values.split(","):
-            value = value.strip()
-            if value:
-                parsed.append(_status_percent_number(value))
-        values[int(effect_no)] = parsed
-    return values
+
+def _cube_icon_name(cube_name):
+    if not cube_name:
+        return ""
+    return _cube_icon_resolver().get(cube_name, "")
+
+
+def _cube_icon_url(cube_name):
+    icon_name = _cube_icon_name(cube_name)
+    return f"/icons/キューブ/{icon_name}" if icon_name else ""
 
 
 def _cube_skill_tables():
     tables = {}
-    if not CUBE_SKILL_DIR.exists():
-        return tables
-    for path in sorted(CUBE_SKILL_DIR.glob("*_format.txt"), key=lambda item: item.stem):
+    for path in STATUS_REGISTRY.list_files(CUBE_SKILL_DIR, "*_format.txt"):
         cube_name = path.stem.removesuffix("_format")
-        values = _cube_format_values(path)
+        values = STATUS_REGISTRY.cube_format_values(path)
         if not values:
             continue
         tables[cube_name] = {
@@ -618,17 +575,27 @@ def _cube_skill_tables():
     return tables
 
 
-def _cube_skill_catalog():
+def _cube_skill_table(cube_name):
+    if Path(cube_name).name != cube_name:
+        return None
+    values = STATUS_REGISTRY.cube_format_values(CUBE_SKILL_DIR / f"{cube_name}_format.txt")
+    if not values:
+        return None
+    return {"name": cube_name, "effect1": values.get(1, []), "effect2": values.get(2, [])}
+
+
+def _cube_skill_catalog(sprite_map=None):
     return [
         {
             "name": table["name"],
             "iconUrl": table.get("iconUrl", ""),
+            "sprite": sprite_entry(sprite_map, "cubes", _cube_icon_name(table["name"])),
         }
         for table in _cube_skill_tables().values()
     ]
 
 
-def get_frontend_status_data():
+def get_frontend_status_data(sprite_map=None):
     classes = {}
     for class_key, class_file_name in STATUS_CLASS_FILES.items():
         classes[class_key] = {
@@ -659,23 +626,42 @@ def get_frontend_status_data():
     data["overload"] = {
         "options": _overload_option_tables(),
         "icons": _overload_icon_data(),
+        "sprites": _overload_icon_sprites(sprite_map),
     }
-    data["cubeSkills"] = _cube_skill_catalog()
+    data["cubeSkills"] = _cube_skill_catalog(sprite_map)
     return data
 
 
-def list_character_catalog():
+def _catalog_watch_entries():
+    return (
+        (CHARACTER_DIR, False, True),
+        (STATUS_DIR, True, True),
+        (CUBE_SKILL_DIR, False, True),
+        (IMAGE_DIR, False, False),
+        (OVERLOAD_ICON_DIR, False, False),
+        (CUBE_ICON_DIR, False, False),
+        # アトラスの作り直しが終わると atlas.json が置き換わり、カタログも作り直される
+        (SPRITE_DIR, False, True),
+    )
+
+
+def _catalog_signature():
+    return file_tree_signature(_catalog_watch_entries())
+
+
+def _build_character_catalog():
+    sprite_map = ensure_sprite_atlas()
     characters = []
     for path in sorted(CHARACTER_DIR.glob("*.json"), key=lambda p: p.name):
         try:
-            data = _read_json(path)
+            data = _read_json(path, copy_result=False)
             char_name = data.get("name", path.stem)
             characters.append(
                 {
                     "kind": "character",
                     "file": path.name,
                     "name": char_name,
-                    "imageUrl": _catalog_image_url(char_name, path.stem),
+                    **_catalog_image_fields(sprite_map, char_name, path.stem),
                     "burstStage": str(data.get("burst_stage", "3")),
                     "cooldownTime": _extract_burst_cooldown(data),
                     "weaponType": data.get("weapon_type", ""),
@@ -691,7 +677,7 @@ def list_character_catalog():
                     "kind": "character",
                     "file": path.name,
                     "name": path.stem,
-                    "imageUrl": _catalog_image_url(path.stem),
+                    **_catalog_image_fields(sprite_map, path.stem),
                     "burstStage": "",
                     "cooldownTime": "",
                     "weaponType": "",
@@ -711,6 +697,7 @@ def list_character_catalog():
                 "id": dummy_id,
                 "name": definition["label"],
                 "imageUrl": "",
+                "sprite": None,
                 "burstStage": definition["burst_stage"],
                 "cooldownTime": 20.0 if definition["burst_stage"] in {"1", "2"} else 40.0,
                 "weaponType": definition["weapon_type"],
@@ -721,7 +708,19 @@ def list_character_catalog():
             }
         )
 
-    return {"characters": characters, "dummies": dummies, "statusData": get_frontend_status_data()}
+    return {"characters": characters, "dummies": dummies, "statusData": get_frontend_status_data(sprite_map)}
+
+
+CHARACTER_CATALOG = CachedJsonResource(_build_character_catalog, _catalog_signature)
+
+
+def get_character_catalog_response():
+    """/api/characters 用のキャッシュ済みエントリ (data / body / gzip_body / etag / gzip_etag)。"""
+    return CHARACTER_CATALOG.get()
+
+
+def list_character_catalog():
+    return CHARACTER_CATALOG.get()["data"]
 
 
 def _computed_stats_from_settings(status_settings):
@@ -746,10 +745,10 @@ def _overload_rank_value(option_name, rank):
     if rank <= 0:
         return None
 
-    for row in _overload_option_tables().get(option_name, []):
-        if int(row.get("rank", 0)) == rank:
-            return float(row.get("value", 0.0))
-    return None
+    table = STATUS_REGISTRY.overload_option_tables().get(option_name)
+    if table is None:
+        return None
+    return table.lookup(rank)
 
 
 def _iter_overload_options(status_settings):
@@ -817,7 +816,7 @@ def apply_cube_skill(character, status_settings):
     if not cube_name:
         return
 
-    table = _cube_skill_tables().get(cube_name)
+    table = _cube_skill_table(cube_name)
     if not table:
         return
 
@@ -876,10 +875,72 @@ def apply_cube_skill(character, status_settings):
         character.add_skill(skill)
 
 
-def create_character_from_json(file_name, skill_level=10, status_settings=None):
-    char_file_path = _character_path(file_name)
-    char_data = _read_json(char_file_path)
+def _skill_level_index(skill_level):
+    return max(0, min(9, int(skill_level) - 1))
+
+
+def _resolve_variable_params(value, level_idx):
+    """*_list (と list の value) を、スキルレベルの値に置き換える。"""
+    if isinstance(value, dict):
+        for k in list(value.keys()):
+            if k.endswith("_list") and isinstance(value[k], list):
+                base_key = k[:-5]
+                if len(value[k]) > level_idx:
+                    value[base_key] = value[k][level_idx]
+            elif k == "value" and isinstance(value[k], list):
+                if len(value[k]) > level_idx:
+                    value["value"] = value[k][level_idx]
+            else:
+                _resolve_variable_params(value[k], level_idx)
+    elif isinstance(value, list):
+        for item in value:
+            _resolve_variable_params(item, level_idx)
+
+
+def compile_skill_spec(s_data, skill_level=10):
+    """スキル JSON を、スキルレベルを解決した Skill の引数 (dict) にする。s_data は変更しない。"""
+    init_kwargs = copy.deepcopy(s_data.get("kwargs", {}))
+
+    for key, value in s_data.items():
+        if key not in ["name", "trigger_type", "trigger_value", "effect_type", "kwargs", "stages"]:
+            init_kwargs[key] = copy.deepcopy(value)
+
+    level_idx = _skill_level_index(skill_level)
+    _resolve_variable_params(init_kwargs, level_idx)
+
+    effect_type = s_data.get("effect_type", "buff")
+    if effect_type in ["ammo_charge", "refill_ammo"]:
+        if "value" in init_kwargs and "rate" not in init_kwargs:
+            init_kwargs["rate"] = init_kwargs["value"]
+
+    stages = []
+    for st in s_data.get("stages", []):
+        st_copy = copy.deepcopy(st)
+        _resolve_variable_params(st_copy, level_idx)
+
+        st_kwargs = st_copy.get("kwargs", {})
+        if st_copy.get("effect_type") in ["ammo_charge", "refill_ammo"]:
+            if "value" in st_kwargs and "rate" not in st_kwargs:
+                st_kwargs["rate"] = st_kwargs["value"]
+        st_copy["kwargs"] = st_kwargs
+        stages.append(st_copy)
 
+    final_trigger_value = init_kwargs.pop("trigger_value", s_data.get("trigger_value", 0))
+    return {
+        "name": s_data.get("name", "Unknown Skill"),
+        "trigger_type": s_data.get("trigger_type", "manual"),
+        "trigger_value": final_trigger_value,
+        "effect_type": effect_type,
+        "stages": stages,
+        "kwargs": init_kwargs,
+    }
+
+
+def compile_character_spec(char_data, weapon_data, skill_level=10):
+    """キャラ JSON と武器 JSON から、ステータス設定を当てる前のキャラ定義 (pickle できる dict) を作る。
+
+    character_bundle はこの結果をスキルレベルごとに保存しておき、JSON の解釈を省く。
+    """
     char_name = char_data["name"]
     weapon_type_str = char_data["weapon_type"].lower()
     element = char_data.get("element", "Iron")
@@ -894,19 +955,16 @@ def create_character_from_json(file_name, skill_level=10, status_settings=None):
         or squad
     )
 
-    weapon_file_path = WEAPON_DIR / f"{weapon_type_str}_standard.json"
-    if weapon_file_path.exists():
-        weapon_data = _read_json(weapon_file_path)
-    else:
+    if weapon_data is None:
         weapon_data = {"weapon_type": weapon_type_str, "name": "Default Weapon"}
-
+    weapon_data = copy.deepcopy(weapon_data)
     weapon_data["name"] = f"{char_name}'s Weapon"
     weapon_data["element"] = element
     weapon_data["burst_stage"] = burst_stage
 
     for key, value in stats.items():
         if key == "reload_time":
-            weapon_data["reload_frames"] = int(value * 60)
+            weapon_data["reload_frames"] = int(value * BASE_FPS)
         elif key == "damage_rate":
             weapon_data["multiplier"] = value
         elif key == "ammo":
@@ -914,8 +972,6 @@ def create_character_from_json(file_name, skill_level=10, status_settings=None):
         else:
             weapon_data[key] = value
 
-    weapon_config = WeaponConfig(weapon_data)
-
     base_atk = 25554
     base_hp = 583734
     if char_class == "Supporter":
@@ -930,99 +986,94 @@ def create_character_from_json(file_name, skill_level=10, status_settings=None):
     if "base_hp" in stats:
         base_hp = stats["base_hp"]
 
+    skills = [compile_skill_spec(s_data, skill_level) for s_data in char_data.get("skills", [])]
+    if "burst_skill" in char_data:
+        burst_skill = compile_skill_spec(char_data["burst_skill"], skill_level)
+        burst_skill["trigger_type"] = "on_use_burst_skill"
+        skills.append(burst_skill)
+
+    return {
+        "name": char_name,
+        "class": char_class,
+        "element": element,
+        "burst_stage": burst_stage,
+        "squad": squad,
+        "company": company,
+        "base_atk": base_atk,
+        "base_hp": base_hp,
+        "weapon": weapon_data,
+        "skills": skills,
+    }
+
+
+def _weapon_path(char_data):
+    return WEAPON_DIR / f"{char_data['weapon_type'].lower()}_standard.json"
+
+
+def _compile_character_file(char_file_path, skill_level):
+    # compile_character_spec は入力を書き換えないので、キャッシュの JSON をそのまま渡す
+    char_data = _read_json(char_file_path, copy_result=False)
+    weapon_file_path = _weapon_path(char_data)
+    weapon_data = _read_json(weapon_file_path, copy_result=False) if weapon_file_path.exists() else None
+    return compile_character_spec(char_data, weapon_data, skill_level)
+
+
+def load_character_spec(file_name, skill_level=10):
+    """キャラ定義を返す。ビルド済みバンドルが最新ならそこから、古ければ JSON から作る。"""
+    char_file_path = _character_path(file_name)
+    spec = character_bundle.lookup(char_file_path.name, _skill_level_index(skill_level) + 1)
+    if spec is None:
+        spec = _compile_character_file(char_file_path, skill_level)
+    return spec
+
+
+def character_from_spec(spec, status_settings=None):
+    """load_character_spec の定義から Character を作り、ステータス設定を当てる。spec は使い捨て。"""
+    char_name = spec["name"]
+    base_atk = spec["base_atk"]
+    base_hp = spec["base_hp"]
     computed_stats = _computed_stats_from_settings(status_settings)
     if computed_stats:
         base_atk = computed_stats["base_atk"]
         base_hp = computed_stats["base_hp"]
     elif isinstance(status_settings, dict) and status_settings.get("enabled"):
-        calculated_stats = calculate_character_base_stats(char_class, company, status_settings)
+        calculated_stats = calculate_character_base_stats(spec["class"], spec["company"], status_settings)
         base_atk = calculated_stats["base_atk"]
         base_hp = calculated_stats["base_hp"]
 
-    def parse_skill_data(s_data):
-        init_kwargs = copy.deepcopy(s_data.get("kwargs", {}))
-
-        for key, value in s_data.items():
-            if key not in ["name", "trigger_type", "trigger_value", "effect_type", "kwargs", "stages"]:
-                init_kwargs[key] = copy.deepcopy(value)
-
-        level_idx = max(0, min(9, int(skill_level) - 1))
-
-        def resolve_variable_params(value):
-            if isinstance(value, dict):
-                for k in list(value.keys()):
-                    if k.endswith("_list") and isinstance(value[k], list):
-                        base_key = k[:-5]
-                        if len(value[k]) > level_idx:
-                            value[base_key] = value[k][level_idx]
-                    elif k == "value" and isinstance(value[k], list):
-                        if len(value[k]) > level_idx:
-                            value["value"] = value[k][level_idx]
-                    else:
-                        resolve_variable_params(value[k])
-            elif isinstance(value, list):
-                for item in value:
-                    resolve_variable_params(item)
-
-        resolve_variable_params(init_kwargs)
-
-        effect_type = s_data.get("effect_type", "buff")
-        if effect_type in ["ammo_charge", "refill_ammo"]:
-            if "value" in init_kwargs and "rate" not in init_kwargs:
-                init_kwargs["rate"] = init_kwargs["value"]
-
-        stages = []
-        for st in s_data.get("stages", []):
-            st_copy = copy.deepcopy(st)
-            resolve_variable_params(st_copy)
-
-            st_kwargs = st_copy.get("kwargs", {})
-            if st_copy.get("effect_type") in ["ammo_charge", "refill_ammo"]:
-                if "value" in st_kwargs and "rate" not in st_kwargs:
-                    st_kwargs["rate"] = st_kwargs["value"]
-            st_copy["kwargs"] = st_kwargs
-            stages.append(st_copy)
-
-        final_trigger_value = init_kwargs.pop("trigger_value", s_data.get("trigger_value", 0))
-
-        return Skill(
-            name=s_data.get("name", "Unknown Skill"),
-            trigger_type=s_data.get("trigger_type", "manual"),
-            trigger_value=final_trigger_value,
-            effect_type=effect_type,
-            stages=stages,
-            **init_kwargs,
-        )
-
     skills = []
-    for s_data in char_data.get("skills", []):
-        skill = parse_skill_data(s_data)
+    for skill_spec in spec["skills"]:
+        skill = Skill(
+            name=skill_spec["name"],
+            trigger_type=skill_spec["trigger_type"],
+            trigger_value=skill_spec["trigger_value"],
+            effect_type=skill_spec["effect_type"],
+            stages=skill_spec["stages"],
+            **skill_spec["kwargs"],
+        )
         skill.owner_name = char_name
         skills.append(skill)
 
-    if "burst_skill" in char_data:
-        burst_skill = parse_skill_data(char_data["burst_skill"])
-        burst_skill.owner_name = char_name
-        if burst_skill.trigger_type != "on_use_burst_skill":
-            burst_skill.trigger_type = "on_use_burst_skill"
-        skills.append(burst_skill)
-
     character = Character(
         char_name,
-        weapon_config,
+        WeaponConfig(spec["weapon"]),
         skills,
         base_atk,
         base_hp,
-        element,
-        burst_stage,
-        char_class,
-        squad=squad,
+        spec["element"],
+        spec["burst_stage"],
+        spec["class"],
+        squad=spec["squad"],
     )
     apply_overload_options(character, status_settings)
     apply_cube_skill(character, status_settings)
     return character
 
 
+def create_character_from_json(file_name, skill_level=10, status_settings=None):
+    return character_from_spec(load_character_spec(file_name, skill_level), status_settings)
+
+
 def create_dummy_ct_skill():
     return Skill(
         name="Dummy B1: CT Reduction",
@@ -1153,9 +1204,7 @@ def _merge_status_settings(common_settings, individual_settings):
     return merged
 
 
-def _create_selected_character(selection, skill_level, status_settings=None):
-    if not selection:
-        return None
+def _build_selected_character(selection, skill_level, status_settings=None):
     kind = selection.get("kind")
     if kind == "character":
         effective_status_settings = _merge_status_settings(
@@ -1172,6 +1221,25 @@ def _create_selected_character(selection, skill_level, status_settings=None):
     raise ValueError(f"Unsupported formation selection: {kind}")
 
 
+def _create_selected_character(selection, skill_level, status_settings=None, prototypes=None):
+    """編成スロットのキャラを作る。
+
+    prototypes (dict) を渡すと、同じ選択・同じ設定で作ったキャラを原型として保持し、
+    2回目以降はその複製を返す (一括実行で共通メンバーを毎回作り直さないため)。
+    """
+    if not selection:
+        return None
+    if prototypes is None:
+        return _build_selected_character(selection, skill_level, status_settings)
+
+    key = json.dumps([selection, skill_level, status_settings], sort_keys=True, ensure_ascii=False)
+    prototype = prototypes.get(key)
+    if prototype is None:
+        prototype = _build_selected_character(selection, skill_level, status_settings)
+        prototypes[key] = prototype
+    return copy.deepcopy(prototype)
+
+
 def _is_rapi_red_hood(char):
     return getattr(char, "name", "") == "ラピ：レッドフード"
 
@@ -1241,7 +1309,28 @@ def _int_option(options, key, default):
     return int(value)
 
 
-def run_web_simulation(payload):
+def _enemy_specs(raw_enemies):
+    if not raw_enemies:
+        return None
+    if not isinstance(raw_enemies, list):
+        raise ValueError("enemies は配列で指定してください")
+    specs = []
+    for raw in raw_enemies:
+        if not isinstance(raw, dict):
+            raise ValueError("enemies の各要素はオブジェクトで指定してください")
+        specs.append(
+            {
+                "hp": _float_option(raw, "hp", None),
+                "defense": _float_option(raw, "defense", None),
+                "element": raw.get("element") or None,
+                "core_size": _float_option(raw, "coreSize", None),
+                "size": _float_option(raw, "size", None),
+            }
+        )
+    return specs
+
+
+def run_web_simulation(payload, prototypes=None):
     started = time.perf_counter()
     options = payload.get("options", {})
     include_details = not bool(options.get("summaryOnly", False))
@@ -1252,11 +1341,22 @@ def run_web_simulation(payload):
     if not formation:
         raise ValueError("編成が空です")
 
+    # seed を指定すると乱数モードでも同じ結果になる (期待値モードでは使われない)。
+    # エンジンはモジュールの random を使うので、プロセス全体の乱数を seed し直す。
+    # SimulationDispatcher は1プロセス (workers=0 なら1スレッド) で1件ずつ実行するので、他の実行とは混ざらない
+    if options.get("seed") is not None:
+        random.seed(options["seed"])
+
     characters = []
     slot_map = {}
     seen_names = set()
     for slot_index, selection in enumerate(formation):
-        char = _create_selected_character(selection, skill_level, status_settings=status_settings)
+        char = _create_selected_character(
+            selection,
+            skill_level,
+            status_settings=status_settings,
+            prototypes=prototypes,
+        )
         if char is None:
             continue
         if char.name in seen_names:
@@ -1284,6 +1384,12 @@ def run_web_simulation(payload):
         burst_charge_time=_float_option(options, "burstChargeTime", 5.0),
         enemy_count=_int_option(options, "enemyCount", 1),
         enable_logs=bool(options.get("enableLogs", False)),
+        expected_value=bool(options.get("expectedValue", False)),
+        expected_count_policy=options.get("expectedCountPolicy") or "carry",
+        enemies=_enemy_specs(options.get("enemies")),
+        enemy_hp=_float_option(options, "enemyHp", None),
+        fps=_int_option(options, "fps", BASE_FPS),
+        duration_seconds=_float_option(options, "durationSeconds", DETAIL_SECONDS),
     )
     sim.special_mode = bool(options.get("specialMode", False))
     apply_crust_operation_mode(sim, options.get("crustOperationMode") or None)
@@ -1318,7 +1424,7 @@ def run_web_simulation(payload):
                 "totalDamage": float(result.get("total_damage", 0)),
                 "breakdown": breakdown,
                 "damageSeries": (
-                    sim.damage_series.get(char.name, [0.0 for _ in range(DETAIL_SECONDS)])
+                    sim.damage_series.get(char.name, [0.0 for _ in range(sim.detail_seconds)])
                     if include_details else []
                 ),
                 "ammoHistory": sim.ammo_history.get(char.name, []) if include_details else [],
@@ -1339,11 +1445,89 @@ def run_web_simulation(payload):
         "elapsedSeconds": time.perf_counter() - started,
         "totalPartyDamage": total_party_damage,
         "totalAllyAmmoConsumed": int(getattr(sim, "total_ally_ammo_consumed", 0)),
+        "timeToKill": sim.time_to_kill,
+        "killFrame": sim.kill_frame,
         "rotation": rotation_summary,
+        "enemies": sim.enemies.summary(),
         "results": result_rows,
     }
 
 
+def _store_warning(action, exc):
+    safe_print(f"[result-store] {action} failed: {type(exc).__name__}: {exc}")
+
+
+def run_recorded_web_simulation(payload):
+    """/api/simulate の本体。実行を result_store に記録する。
+
+    期待値モードか options.seed 指定の実行は結果が再現できるので、同じリクエスト・エンジン・データの
+    記録があれば再計算せずにそれを返す。seed 未指定の乱数モードはここで seed を決めて実行し、
+    応答の seed を指定すれば同じ結果を再現できる。記録に失敗してもシミュレーション自体は返す。
+    seed はプロセス全体の random に設定するので、同じプロセスで複数のシミュレーションを並行して
+    動かさないこと (SimulationDispatcher はワーカーごとに1件ずつ実行する)。
+    """
+    options = payload.get("options", {}) or {}
+    expected_value = bool(options.get("expectedValue", False))
+    seed = options.get("seed")
+    reproducible = expected_value or seed is not None
+    selections = [selection for selection in payload.get("formation", []) if selection]
+    member_files = [
+        selection.get("file") if selection.get("kind") == "character" else None for selection in selections
+    ]
+
+    connection = None
+    key = None
+    try:
+        connection = result_store.shared_connection()
+        key = result_store.cache_key("web", payload, member_files)
+        found = result_store.find_response(connection, key) if reproducible else None
+        if found is not None:
+            run_id, response = found
+            response["resultStore"] = {"runId": run_id, "cached": True}
+            return response
+    except (sqlite3.Error, OSError, RuntimeError) as exc:
+        _store_warning("lookup", exc)
+        connection = None
+
+    run_payload = payload
+    if not reproducible:
+        seed = random.SystemRandom().randrange(2 ** 32)
+        run_payload = {**payload, "options": {**options, "seed": seed}}
+    response = run_web_simulation(run_payload)
+    response["seed"] = None if expected_value else seed
+    if connection is None:
+        return response
+
+    members = [
+        {
+            "file": file_name,
+            "name": row["name"],
+            "totalDamage": row["totalDamage"],
+            "breakdown": row["breakdown"],
+        }
+        for file_name, row in zip(member_files, response["results"])
+    ]
+    try:
+        run_id = result_store.record_run(
+            connection,
+            "web",
+            payload,
+            key,
+            members,
+            response["totalPartyDamage"],
+            seed=None if expected_value else seed,
+            expected_value=expected_value,
+            time_to_kill=response.get("timeToKill"),
+            elapsed_seconds=response.get("elapsedSeconds"),
+            response=response if reproducible else None,
+        )
+    except (sqlite3.Error, OSError) as exc:
+        _store_warning("record", exc)
+        return response
+    response["resultStore"] = {"runId": run_id, "cached": False}
+    return response
+
+
 def run_web_batch_simulation(payload):
     started = time.perf_counter()
     shared_options = payload.get("options", {})
@@ -1351,6 +1535,8 @@ def run_web_batch_simulation(payload):
     if not isinstance(entries, list) or not entries:
         raise ValueError("一括実行する編成がありません")
 
+    # 編成間で共通するメンバーは1回だけ作り、各編成には複製を渡す
+    prototypes = {}
     results = []
     for index, entry in enumerate(entries):
         name = entry.get("name") or f"編成{index + 1}"
@@ -1363,7 +1549,7 @@ def run_web_batch_simulation(payload):
             "options": entry_options,
         }
         try:
-            data = run_web_simulation(sim_payload)
+            data = run_web_simulation(sim_payload, prototypes=prototypes)
             results.append(
                 {
                     "id": entry.get("id"),
@@ -1395,3 +1581,129 @@ def run_web_batch_simulation(payload):
         "elapsedSeconds": time.perf_counter() - started,
         "results": results,
     }
+
+
+def _set_status_setting(status_settings, key_path, value):
+    node = status_settings
+    keys = [key for key in str(key_path).split(".") if key]
+    if not keys:
+        raise ValueError("探索するステータス設定のキーが空です")
+    for key in keys[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = {}
+            node[key] = child
+        node = child
+    node[keys[-1]] = value
+
+
+# 画面側で計算済みのステータス。これがあるとステータス設定より優先されるので探索では外す
+PRECOMPUTED_STAT_KEYS = ("computedStats", "statOverrides")
+
+
+def _search_formation(formation, key_path, value):
+    """探索値 value を各キャラの個別ステータス設定にも反映した編成を返す。
+
+    計算済みステータスは外し、個別設定が探索キーを上書きしている場合はそこにも value を書く。
+    """
+    keys = [key for key in str(key_path).split(".") if key]
+    searched = []
+    for selection in formation:
+        if not isinstance(selection, dict) or selection.get("kind") != "character":
+            searched.append(selection)
+            continue
+        selection = copy.deepcopy(selection)
+        settings = selection.get("statusSettings")
+        if isinstance(settings, dict):
+            for stat_key in PRECOMPUTED_STAT_KEYS:
+                settings.pop(stat_key, None)
+            node = settings
+            for key in keys[:-1]:
+                node = node.get(key) if isinstance(node, dict) else None
+            if isinstance(node, dict) and keys[-1] in node:
+                node[keys[-1]] = value
+            if settings.get("enabled") is False:
+                settings["enabled"] = True
+        searched.append(selection)
+    return searched
+
+
+def run_web_kill_time_search(payload):
+    """ボスHPを targetSeconds 秒以内に倒せる最小のステータス設定値を二分探索する。
+    ステータス値が大きいほど撃破時間が短くなる (単調) ことを前提とし、
+    判定がぶれないよう期待値モードで実行する。
+    各キャラの計算済みステータス (computedStats / statOverrides) は探索値で計算し直すため無視する。"""
+    started = time.perf_counter()
+    search = payload.get("search", {})
+    if not isinstance(search, dict):
+        raise ValueError("search はオブジェクトで指定してください")
+    key_path = search.get("key", "level")
+    target_seconds = _float_option(search, "targetSeconds", None)
+    low = _int_option(search, "min", 1)
+    high = _int_option(search, "max", 400)
+    if target_seconds is None or target_seconds <= 0:
+        raise ValueError("targetSeconds を指定してください")
+    if low > high:
+        raise ValueError("min が max より大きいです")
+
+    base_options = copy.deepcopy(payload.get("options", {}))
+    if _float_option(base_options, "enemyHp", None) is None:
+        raise ValueError("enemyHp を指定してください")
+    base_options["summaryOnly"] = True
+    base_options["expectedValue"] = True
+    if isinstance(base_options.get("statusSettings"), dict):
+        for stat_key in PRECOMPUTED_STAT_KEYS:
+            base_options["statusSettings"].pop(stat_key, None)
+
+    formation = payload.get("formation", [])
+    if not any(isinstance(selection, dict) and selection.get("kind") == "character" for selection in formation or []):
+        raise ValueError("ステータスを探索できるキャラが編成にいません")
+
+    probes = {}
+
+    def probe(value):
+        if value not in probes:
+            options = copy.deepcopy(base_options)
+            status_settings = options.get("statusSettings")
+            if not isinstance(status_settings, dict):
+                status_settings = {}
+                options["statusSettings"] = status_settings
+            status_settings.setdefault("enabled", True)
+            _set_status_setting(status_settings, key_path, value)
+            data = run_web_simulation(
+                {
+                    "formation": _search_formation(formation, key_path, value),
+                    "rotation": payload.get("rotation", {}),
+                    "options": options,
+                }
+            )
+            probes[value] = data.get("timeToKill")
+        return probes[value]
+
+    def reaches_target(value):
+        seconds = probe(value)
+        return seconds is not None and seconds <= target_seconds
+
+    found = None
+    if reaches_target(high):
+        while low < high:
+            middle = (low + high) // 2
+            if reaches_target(middle):
+                high = middle
+            else:
+                low = middle + 1
+        found = low
+
+    return {
+        "status": "ok",
+        "elapsedSeconds": time.perf_counter() - started,
+        "key": key_path,
+        "targetSeconds": target_seconds,
+        "found": found is not None,
+        "value": found,
+        "timeToKill": probes.get(found) if found is not None else None,
+        "probes": [
+            {"value": value, "timeToKill": seconds}
+            for value, seconds in sorted(probes.items())
+        ],
+    }
@@ -141,7 +141,11 @@ function iconInitial(item) {
 
 function createCharacterIcon(item, className = "character-icon") {
   const wrap = document.createElement("div");
-  wrap.className = `${className}${item?.imageUrl ? "" : " fallback"}`;
+  wrap.className = `${className}${item?.imageUrl || item?.sprite ? "" : " fallback"}`;
+
+  if (Sprites.applySprite(wrap, item?.sprite, item?.name)) {
+    return wrap;
+  }
 
   if (item?.imageUrl) {
     const img = document.createElement("img");
@@ -953,6 +957,11 @@ function overloadIconUrl(item, part) {
   return state.statusData?.overload?.icons?.[classKey]?.[part] || "";
 }
 
+function overloadIconSprite(item, part) {
+  const classKey = classKeyForItem(item);
+  return state.statusData?.overload?.sprites?.[classKey]?.[part] || null;
+}
+
 function setSlotOverloadValue(formation, slotIndex, part, optionIndex, key, value) {
   const selection = formation.slots[slotIndex];
   if (!selection || selection.kind !== "character") return;
@@ -1034,12 +1043,13 @@ function createCubeField(settings, formation, slotIndex) {
   const icon = document.createElement("span");
   icon.className = "cube-icon";
   const selected = cubeDefinition(String(settings.cubeType || ""));
-  if (selected?.iconUrl) {
+  const hasSprite = Sprites.applySprite(icon, selected?.sprite, selected?.name);
+  if (!hasSprite && selected?.iconUrl) {
     const img = document.createElement("img");
     img.src = selected.iconUrl;
     img.alt = selected.name;
     icon.appendChild(img);
-  } else {
+  } else if (!hasSprite) {
     icon.textContent = "-";
   }
 
@@ -1174,12 +1184,13 @@ function createSlotOverloadPanel(formation, slotIndex, item, settings) {
     const icon = document.createElement("div");
     icon.className = "overload-icon";
     const iconUrl = overloadIconUrl(item, part);
-    if (iconUrl) {
+    const hasSprite = Sprites.applySprite(icon, overloadIconSprite(item, part), `${statusPartLabels[part]} icon`);
+    if (!hasSprite && iconUrl) {
       const img = document.createElement("img");
       img.src = iconUrl;
       img.alt = `${statusPartLabels[part]} icon`;
       icon.appendChild(img);
-    } else {
+    } else if (!hasSprite) {
       icon.textContent = statusPartLabels[part];
     }
     const label = document.createElement("strong");
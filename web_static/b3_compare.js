@@ -201,7 +201,10 @@ function findCatalogItem(selection) {
 
 function imageWrap(item, className = "b3-thumb") {
   const wrap = document.createElement("div");
-  wrap.className = `${className}${item?.imageUrl ? "" : " fallback"}`;
+  wrap.className = `${className}${item?.imageUrl || item?.sprite ? "" : " fallback"}`;
+  if (Sprites.applySprite(wrap, item?.sprite, item?.name)) {
+    return wrap;
+  }
   if (item?.imageUrl) {
     const img = document.createElement("img");
     img.src = item.imageUrl;
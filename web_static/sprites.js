@@ -0,0 +1,24 @@
+(function attachSprites(global) {
+  // sprite は /api/characters が返す { url, x, y, w, h, atlasWidth, atlasHeight } (アトラス内の位置とサイズ)
+  function spritePercent(offset, size, total) {
+    return total > size ? (offset / (total - size)) * 100 : 0;
+  }
+
+  function applySprite(element, sprite, label = "") {
+    if (!sprite?.url) return false;
+    element.classList.add("sprite");
+    element.style.backgroundImage = `url("${sprite.url}")`;
+    element.style.backgroundRepeat = "no-repeat";
+    element.style.backgroundSize = `${(sprite.atlasWidth / sprite.w) * 100}% ${(sprite.atlasHeight / sprite.h) * 100}%`;
+    element.style.backgroundPosition = `${spritePercent(sprite.x, sprite.w, sprite.atlasWidth)}% ${spritePercent(sprite.y, sprite.h, sprite.atlasHeight)}%`;
+    if (label) {
+      element.setAttribute("role", "img");
+      element.setAttribute("aria-label", label);
+    }
+    return true;
+  }
+
+  global.Sprites = {
+    applySprite
+  };
+})(window);
@@ -2,12 +2,28 @@ from __future__ import annotations
 
 import argparse
 import csv
+import os
+import sqlite3
 import sys
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any
+
+from union_raid_store import DEFAULT_DB, connect, import_directories
 
 DEFAULT_SERVERS = ("global", "jp", "kr", "na", "sea")
 
+# Columns that take the most common value per player, in output order.
+# Ties go to the value seen first, matching Counter.most_common.
+MOST_COMMON_COLUMNS = {
+    "Raid": "raid",
+    "Server": "server_name",
+    "Player Name": "player_name",
+    "Union ID": "union_id",
+    "Union Name": "union_name",
+}
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -32,6 +48,27 @@ def parse_args() -> argparse.Namespace:
         default=list(DEFAULT_SERVERS),
         help=f"Servers to aggregate. Default: {' '.join(DEFAULT_SERVERS)}",
     )
+    parser.add_argument(
+        "--engine",
+        choices=("sql", "python"),
+        default="sql",
+        help=(
+            "sql: import changed CSVs into the SQLite store (--db) and aggregate with "
+            "GROUP BY. python: read every CSV row by row. Output is identical. "
+            "Default: %(default)s"
+        ),
+    )
+    parser.add_argument(
+        "--db",
+        default=DEFAULT_DB,
+        help="SQLite store used by --engine sql. Default: %(default)s",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Servers aggregated in parallel processes (0: one per server up to CPU count).",
+    )
     return parser.parse_args()
 
 
@@ -125,6 +162,11 @@ def aggregate_server(server: str, input_root: Path) -> tuple[list[dict[str, str]
             }
         )
 
+    sort_output_rows(output_rows)
+    return output_rows, hit_count
+
+
+def sort_output_rows(output_rows: list[dict[str, str]]) -> None:
     output_rows.sort(
         key=lambda row: (
             -parse_int(row["Total Damage"]),
@@ -132,9 +174,114 @@ def aggregate_server(server: str, input_root: Path) -> tuple[list[dict[str, str]
             row["Player ID"],
         )
     )
+
+
+def aggregate_server_sql(
+    server: str,
+    input_root: Path,
+    db_path: Path,
+) -> tuple[list[dict[str, str]], int]:
+    """Same result as aggregate_server, computed with GROUP BY over the SQLite store.
+
+    The store must already contain the step CSVs of input_root (see import_directories).
+    Row order (file name, then line) stands in for the order in which aggregate_server
+    meets each value, so most-common ties are broken the same way.
+    """
+    server_dir = input_root / server.lower()
+    if not any(server_dir.glob("step_*.csv")):
+        raise FileNotFoundError(f"No step CSV files found in {server_dir}")
+
+    value_columns = ", ".join(f"h.{column}" for column in MOST_COMMON_COLUMNS.values())
+    connection = sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True)
+    try:
+        # One GROUP BY over (player, every most-common column). A player rarely has
+        # more than one combination, so the per-column counts are cheap to finish here.
+        groups = connection.execute(
+            f"""
+            WITH files AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY file_name) AS file_rank
+                FROM sources
+                WHERE path >= ? AND path < ? AND file_name LIKE 'step\\_%.csv' ESCAPE '\\'
+            )
+            SELECT h.player_id, {value_columns},
+                   SUM(h.damage), COUNT(*), SUM(h.kill_hit),
+                   MAX(CASE WHEN h.team_lv != ''
+                       THEN CAST(REPLACE(h.team_lv, ',', '') AS INTEGER) END),
+                   MIN(f.file_rank * 1000000000 + h.row_number)
+            FROM files AS f JOIN hits AS h ON h.source_id = f.id
+            WHERE h.player_id != ''
+            GROUP BY h.player_id, {value_columns}
+            """,
+            (str(server_dir) + os.sep, str(server_dir) + chr(ord(os.sep) + 1)),
+        ).fetchall()
+    finally:
+        connection.close()
+
+    value_count = len(MOST_COMMON_COLUMNS)
+    totals: dict[str, dict[str, Any]] = {}
+    hit_count = 0
+    for player_id, *values, damage, hits, kills, team_level, first_seen in groups:
+        hit_count += hits
+        entry = totals.get(player_id)
+        if entry is None:
+            entry = totals[player_id] = {
+                "damage": 0,
+                "hits": 0,
+                "kills": 0,
+                "team_level": None,
+                "values": [{} for _ in range(value_count)],
+            }
+        entry["damage"] += damage
+        entry["hits"] += hits
+        entry["kills"] += kills
+        if team_level is not None and (entry["team_level"] is None or team_level > entry["team_level"]):
+            entry["team_level"] = team_level
+        for counts, value in zip(entry["values"], values):
+            count, seen = counts.get(value, (0, first_seen))
+            counts[value] = (count + hits, min(seen, first_seen))
+
+    def most_common(counts: dict[str, tuple[int, int]]) -> str:
+        return min(counts.items(), key=lambda item: (-item[1][0], item[1][1]))[0]
+
+    output_rows: list[dict[str, str]] = []
+    for player_id, entry in totals.items():
+        chosen = dict(
+            zip(MOST_COMMON_COLUMNS, (most_common(counts) for counts in entry["values"]))
+        )
+        output_rows.append(
+            {
+                "Raid": chosen["Raid"],
+                "Server": chosen["Server"],
+                "Player ID": player_id,
+                "Player Name": chosen["Player Name"],
+                "Union ID": chosen["Union ID"],
+                "Union Name": chosen["Union Name"],
+                "Team Lv": "" if entry["team_level"] is None else str(entry["team_level"]),
+                "Total Damage": str(entry["damage"]),
+                "Hit Count": str(entry["hits"]),
+                "Kill Hit Count": str(entry["kills"]),
+            }
+        )
+    sort_output_rows(output_rows)
     return output_rows, hit_count
 
 
+def aggregate_and_write(
+    server: str,
+    input_root: Path,
+    output_root: Path,
+    engine: str,
+    db_path: Path,
+) -> tuple[Path, int, int]:
+    """Aggregate one server and write its CSV (runs in a worker process)."""
+    if engine == "sql":
+        rows, hit_count = aggregate_server_sql(server, input_root, db_path)
+    else:
+        rows, hit_count = aggregate_server(server, input_root)
+    output_file = write_server_totals(server, rows, output_root)
+    return output_file, len(rows), hit_count
+
+
 def write_server_totals(server: str, rows: list[dict[str, str]], output_root: Path) -> Path:
     server_dir = output_root / server.lower()
     server_dir.mkdir(parents=True, exist_ok=True)
@@ -166,19 +313,45 @@ def main() -> int:
     output_root = Path(args.output_dir).resolve()
     output_root.mkdir(parents=True, exist_ok=True)
 
+    db_path = Path(args.db).resolve()
+    jobs = args.jobs if args.jobs > 0 else min(len(args.servers), os.cpu_count() or 1)
+
     try:
-        total_output_files = 0
-        total_hits = 0
-        for server in args.servers:
-            print(f"[INFO] Aggregating {server.upper()} from {input_root}", file=sys.stderr)
-            rows, hit_count = aggregate_server(server, input_root)
-            output_file = write_server_totals(server, rows, output_root)
-            total_output_files += 1
-            total_hits += hit_count
+        if args.engine == "sql":
+            connection = connect(db_path)
+            try:
+                imported, skipped, _ = import_directories(connection, [input_root])
+            finally:
+                connection.close()
             print(
-                f"[INFO] Wrote {len(rows)} player totals to {output_file}",
+                f"[INFO] Store {db_path}: {imported} files imported, {skipped} unchanged",
                 file=sys.stderr,
             )
+
+        total_output_files = 0
+        total_hits = 0
+        with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = []
+            for server in args.servers:
+                print(f"[INFO] Aggregating {server.upper()} from {input_root}", file=sys.stderr)
+                futures.append(
+                    pool.submit(
+                        aggregate_and_write,
+                        server,
+                        input_root,
+                        output_root,
+                        args.engine,
+                        db_path,
+                    )
+                )
+            for future in futures:
+                output_file, row_count, hit_count = future.result()
+                total_output_files += 1
+                total_hits += hit_count
+                print(
+                    f"[INFO] Wrote {row_count} player totals to {output_file}",
+                    file=sys.stderr,
+                )
     except Exception as exc:  # pragma: no cover - defensive guard for CLI use.
         print(f"[ERROR] {exc}", file=sys.stderr)
         return 1
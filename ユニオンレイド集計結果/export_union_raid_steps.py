@@ -2,20 +2,26 @@ from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import json
+import os
 import re
 import sys
+import time
 import unicodedata
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
-from lxml import html
-
 BASE_URL = "https://oooooo.rip"
 DEFAULT_RAID = "40"
 DEFAULT_SERVERS = ("global", "jp", "kr", "na", "sea")
+DEFAULT_CACHE_DIR = "html_cache"
+SOURCE_MARKER = ".source.json"
 USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -52,13 +58,108 @@ def parse_args() -> argparse.Namespace:
         default="output",
         help="Directory where CSV files will be written. Default: %(default)s",
     )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=(
+            "Directory for downloaded pages. Pages are revalidated with "
+            "If-None-Match / If-Modified-Since. Default: %(default)s"
+        ),
+    )
+    parser.add_argument(
+        "--from-cache",
+        action="store_true",
+        help="Do not access the network; parse the pages already in --cache-dir.",
+    )
+    parser.add_argument(
+        "--page",
+        action="append",
+        default=[],
+        metavar="SERVER=PATH",
+        help="Parse a saved HTML file for SERVER instead of downloading it. Repeatable.",
+    )
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=len(DEFAULT_SERVERS),
+        help="Concurrent downloads. Default: %(default)s",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=min(len(DEFAULT_SERVERS), os.cpu_count() or 1),
+        help="Parser processes. Default: %(default)s",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-parse pages even if the CSVs were already written from the same HTML.",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=("stream", "dom"),
+        default="stream",
+        help=(
+            "stream: incremental parse that writes rows as they are read (flat memory). "
+            "dom: build the whole document first. Default: %(default)s"
+        ),
+    )
     return parser.parse_args()
 
 
-def fetch_html(url: str) -> str:
-    request = Request(url, headers={"User-Agent": USER_AGENT})
-    with urlopen(request, timeout=60) as response:
-        return response.read().decode("utf-8")
+def cache_paths(cache_dir: Path, raid: str, server: str) -> tuple[Path, Path]:
+    raid_dir = cache_dir / f"ur{raid}"
+    return raid_dir / f"{server.lower()}.html", raid_dir / f"{server.lower()}.meta.json"
+
+
+def read_cache_meta(meta_path: Path) -> dict[str, str]:
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def fetch_to_cache(url: str, cache_dir: Path, raid: str, server: str) -> tuple[Path, bool]:
+    """Download url into the page cache and return (html_path, changed).
+
+    A cached copy is revalidated with a conditional GET; on 304 the cached
+    file is reused and changed is False.
+    """
+    html_path, meta_path = cache_paths(cache_dir, raid, server)
+    meta = read_cache_meta(meta_path) if html_path.exists() else {}
+    headers = {"User-Agent": USER_AGENT}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with urlopen(Request(url, headers=headers), timeout=60) as response:
+            body = response.read()
+            response_headers = response.headers
+    except HTTPError as exc:
+        if exc.code == 304 and html_path.exists():
+            return html_path, False
+        raise
+
+    changed = not html_path.exists() or html_path.read_bytes() != body
+    if changed:
+        write_atomic(html_path, body)
+    new_meta = {
+        "url": url,
+        "etag": response_headers.get("ETag", ""),
+        "last_modified": response_headers.get("Last-Modified", ""),
+        "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    write_atomic(meta_path, json.dumps(new_meta, ensure_ascii=False, indent=2).encode("utf-8"))
+    return html_path, changed
 
 
 def clean_text(value: str) -> str:
@@ -130,7 +231,74 @@ def build_team_summary(members: list[dict[str, str]]) -> str:
     )
 
 
+def parse_union_summary(summary_divs: list[Any]) -> dict[str, str]:
+    return {
+        "Union Rank": direct_text(summary_divs[0]),
+        "Union Name": direct_text(summary_divs[1]),
+        "Union ID": clean_text(
+            "".join(summary_divs[1].xpath('.//span[contains(@class, "ur-sub-id")]/text()'))
+        ),
+    }
+
+
+def build_row_record(
+    server: str,
+    raid: str,
+    union_info: dict[str, str],
+    step_number: int,
+    parsed_step: dict[str, str],
+    hit_index: int,
+    row: Any,
+) -> dict[str, str] | None:
+    cells = row.xpath("./td")
+    if len(cells) < 5:
+        return None
+
+    utc = clean_text("".join(cells[0].xpath(".//text()")))
+    raid_lv = direct_text(cells[1]).replace(",", "")
+    player_name = direct_text(cells[2])
+    player_id = clean_text(
+        "".join(cells[2].xpath('.//span[contains(@class, "ur-sub-id")]/text()'))
+    )
+    team_level, team_members = parse_team(cells[3])
+    damage = direct_text(cells[4]).replace(",", "")
+    damage_classes = cells[4].attrib.get("class", "")
+    is_kill = "Yes" if "ur-damage-kill" in damage_classes else "No"
+
+    record: dict[str, str] = {
+        "Raid": raid,
+        "Server": server.upper(),
+        "Union Rank": union_info["Union Rank"],
+        "Union Name": union_info["Union Name"],
+        "Union ID": union_info["Union ID"],
+        "Step Number": str(step_number),
+        "Step Name": parsed_step["name"],
+        "Weakness": parsed_step["weakness"],
+        "Union Hit Order": str(hit_index),
+        "UTC": utc,
+        "Raid Lv": raid_lv,
+        "Team Lv": team_level,
+        "Player Name": player_name,
+        "Player ID": player_id,
+        "Team (Name+LB)": build_team_summary(team_members),
+        "Damage": damage,
+        "Kill Hit": is_kill,
+    }
+
+    for index in range(5):
+        member = team_members[index] if index < len(team_members) else None
+        member_number = index + 1
+        record[f"Team {member_number} Name"] = member["name"] if member else ""
+        record[f"Team {member_number} LB"] = member["lb"] if member else ""
+
+    return record
+
+
 def parse_server_page(server: str, raid: str, page_html: str) -> dict[int, dict[str, Any]]:
+    # lxml is only needed when a page actually has to be parsed (cached, unchanged
+    # pages are skipped), so it is imported here rather than at start-up.
+    from lxml import html
+
     document = html.fromstring(page_html)
     step_rows: dict[int, list[dict[str, str]]] = defaultdict(list)
     step_meta: dict[int, dict[str, str]] = {}
@@ -146,11 +314,7 @@ def parse_server_page(server: str, raid: str, page_html: str) -> dict[int, dict[
         if len(summary_divs) < 3:
             continue
 
-        union_rank = direct_text(summary_divs[0])
-        union_name = direct_text(summary_divs[1])
-        union_id = clean_text(
-            "".join(summary_divs[1].xpath('.//span[contains(@class, "ur-sub-id")]/text()'))
-        )
+        union_info = parse_union_summary(summary_divs)
 
         for step in guild.xpath('.//details[contains(@class, "ur-step")]'):
             step_title_nodes = step.xpath('.//span[contains(@class, "ur-step-label")]')
@@ -170,48 +334,11 @@ def parse_server_page(server: str, raid: str, page_html: str) -> dict[int, dict[
 
             rows = step.xpath('.//table[contains(@class, "ur-step-table")]/tbody/tr')
             for hit_index, row in enumerate(rows, start=1):
-                cells = row.xpath("./td")
-                if len(cells) < 5:
-                    continue
-
-                utc = clean_text("".join(cells[0].xpath(".//text()")))
-                raid_lv = direct_text(cells[1]).replace(",", "")
-                player_name = direct_text(cells[2])
-                player_id = clean_text(
-                    "".join(cells[2].xpath('.//span[contains(@class, "ur-sub-id")]/text()'))
+                record = build_row_record(
+                    server, raid, union_info, step_number, parsed_step, hit_index, row
                 )
-                team_level, team_members = parse_team(cells[3])
-                damage = direct_text(cells[4]).replace(",", "")
-                damage_classes = cells[4].attrib.get("class", "")
-                is_kill = "Yes" if "ur-damage-kill" in damage_classes else "No"
-
-                record: dict[str, str] = {
-                    "Raid": raid,
-                    "Server": server.upper(),
-                    "Union Rank": union_rank,
-                    "Union Name": union_name,
-                    "Union ID": union_id,
-                    "Step Number": str(step_number),
-                    "Step Name": parsed_step["name"],
-                    "Weakness": parsed_step["weakness"],
-                    "Union Hit Order": str(hit_index),
-                    "UTC": utc,
-                    "Raid Lv": raid_lv,
-                    "Team Lv": team_level,
-                    "Player Name": player_name,
-                    "Player ID": player_id,
-                    "Team (Name+LB)": build_team_summary(team_members),
-                    "Damage": damage,
-                    "Kill Hit": is_kill,
-                }
-
-                for index in range(5):
-                    member = team_members[index] if index < len(team_members) else None
-                    member_number = index + 1
-                    record[f"Team {member_number} Name"] = member["name"] if member else ""
-                    record[f"Team {member_number} LB"] = member["lb"] if member else ""
-
-                step_rows[step_number].append(record)
+                if record is not None:
+                    step_rows[step_number].append(record)
 
     return {
         step_number: {
@@ -222,6 +349,132 @@ def parse_server_page(server: str, raid: str, page_html: str) -> dict[int, dict[
     }
 
 
+def has_class(element: Any, name: str) -> bool:
+    # Same test as the XPath contains(@class, name) used by parse_server_page.
+    return name in (element.get("class") or "")
+
+
+def discard_parsed(element: Any) -> None:
+    """Free an element that has been fully handled, including earlier siblings."""
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_server_rows(
+    server: str,
+    raid: str,
+    source: Path,
+) -> Iterator[tuple[int, dict[str, str], dict[str, str]]]:
+    """Yield (step number, step meta, record) in document order without building the DOM.
+
+    Produces the same records as parse_server_page, but each table row is
+    dropped from the tree as soon as it has been read, so memory does not grow
+    with the size of the page.
+    """
+    guild = None
+    union_info: dict[str, str] | None = None
+    step = None
+    parsed_step: dict[str, str] | None = None
+    step_number = 0
+    hit_index = 0
+    step_meta: dict[int, dict[str, str]] = {}
+
+    from lxml import etree
+
+    for event, element in etree.iterparse(
+        str(source), events=("start", "end"), html=True, encoding="utf-8", huge_tree=True
+    ):
+        tag = element.tag
+        if event == "start":
+            if tag != "details":
+                continue
+            if guild is None and has_class(element, "ur-guild"):
+                guild, union_info = element, None
+            elif guild is not None and step is None and has_class(element, "ur-step"):
+                step, parsed_step, hit_index = element, None, 0
+            continue
+
+        if guild is None:
+            continue
+
+        if tag == "summary":
+            if (
+                union_info is None
+                and element.getparent() is guild
+                and has_class(element, "ur-guild-summary")
+            ):
+                summary_divs = element.xpath("./div")
+                if len(summary_divs) >= 3:
+                    union_info = parse_union_summary(summary_divs)
+        elif tag == "span":
+            if step is not None and parsed_step is None and has_class(element, "ur-step-label"):
+                step_label = clean_text("".join(element.xpath("./text()")))
+                parsed_step = parse_step_label(step_label)
+                step_number = int(parsed_step["number"])
+                step_meta.setdefault(
+                    step_number,
+                    {
+                        "step_name": parsed_step["name"],
+                        "weakness": parsed_step["weakness"],
+                    },
+                )
+        elif tag == "tr":
+            if step is None or parsed_step is None or union_info is None:
+                continue
+            body = element.getparent()
+            table = body.getparent() if body is not None else None
+            if body is None or body.tag != "tbody" or table is None or table.tag != "table":
+                continue
+            if not has_class(table, "ur-step-table"):
+                continue
+            hit_index += 1
+            record = build_row_record(
+                server, raid, union_info, step_number, parsed_step, hit_index, element
+            )
+            if record is not None:
+                yield step_number, step_meta[step_number], record
+            discard_parsed(element)
+        elif tag == "details":
+            if element is step:
+                step = None
+            elif element is guild:
+                guild = None
+                discard_parsed(element)
+
+
+def write_server_csvs_streaming(
+    server: str,
+    rows: Iterable[tuple[int, dict[str, str], dict[str, str]]],
+    output_dir: Path,
+) -> list[Path]:
+    """Write rows from iter_server_rows to the same files write_server_csvs would produce."""
+    server_dir = output_dir / server
+    server_dir.mkdir(parents=True, exist_ok=True)
+    fieldnames = csv_fieldnames()
+    writers: dict[int, csv.DictWriter] = {}
+    file_paths: dict[int, Path] = {}
+
+    with ExitStack() as stack:
+        for step_number, meta, record in rows:
+            writer = writers.get(step_number)
+            if writer is None:
+                slug = slugify_step_name(meta["step_name"])
+                file_path = server_dir / f"step_{step_number:02d}_{slug}.csv"
+                handle = stack.enter_context(
+                    file_path.open("w", newline="", encoding="utf-8-sig")
+                )
+                writer = csv.DictWriter(handle, fieldnames=fieldnames)
+                writer.writeheader()
+                writers[step_number] = writer
+                file_paths[step_number] = file_path
+            writer.writerow(record)
+
+    return [file_paths[step_number] for step_number in sorted(file_paths)]
+
+
 def csv_fieldnames() -> list[str]:
     fields = [
         "Raid",
@@ -278,38 +531,178 @@ def write_server_csvs(
     return written_files
 
 
-def export_server(server: str, raid: str, output_dir: Path) -> list[Path]:
-    url = f"{BASE_URL}/ur{raid}/{server.lower()}/"
-    print(f"[INFO] Fetching {url}", file=sys.stderr)
-    page_html = fetch_html(url)
-    step_data = parse_server_page(server=server, raid=raid, page_html=page_html)
-    if not step_data:
+def file_sha1(path: Path) -> str:
+    digest = hashlib.sha1()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_and_write(
+    server: str,
+    raid: str,
+    html_path: Path,
+    output_dir: Path,
+    force: bool = False,
+    parser: str = "stream",
+) -> list[Path]:
+    """Parse one saved page and write its step CSVs (runs in a worker process).
+
+    The source hash is recorded next to the CSVs, so an unchanged page is not
+    parsed again unless force is set.
+    """
+    server_dir = output_dir / server.lower()
+    marker_path = server_dir / SOURCE_MARKER
+    source_hash = file_sha1(html_path)
+    if not force:
+        marker = read_cache_meta(marker_path)
+        written = [server_dir / name for name in marker.get("files", [])]
+        if (
+            marker.get("sha1") == source_hash
+            and marker.get("raid") == raid
+            and written
+            and all(path.exists() for path in written)
+        ):
+            return written
+
+    if parser == "dom":
+        page_html = html_path.read_text(encoding="utf-8")
+        step_data = parse_server_page(server=server, raid=raid, page_html=page_html)
+        written_files = write_server_csvs(server.lower(), step_data, output_dir)
+    else:
+        rows = iter_server_rows(server=server, raid=raid, source=html_path)
+        written_files = write_server_csvs_streaming(server.lower(), rows, output_dir)
+    if not written_files:
         raise ValueError(f"No step data found for server {server!r}")
-    written_files = write_server_csvs(server.lower(), step_data, output_dir)
-    print(
-        f"[INFO] Wrote {len(written_files)} step files for {server.upper()}",
-        file=sys.stderr,
-    )
+    marker = {
+        "raid": raid,
+        "sha1": source_hash,
+        "source": str(html_path),
+        "files": [path.name for path in written_files],
+    }
+    write_atomic(marker_path, json.dumps(marker, ensure_ascii=False, indent=2).encode("utf-8"))
     return written_files
 
 
+def parse_page_overrides(values: list[str]) -> dict[str, Path]:
+    pages: dict[str, Path] = {}
+    for value in values:
+        server, separator, path = value.partition("=")
+        if not separator or not server or not path:
+            raise ValueError(f"--page expects SERVER=PATH, got {value!r}")
+        pages[server.lower()] = Path(path).resolve()
+    return pages
+
+
+def locate_page(
+    server: str,
+    raid: str,
+    cache_dir: Path,
+    pages: dict[str, Path],
+    offline: bool,
+) -> Path:
+    """Return the HTML file to parse for server, downloading it if needed."""
+    if server.lower() in pages:
+        return pages[server.lower()]
+    if offline:
+        html_path, _ = cache_paths(cache_dir, raid, server)
+        if not html_path.exists():
+            raise FileNotFoundError(f"No cached page for {server.upper()}: {html_path}")
+        return html_path
+
+    url = f"{BASE_URL}/ur{raid}/{server.lower()}/"
+    print(f"[INFO] Fetching {url}", file=sys.stderr)
+    html_path, changed = fetch_to_cache(url, cache_dir, raid, server)
+    state = "updated" if changed else "not modified"
+    print(f"[INFO] {server.upper()} page {state}: {html_path}", file=sys.stderr)
+    return html_path
+
+
+def export_servers(
+    servers: list[str],
+    raid: str,
+    output_dir: Path,
+    cache_dir: Path,
+    pages: dict[str, Path],
+    offline: bool = False,
+    fetch_workers: int = len(DEFAULT_SERVERS),
+    parse_workers: int = 1,
+    force: bool = False,
+    parser: str = "stream",
+) -> tuple[int, list[str]]:
+    """Fetch all servers concurrently and parse each page in a process pool.
+
+    Parsing of a server starts as soon as its page is available.
+    Returns (files written, error messages).
+    """
+    total_files = 0
+    errors: list[str] = []
+    with ThreadPoolExecutor(max_workers=max(1, fetch_workers)) as fetch_pool, ProcessPoolExecutor(
+        max_workers=max(1, parse_workers)
+    ) as parse_pool:
+        fetches = {
+            fetch_pool.submit(locate_page, server, raid, cache_dir, pages, offline): server
+            for server in servers
+        }
+        parses = {}
+        for future in as_completed(fetches):
+            server = fetches[future]
+            try:
+                html_path = future.result()
+            except (HTTPError, URLError) as exc:
+                errors.append(f"Failed to fetch leaderboard page for {server.upper()}: {exc}")
+                continue
+            except Exception as exc:
+                errors.append(f"{server.upper()}: {exc}")
+                continue
+            parses[server] = parse_pool.submit(
+                parse_and_write, server, raid, html_path, output_dir, force, parser
+            )
+
+        for server, future in parses.items():
+            try:
+                written_files = future.result()
+            except Exception as exc:
+                errors.append(f"{server.upper()}: {exc}")
+                continue
+            total_files += len(written_files)
+            print(
+                f"[INFO] Wrote {len(written_files)} step files for {server.upper()}",
+                file=sys.stderr,
+            )
+    return total_files, errors
+
+
 def main() -> int:
     args = parse_args()
     output_dir = Path(args.output_dir).resolve()
+    cache_dir = Path(args.cache_dir).resolve()
 
     try:
+        pages = parse_page_overrides(args.page)
         output_dir.mkdir(parents=True, exist_ok=True)
-        total_files = 0
-        for server in args.servers:
-            written_files = export_server(server=server, raid=args.raid, output_dir=output_dir)
-            total_files += len(written_files)
-    except (HTTPError, URLError) as exc:
-        print(f"[ERROR] Failed to fetch leaderboard page: {exc}", file=sys.stderr)
-        return 1
+        total_files, errors = export_servers(
+            servers=args.servers,
+            raid=args.raid,
+            output_dir=output_dir,
+            cache_dir=cache_dir,
+            pages=pages,
+            offline=args.from_cache,
+            fetch_workers=args.fetch_workers,
+            parse_workers=args.parse_workers,
+            force=args.force,
+            parser=args.parser,
+        )
     except Exception as exc:  # pragma: no cover - defensive guard for CLI use.
         print(f"[ERROR] {exc}", file=sys.stderr)
         return 1
 
+    for message in errors:
+        print(f"[ERROR] {message}", file=sys.stderr)
+    if errors:
+        return 1
+
     print(f"[INFO] Export completed. Files written: {total_files}", file=sys.stderr)
     return 0
 
@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+DEFAULT_DB = "union_raid.sqlite3"
+DEFAULT_INPUT_DIR = "output"
+SCHEMA_VERSION = 1
+
+# CSV column -> hits column. Text is stored as written by export_union_raid_steps.py
+# (stripped); Raid Lv and Damage are stored as integers.
+TEXT_COLUMNS = {
+    "Raid": "raid",
+    "Server": "server_name",
+    "Union Rank": "union_rank",
+    "Union Name": "union_name",
+    "Union ID": "union_id",
+    "Step Name": "step_name",
+    "Weakness": "weakness",
+    "UTC": "utc",
+    "Team Lv": "team_lv",
+    "Player Name": "player_name",
+    "Player ID": "player_id",
+    "Team (Name+LB)": "team_summary",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    server TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha1 TEXT NOT NULL,
+    raid TEXT NOT NULL DEFAULT '',
+    step_number INTEGER,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    imported_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS hits (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
+    row_number INTEGER NOT NULL,
+    server TEXT NOT NULL,
+    raid TEXT NOT NULL,
+    server_name TEXT NOT NULL,
+    union_rank TEXT NOT NULL,
+    union_name TEXT NOT NULL,
+    union_id TEXT NOT NULL,
+    step_number INTEGER,
+    step_name TEXT NOT NULL,
+    weakness TEXT NOT NULL,
+    hit_order INTEGER,
+    utc TEXT NOT NULL,
+    raid_lv INTEGER NOT NULL,
+    team_lv TEXT NOT NULL,
+    player_name TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    team_summary TEXT NOT NULL,
+    team_key TEXT NOT NULL,
+    damage INTEGER NOT NULL,
+    kill_hit INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS hit_members (
+    hit_id INTEGER NOT NULL REFERENCES hits(id) ON DELETE CASCADE,
+    slot INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    lb TEXT NOT NULL,
+    PRIMARY KEY (hit_id, slot)
+) WITHOUT ROWID;
+
+-- Per step file and player partial sums, so totals only need re-computing for changed files.
+CREATE TABLE IF NOT EXISTS player_source_totals (
+    source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
+    server TEXT NOT NULL,
+    raid TEXT NOT NULL,
+    step_number INTEGER,
+    player_id TEXT NOT NULL,
+    player_name TEXT NOT NULL,
+    union_id TEXT NOT NULL,
+    union_name TEXT NOT NULL,
+    damage INTEGER NOT NULL,
+    hit_count INTEGER NOT NULL,
+    kill_hit_count INTEGER NOT NULL,
+    PRIMARY KEY (source_id, player_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS hits_source ON hits(source_id, row_number);
+CREATE INDEX IF NOT EXISTS hits_player ON hits(server, player_id);
+CREATE INDEX IF NOT EXISTS hits_union ON hits(server, union_id);
+CREATE INDEX IF NOT EXISTS hits_step ON hits(server, raid, step_number);
+CREATE INDEX IF NOT EXISTS hits_team ON hits(team_key);
+CREATE INDEX IF NOT EXISTS hit_members_name ON hit_members(name, lb);
+CREATE INDEX IF NOT EXISTS player_totals_player ON player_source_totals(server, player_id);
+CREATE INDEX IF NOT EXISTS player_totals_union ON player_source_totals(server, union_id);
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Import step CSV files into an indexed SQLite store and query player "
+            "totals, union rankings and team usage."
+        )
+    )
+    parser.add_argument(
+        "--db",
+        default=DEFAULT_DB,
+        help="SQLite database file. Default: %(default)s",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import",
+        help="Import new or changed step CSV files. Unchanged files are skipped.",
+    )
+    import_parser.add_argument(
+        "--input-dir",
+        nargs="+",
+        default=[DEFAULT_INPUT_DIR],
+        help="Directories with server subdirectories of step CSV files. Default: %(default)s",
+    )
+    import_parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Remove data for previously imported files under --input-dir that no longer exist.",
+    )
+
+    for name, help_text in (
+        ("players", "Player totals ordered by total damage."),
+        ("unions", "Union ranking by total damage."),
+        ("teams", "Team or member usage counts."),
+    ):
+        query_parser = subparsers.add_parser(name, help=help_text)
+        query_parser.add_argument("--server", help="Only this server (e.g. jp).")
+        query_parser.add_argument("--raid", help="Only this raid number.")
+        query_parser.add_argument("--step", type=int, help="Only this step number.")
+        query_parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="Maximum number of rows (0: all). Default: %(default)s",
+        )
+        if name == "players":
+            query_parser.add_argument("--player-id", help="Only this player ID.")
+        if name == "teams":
+            query_parser.add_argument(
+                "--by",
+                choices=("team", "member"),
+                default="team",
+                help="Count whole teams (member names, order ignored) or single members.",
+            )
+            query_parser.add_argument("--member", help="Only teams that include this member name.")
+
+    return parser.parse_args()
+
+
+def parse_int(value: str) -> int:
+    text = (value or "").replace(",", "").strip()
+    if not text:
+        return 0
+    return int(text)
+
+
+def parse_optional_int(value: str) -> int | None:
+    text = (value or "").strip()
+    return int(text) if text else None
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        connection.close()
+        raise RuntimeError(
+            f"{db_path} uses schema version {version}, expected {SCHEMA_VERSION}; "
+            "delete it and import again"
+        )
+    connection.executescript(SCHEMA)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+def file_sha1(path: Path) -> str:
+    digest = hashlib.sha1()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_step_files(input_root: Path) -> Iterable[tuple[str, Path]]:
+    for server_dir in sorted(path for path in input_root.iterdir() if path.is_dir()):
+        for step_file in sorted(server_dir.glob("step_*.csv")):
+            yield server_dir.name.lower(), step_file
+
+
+def team_key(names: list[str]) -> str:
+    return " / ".join(sorted(name for name in names if name))
+
+
+def hit_values(server: str, row: dict[str, str]) -> dict[str, Any]:
+    values: dict[str, Any] = {
+        column: (row.get(field) or "").strip() for field, column in TEXT_COLUMNS.items()
+    }
+    if not values["server_name"]:
+        values["server_name"] = server.upper()
+    values["server"] = server
+    values["step_number"] = parse_optional_int(row.get("Step Number", ""))
+    values["hit_order"] = parse_optional_int(row.get("Union Hit Order", ""))
+    values["raid_lv"] = parse_int(row.get("Raid Lv", ""))
+    values["damage"] = parse_int(row.get("Damage", "0"))
+    values["kill_hit"] = 1 if (row.get("Kill Hit") or "").strip().lower() == "yes" else 0
+    return values
+
+
+HIT_COLUMNS = (
+    "id",
+    "source_id",
+    "row_number",
+    "server",
+    "raid",
+    "server_name",
+    "union_rank",
+    "union_name",
+    "union_id",
+    "step_number",
+    "step_name",
+    "weakness",
+    "hit_order",
+    "utc",
+    "raid_lv",
+    "team_lv",
+    "player_name",
+    "player_id",
+    "team_summary",
+    "team_key",
+    "damage",
+    "kill_hit",
+)
+INSERT_HIT = (
+    f"INSERT INTO hits ({', '.join(HIT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in HIT_COLUMNS)})"
+)
+
+
+def import_file(
+    connection: sqlite3.Connection,
+    server: str,
+    step_file: Path,
+    stat: Any,
+    sha1: str,
+) -> int:
+    """Replace the stored rows of step_file. Runs inside the caller's transaction."""
+    path_key = str(step_file.resolve())
+    connection.execute("DELETE FROM sources WHERE path = ?", (path_key,))
+    source_id = connection.execute(
+        "INSERT INTO sources (path, server, file_name, size, mtime_ns, sha1, imported_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (path_key, server, step_file.name, stat.st_size, stat.st_mtime_ns, sha1, time.time()),
+    ).lastrowid
+
+    next_hit_id = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM hits").fetchone()[0]
+    hit_rows: list[tuple[Any, ...]] = []
+    member_rows: list[tuple[Any, ...]] = []
+    raid = ""
+    step_number = None
+
+    with step_file.open("r", newline="", encoding="utf-8-sig") as handle:
+        for row_number, row in enumerate(csv.DictReader(handle)):
+            values = hit_values(server, row)
+            names = []
+            hit_id = next_hit_id + len(hit_rows)
+            for slot in range(1, 6):
+                name = (row.get(f"Team {slot} Name") or "").strip()
+                lb = (row.get(f"Team {slot} LB") or "").strip()
+                if name:
+                    names.append(name)
+                    member_rows.append((hit_id, slot, name, lb))
+            values["id"] = hit_id
+            values["source_id"] = source_id
+            values["row_number"] = row_number
+            values["team_key"] = team_key(names)
+            hit_rows.append(tuple(values[column] for column in HIT_COLUMNS))
+            raid = raid or values["raid"]
+            if step_number is None:
+                step_number = values["step_number"]
+
+    connection.executemany(INSERT_HIT, hit_rows)
+    connection.executemany(
+        "INSERT INTO hit_members (hit_id, slot, name, lb) VALUES (?, ?, ?, ?)",
+        member_rows,
+    )
+    # Partial sums for this file only. SQLite takes the bare name columns from the
+    # row that supplies MAX(row_number), i.e. the player's last hit in the file.
+    connection.execute(
+        """
+        INSERT INTO player_source_totals (
+            source_id, server, raid, step_number, player_id, player_name,
+            union_id, union_name, damage, hit_count, kill_hit_count
+        )
+        SELECT source_id, server, raid, step_number, player_id, player_name,
+               union_id, union_name, damage, hit_count, kill_hit_count
+        FROM (
+            SELECT source_id, server, raid, step_number, player_id, player_name,
+                   union_id, union_name, SUM(damage) AS damage, COUNT(*) AS hit_count,
+                   SUM(kill_hit) AS kill_hit_count, MAX(row_number)
+            FROM hits
+            WHERE source_id = ? AND player_id != ''
+            GROUP BY player_id
+        )
+        """,
+        (source_id,),
+    )
+    connection.execute(
+        "UPDATE sources SET raid = ?, step_number = ?, row_count = ? WHERE id = ?",
+        (raid, step_number, len(hit_rows), source_id),
+    )
+    return len(hit_rows)
+
+
+def import_directories(
+    connection: sqlite3.Connection,
+    input_roots: list[Path],
+    prune: bool = False,
+) -> tuple[int, int, int]:
+    """Import new or changed step CSVs. Returns (files imported, files skipped, rows imported)."""
+    known = {
+        path: (size, mtime_ns, sha1)
+        for path, size, mtime_ns, sha1 in connection.execute(
+            "SELECT path, size, mtime_ns, sha1 FROM sources"
+        )
+    }
+    imported = skipped = row_total = 0
+    seen: set[str] = set()
+
+    for input_root in input_roots:
+        if not input_root.is_dir():
+            raise FileNotFoundError(f"Input directory not found: {input_root}")
+        for server, step_file in iter_step_files(input_root):
+            path_key = str(step_file.resolve())
+            seen.add(path_key)
+            stat = step_file.stat()
+            previous = known.get(path_key)
+            if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                skipped += 1
+                continue
+            sha1 = file_sha1(step_file)
+            if previous is not None and previous[2] == sha1:
+                # Touched but unchanged: only refresh the stat fingerprint.
+                connection.execute(
+                    "UPDATE sources SET size = ?, mtime_ns = ? WHERE path = ?",
+                    (stat.st_size, stat.st_mtime_ns, path_key),
+                )
+                connection.commit()
+                skipped += 1
+                continue
+
+            with connection:
+                rows = import_file(connection, server, step_file, stat, sha1)
+            imported += 1
+            row_total += rows
+            print(f"[INFO] Imported {rows} rows from {step_file}", file=sys.stderr)
+
+    if prune:
+        prefixes = tuple(str(root.resolve()) for root in input_roots)
+        stale = [path for path in known if path.startswith(prefixes) and path not in seen]
+        with connection:
+            connection.executemany("DELETE FROM sources WHERE path = ?", ((path,) for path in stale))
+        for path in stale:
+            print(f"[INFO] Removed {path}", file=sys.stderr)
+
+    return imported, skipped, row_total
+
+
+def build_filters(args: argparse.Namespace, prefix: str = "") -> tuple[str, list[Any]]:
+    clauses: list[str] = []
+    params: list[Any] = []
+    if args.server:
+        clauses.append(f"{prefix}server = ?")
+        params.append(args.server.lower())
+    if args.raid:
+        clauses.append(f"{prefix}raid = ?")
+        params.append(str(args.raid))
+    if args.step is not None:
+        clauses.append(f"{prefix}step_number = ?")
+        params.append(args.step)
+    if getattr(args, "player_id", None):
+        clauses.append(f"{prefix}player_id = ?")
+        params.append(args.player_id)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def limit_clause(limit: int) -> str:
+    return f" LIMIT {int(limit)}" if limit and limit > 0 else ""
+
+
+def query_players(connection: sqlite3.Connection, args: argparse.Namespace) -> sqlite3.Cursor:
+    where, params = build_filters(args)
+    # SQLite takes the bare name columns from the row that supplies MAX(source_id).
+    return connection.execute(
+        f"""
+        SELECT server AS "Server", player_id AS "Player ID", player_name AS "Player Name",
+               union_id AS "Union ID", union_name AS "Union Name",
+               SUM(damage) AS "Total Damage", SUM(hit_count) AS "Hit Count",
+               SUM(kill_hit_count) AS "Kill Hit Count", MAX(source_id) AS _latest
+        FROM player_source_totals{where}
+        GROUP BY server, player_id
+        ORDER BY "Total Damage" DESC, "Hit Count" DESC, player_id
+        {limit_clause(args.limit)}
+        """,
+        params,
+    )
+
+
+def query_unions(connection: sqlite3.Connection, args: argparse.Namespace) -> sqlite3.Cursor:
+    where, params = build_filters(args)
+    return connection.execute(
+        f"""
+        SELECT server AS "Server", union_id AS "Union ID", union_name AS "Union Name",
+               SUM(damage) AS "Total Damage", SUM(hit_count) AS "Hit Count",
+               SUM(kill_hit_count) AS "Kill Hit Count",
+               COUNT(DISTINCT player_id) AS "Players", MAX(source_id) AS _latest
+        FROM player_source_totals{where}
+        GROUP BY server, union_id
+        ORDER BY "Total Damage" DESC, union_id
+        {limit_clause(args.limit)}
+        """,
+        params,
+    )
+
+
+def query_teams(connection: sqlite3.Connection, args: argparse.Namespace) -> sqlite3.Cursor:
+    where, params = build_filters(args, prefix="h.")
+    if args.member:
+        member_filter = "h.id IN (SELECT hit_id FROM hit_members WHERE name = ?)"
+        where = f"{where} AND {member_filter}" if where else f" WHERE {member_filter}"
+        params.append(args.member)
+    if args.by == "member":
+        return connection.execute(
+            f"""
+            SELECT m.name AS "Member", COUNT(*) AS "Uses",
+                   COUNT(DISTINCT h.server || ':' || h.player_id) AS "Players",
+                   CAST(AVG(h.damage) AS INTEGER) AS "Average Damage"
+            FROM hits AS h JOIN hit_members AS m ON m.hit_id = h.id{where}
+            GROUP BY m.name
+            ORDER BY "Uses" DESC, m.name
+            {limit_clause(args.limit)}
+            """,
+            params,
+        )
+    return connection.execute(
+        f"""
+        SELECT h.team_key AS "Team", COUNT(*) AS "Uses",
+               COUNT(DISTINCT h.server || ':' || h.player_id) AS "Players",
+               CAST(AVG(h.damage) AS INTEGER) AS "Average Damage",
+               MAX(h.damage) AS "Best Damage"
+        FROM hits AS h{where}
+        GROUP BY h.team_key
+        ORDER BY "Uses" DESC, h.team_key
+        {limit_clause(args.limit)}
+        """,
+        params,
+    )
+
+
+QUERIES = {
+    "players": query_players,
+    "unions": query_unions,
+    "teams": query_teams,
+}
+
+
+def write_cursor(cursor: sqlite3.Cursor) -> int:
+    columns = [description[0] for description in cursor.description]
+    visible = [index for index, name in enumerate(columns) if not name.startswith("_")]
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    writer.writerow(columns[index] for index in visible)
+    count = 0
+    for row in cursor:
+        writer.writerow(row[index] for index in visible)
+        count += 1
+    return count
+
+
+def main() -> int:
+    args = parse_args()
+    db_path = Path(args.db).resolve()
+
+    try:
+        connection = connect(db_path)
+        started_at = time.perf_counter()
+        if args.command == "import":
+            input_roots = [Path(path).resolve() for path in args.input_dir]
+            imported, skipped, rows = import_directories(connection, input_roots, prune=args.prune)
+            connection.execute("PRAGMA optimize")
+            print(
+                f"[INFO] Import completed. Files imported: {imported}, unchanged: {skipped}, "
+                f"rows: {rows} ({time.perf_counter() - started_at:.2f}s)",
+                file=sys.stderr,
+            )
+        else:
+            count = write_cursor(QUERIES[args.command](connection, args))
+            print(
+                f"[INFO] {count} rows ({(time.perf_counter() - started_at) * 1000:.1f} ms)",
+                file=sys.stderr,
+            )
+        connection.close()
+    except Exception as exc:  # pragma: no cover - defensive guard for CLI use.
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())